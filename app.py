@@ -27,8 +27,9 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 
 from main import SitemapParser, LLMsTxtGenerator, RobotsTxtChecker
+from sitemap_cache import SitemapCache
 from firecrawl_working import WorkingFirecrawlScraper
-from utils import validate_config, create_sample_config, format_file_size
+from utils import validate_config, create_sample_config, format_file_size, load_job_settings
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -189,6 +190,11 @@ REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
 redis_conn = redis.Redis.from_url(REDIS_URL)
 # Use the same queue as the worker service
 rq_queue = Queue('batch_processing', connection=redis_conn)
+# Sitemap cache shared with the workers so a site's sitemap is only fetched once
+sitemap_cache = SitemapCache(redis_conn, ttl=int(os.environ.get('SITEMAP_CACHE_TTL', 900)))
+
+# Crawl settings the web form doesn't expose, passed from config.yaml to every generation job
+job_settings = load_job_settings()
 
 def get_user_tier(user_id=None):
     """Get user's current tier. Default to free if no user or not found."""
@@ -572,7 +578,9 @@ def generate():
         max_blogs = tier_limits['max_blogs']
         max_products = tier_limits['max_products']
         max_content_length = tier_limits['max_content_length']
-        request_delay = float(request.form.get('request_delay', 1.0))
+        # Minimum spacing between a worker's requests to the site; with 0 the pace is set by
+        # DOMAIN_RATE_LIMIT, adaptive concurrency and robots.txt Crawl-delay instead
+        request_delay = float(request.form.get('request_delay', 0))
         respect_robots = request.form.get('respect_robots', 'off') == 'on'
         max_sitemaps = int(request.form.get('max_sitemaps', 5))
         max_nested_links = int(request.form.get('max_nested_links', 3))
@@ -602,7 +610,11 @@ def generate():
             'output_file': 'llms.txt',
             'backup_existing': True,
             # Add Firecrawl API key to config
-            'firecrawl_api_key': firecrawl_api_key
+            'firecrawl_api_key': firecrawl_api_key,
+            # URL selection, URL rules, canonicalization, hreflang and scraper settings from config.yaml
+            **job_settings,
+            # Batch worker scraper: firecrawl, requests or async (SCRAPER_BACKEND overrides config.yaml)
+            'scraper_backend': os.environ.get('SCRAPER_BACKEND', job_settings.get('scraper_backend', 'firecrawl'))
         }
         
         # DEBUG: Log config keys
@@ -716,7 +728,7 @@ def validate_sitemap():
         
         # Test sitemap parsing
         config = {'sitemap_url': sitemap_url, 'max_sitemaps_to_process': 5}
-        parser = SitemapParser(config)
+        parser = SitemapParser(config, cache=sitemap_cache)
         urls_data = parser.parse_sitemap(sitemap_url)
         
         # Check if it's a sitemap index by looking at the URL
@@ -770,7 +782,7 @@ def analyze_site():
         if not url.endswith(('.xml', 'sitemap')):
             try:
                 from main import SitemapDetector
-                detector = SitemapDetector()
+                detector = SitemapDetector(cache=sitemap_cache)
                 detected_sitemap = detector.detect_sitemap_url(url)
                 sitemap_url = detected_sitemap
             except Exception as e:
@@ -783,7 +795,7 @@ def analyze_site():
             'respect_robots_txt': False
         }
         
-        sitemap_parser = SitemapParser(config)
+        sitemap_parser = SitemapParser(config, cache=sitemap_cache)
         urls_data = sitemap_parser.parse_sitemap(sitemap_url)
         
         # Count different types of URLs
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+asyncio fetch engine for scraping many pages per worker process.
+
+AsyncContentScraper downloads pages on a single event loop with aiohttp and
+hands the HTML to ContentScraper's extraction code, so the scraped content has
+exactly the same shape as with the blocking backend. Selected in the batch
+workers with ``scraper_backend: async``.
+"""
+
+import time
+import asyncio
+import logging
+from urllib.parse import urlparse
+
+from main import CappedBody, ContentScraper, conditional_headers, parse_html
+from http_transport import performance_settings, retry_after_seconds
+from circuit_breaker import CircuitOpenError
+
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncContentScraper:
+    """Scrape pages concurrently on an event loop, with ContentScraper's output contract.
+
+    ``async_max_concurrency`` caps the requests in flight and
+    ``async_per_host_limit`` caps them per host, so hundreds of slow pages can
+    be awaited at once without hammering a single site. With an
+    AdaptiveConcurrency controller the per-host cap follows the host's window
+    instead, up to the controller's ``max_window``. With a LatencyTracker,
+    each request's timeout adapts to the host's recent latencies, and with a
+    CircuitBreaker requests to a failing host fail at once, as in HttpTransport.
+    """
+
+    def __init__(self, config, validator_store=None, scheduler=None, rate_limiter=None, concurrency=None,
+                 latency=None, breaker=None):
+        if not AIOHTTP_AVAILABLE:
+            raise ImportError("aiohttp is required for the async scraper backend (pip install aiohttp)")
+        self.config = config
+        # Extraction, robots.txt, politeness and conditional request handling are shared with the blocking scraper
+        self.extractor = ContentScraper(config, validator_store=validator_store, scheduler=scheduler)
+        self.scheduler = self.extractor.scheduler
+        # Skipped/capped page counts, kept on the wrapped scraper
+        self.download_stats = self.extractor.download_stats
+        self.failures = self.extractor.failures
+        # Optional RedisRateLimiter shared with other workers
+        self.rate_limiter = rate_limiter
+        # Optional AdaptiveConcurrency shared with the other batches of this process
+        self.concurrency = concurrency
+        # Optional LatencyTracker shared with the process's HttpTransport
+        self.latency = latency
+        # Optional CircuitBreaker shared with the process's HttpTransport
+        self.breaker = breaker
+        self.max_concurrency = max(1, config.get('async_max_concurrency', 200))
+        self.per_host_limit = max(1, config.get('async_per_host_limit', 8))
+        if concurrency is not None:
+            self.per_host_limit = concurrency.max_window
+        self.timeout = performance_settings(config)['request_timeout']
+
+    def set_robots_checker(self, robots_checker):
+        """Set robots.txt checker."""
+        self.extractor.set_robots_checker(robots_checker)
+
+    def scrape_urls(self, urls_data, config=None, on_result=None, head_only_urls=()):
+        """Scrape a list of sitemap URL records, returning {loc: content} for the pages that worked.
+
+        Like tasks.scrape_single_url, lastmod and source_type from the record are
+        copied onto the content. ``on_result(url_data, content)`` is called as
+        each page finishes. Pages in ``head_only_urls`` are only read up to
+        </head> (see ContentScraper.scrape_content).
+        """
+        if config is None:
+            config = self.config
+        return asyncio.run(self._scrape_all(list(urls_data), config, on_result, set(head_only_urls)))
+
+    def scrape_content(self, url, config=None):
+        """Scrape a single URL (blocking), for callers that use the ContentScraper interface."""
+        return self.scrape_urls([{'loc': url}], config).get(url)
+
+    def scrape_content_with_lastmod(self, url, lastmod, config=None):
+        """Scrape content from a URL with lastmod date."""
+        return self.scrape_urls([{'loc': url, 'lastmod': lastmod}], config).get(url)
+
+    async def _scrape_all(self, urls_data, config, on_result, head_only_urls):
+        connector = aiohttp.TCPConnector(limit=self.max_concurrency, limit_per_host=self.per_host_limit)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        headers = {'User-Agent': self.extractor.transport.user_agent}
+        results = {}
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=headers) as session:
+
+            async def scrape(url_data):
+                content = await self._scrape_one(session, url_data['loc'], config, url_data['loc'] in head_only_urls)
+                if content:
+                    if url_data.get('lastmod'):
+                        content['lastmod'] = url_data['lastmod']
+                    if url_data.get('source_type'):
+                        content['source_type'] = url_data['source_type']
+                    results[url_data['loc']] = content
+                if on_result:
+                    on_result(url_data, content)
+
+            await asyncio.gather(*(scrape(url_data) for url_data in urls_data))
+        return results
+
+    async def _fetch(self, session, url, config, headers=None, head_only=False):
+        """GET a URL once the politeness scheduler allows it, returning (response, body, head).
+
+        The body is None for a 304 and empty for a skipped non-HTML response;
+        otherwise it is read up to max_page_bytes. With ``head_only``, reading
+        stops at </head> if the head has a description, and ``head`` is the
+        listing content extracted from it.
+        """
+        if self.breaker is not None and self.breaker.is_open(url):
+            raise CircuitOpenError(urlparse(url).netloc.lower())
+        pause = self.scheduler.reserve(url, config.get('request_delay', 1.0))
+        if pause > 0:
+            await asyncio.sleep(pause)
+        if self.rate_limiter is not None:
+            await self._acquire_rate_limit(url)
+        if self.concurrency is None and self.breaker is None:
+            return await self._get(session, url, config, headers, head_only)
+        if self.concurrency is not None:
+            # The slot is held until the body is read, so the window counts whole downloads
+            await self.concurrency.acquire_async(url)
+        # Checked again now that the request is about to go out; earlier ones may have opened the circuit
+        if self.breaker is not None and not self.breaker.allow(url):
+            if self.concurrency is not None:
+                self.concurrency.cancel(url)
+            raise CircuitOpenError(urlparse(url).netloc.lower())
+        answer = {}
+        try:
+            return await self._get(session, url, config, headers, head_only, answer)
+        finally:
+            if self.concurrency is not None:
+                self.concurrency.release(url, latency=answer.get('latency'), status=answer.get('status'),
+                                         retry_after=answer.get('retry_after'))
+            if self.breaker is not None:
+                self.breaker.record(url, answer.get('status'))
+
+    async def _get(self, session, url, config, headers, head_only, answer=None):
+        """The GET behind _fetch; ``answer`` receives the status, Retry-After and time to headers."""
+        kwargs = {}
+        if self.latency is not None:
+            host = urlparse(url).netloc.lower()
+            kwargs['timeout'] = aiohttp.ClientTimeout(total=self.latency.timeout(host, self.timeout))
+        start = time.monotonic()
+        try:
+            response = await session.get(url, headers=headers, **kwargs)
+        finally:
+            if self.latency is not None:
+                self.latency.record(host, time.monotonic() - start)
+                self.latency.record_request(time.monotonic() - start)
+        async with response:
+            if answer is not None:
+                answer.update(latency=time.monotonic() - start, status=response.status,
+                              retry_after=retry_after_seconds(response))
+            if response.status == 304:
+                return response, None, None
+            response.raise_for_status()
+            if self.extractor.page_skip_reason(url, response.headers, config):
+                return response, b'', None
+            body = CappedBody(self.extractor.max_page_bytes(config))
+            chunks = response.content.iter_chunked(65536)
+            if head_only:
+                async for chunk in chunks:
+                    if not body.feed(chunk) or body.head_end() is not None:
+                        break
+                head = self.extractor.head_content(body, url, config, response.headers.get('Content-Type'))
+                if head:
+                    return response, b'', head
+            async for chunk in chunks:
+                if not body.feed(chunk):
+                    break
+        if body.capped:
+            self.extractor.count_download('capped')
+            logger.info(f"Truncated {url} at {body.size} bytes")
+        return response, body.getvalue(), None
+
+    async def _acquire_rate_limit(self, url):
+        """Wait for a slot from the distributed rate limiter without blocking the event loop."""
+        while True:
+            # The Redis round trip is blocking, so it runs in a thread
+            wait = await asyncio.to_thread(self.rate_limiter.reserve, url)
+            if wait is not None:
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                return
+            await asyncio.sleep(1.0)
+
+    async def _scrape_one(self, session, url, config, head_only=False):
+        """Fetch and extract one page; mirrors ContentScraper.scrape_content."""
+        if not self.extractor.is_allowed(url, config):
+            return None
+        try:
+            logger.info(f"Scraping content from: {url}")
+            stored = self.extractor._get_stored_content(url, config)
+            response, body, head = await self._fetch(session, url, config, headers=conditional_headers(stored), head_only=head_only)
+            if body is None and stored:
+                logger.info(f"Not modified since last run, reusing extracted content: {url}")
+                return dict(stored['payload']['content'])
+            if body is None:
+                # 304 without stored content (we sent no validators); fetch again unconditionally
+                response, body, head = await self._fetch(session, url, config, head_only=head_only)
+            if head:
+                return head
+            if not body:
+                return None
+
+            # Parsing and extraction are CPU-bound; keep them off the event loop
+            soup = await asyncio.to_thread(parse_html, body, response.headers.get('Content-Type'))
+            if self.extractor._is_pagination_page(soup, url):
+                logger.info(f"Detected pagination/archive page: {url}")
+                content = await self._scrape_pagination_page(session, soup, url, config)
+            else:
+                logger.info(f"Processing as regular content page: {url}")
+                content = await asyncio.to_thread(self.extractor.extract_regular_page, soup, url, config)
+
+            self.extractor._store_content(url, response, content, config)
+            return content
+
+        except aiohttp.ClientConnectionError as e:
+            # Disconnects aren't OSErrors in aiohttp, so classify_failure can't tell them apart
+            logger.error(f"Error scraping {url}: {e}")
+            self.extractor.record_failure(url, e, reason='connection', retryable=True)
+            return None
+        except Exception as e:
+            logger.error(f"Error scraping {url}: {e}")
+            self.extractor.record_failure(url, e)
+            return None
+
+    async def _scrape_pagination_page(self, session, soup, url, config):
+        """Follow a pagination page's content links concurrently and combine them."""
+        content_links = self.extractor.pagination_links(soup, url, config)
+
+        async def extract(link_url):
+            try:
+                response, body, _ = await self._fetch(session, link_url, config)
+                if not body:
+                    return None
+                nested_soup = await asyncio.to_thread(parse_html, body, response.headers.get('Content-Type'))
+                return self.extractor._extract_page_content(nested_soup, link_url, config)
+            except Exception as e:
+                logger.warning(f"Error scraping nested link {link_url}: {e}")
+                return None
+
+        nested = await asyncio.gather(*(extract(link_url) for link_url in content_links))
+        all_content = [content for content in nested if content]
+        return self.extractor.combine_pagination_content(all_content, soup, url, config)
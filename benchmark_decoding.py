@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for decoding pages before parsing.
+
+Parses a synthetic corpus of pages in several encodings, declared in the
+Content-Type header, in a <meta> tag or not at all, two ways: handing the raw
+bytes to BeautifulSoup (which runs UnicodeDammit's encoding detection on every
+page) and decoding once with decode_html first. Also counts the pages whose
+title came out right with each.
+
+Usage: python benchmark_decoding.py [page_count]
+"""
+
+import sys
+import time
+import random
+
+from bs4 import BeautifulSoup
+
+from main import decode_html
+
+TEXTS = {
+    'en': "The quick brown fox jumps over the lazy dog while the crawler reads the sitemap. ",
+    'de': "Größere Übersichten für schöne Straßen in München und Köln, täglich aktualisiert. ",
+    'fr': "L'été dernier, élèves et enseignants ont découvert où se trouve la bibliothèque. ",
+    'ru': "Съешь же ещё этих мягких французских булок, да выпей чаю и прочитай карту сайта. ",
+    'ja': "日本語のページです。サイトマップを読み込んで、内容を要約します。東京と大阪の天気。",
+    'zh': "这是一个中文页面。我们读取网站地图并总结页面内容，北京和上海的天气。",
+}
+
+# (language, encoding, where the charset is declared)
+SHAPES = [
+    ('en', 'utf-8', 'header'),
+    ('de', 'utf-8', 'meta'),
+    ('fr', 'utf-8', 'none'),
+    ('de', 'cp1252', 'header'),
+    ('fr', 'cp1252', 'meta'),
+    ('de', 'cp1252', 'none'),
+    ('ru', 'windows-1251', 'meta'),
+    ('ru', 'koi8-r', 'header'),
+    ('ja', 'shift_jis', 'meta'),
+    ('ja', 'euc-jp', 'header'),
+    ('zh', 'gbk', 'meta'),
+    ('zh', 'utf-8', 'none'),
+]
+
+
+def build_corpus(count, seed=42):
+    """Generate a reproducible mix of (body, content_type, title) pages of 10-40 KB."""
+    rng = random.Random(seed)
+    for n in range(count):
+        language, encoding, declared = rng.choice(SHAPES)
+        text = TEXTS[language]
+        title = f"{text[:24].strip()} {n}"
+        meta = f'<meta charset="{encoding}">' if declared == 'meta' else ''
+        paragraphs = ''.join(f"<p>{text * rng.randint(3, 8)}</p>\n" for _ in range(rng.randint(20, 60)))
+        html = (f"<!DOCTYPE html><html><head>{meta}<title>{title}</title>"
+                f'<meta name="viewport" content="width=device-width"></head>'
+                f"<body><nav><a href='/'>Home</a></nav><article><h1>{title}</h1>{paragraphs}</article></body></html>")
+        content_type = f'text/html; charset={encoding}' if declared == 'header' else 'text/html'
+        yield html.encode(encoding), content_type, title
+
+
+def run(name, parse, corpus):
+    start = time.perf_counter()
+    correct = sum(1 for body, content_type, title in corpus if parse(body, content_type).title.string == title)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<34} {elapsed:7.2f}s  {elapsed / len(corpus) * 1000:7.2f} ms/page  correct {correct}/{len(corpus)}")
+    return elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 600
+    print(f"Generating {count} pages...")
+    corpus = list(build_corpus(count))
+    megabytes = sum(len(body) for body, _, _ in corpus) / 1e6
+    print(f"{megabytes:.1f} MB in {len(SHAPES)} encoding/declaration mixes\n")
+
+    raw = run('BeautifulSoup(bytes)', lambda body, content_type: BeautifulSoup(body, 'html.parser'), corpus)
+    decoded = run('decode_html + BeautifulSoup(str)',
+                  lambda body, content_type: BeautifulSoup(decode_html(body, content_type), 'html.parser'), corpus)
+    print(f"\nSpeedup: {raw / decoded:.2f}x")
+
+    start = time.perf_counter()
+    for body, content_type, _ in corpus:
+        decode_html(body, content_type)
+    print(f"decode_html alone: {(time.perf_counter() - start) / len(corpus) * 1000:.3f} ms/page")
+
+
+if __name__ == "__main__":
+    main()
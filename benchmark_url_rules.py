@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for the URL include/exclude rules.
+
+Compares the compiled UrlRuleMatcher against checking each rule with its own
+re.search call, over a synthetic mix of content, archive and asset URLs.
+
+Usage: python benchmark_url_rules.py [url_count]
+"""
+
+import re
+import sys
+import time
+import random
+
+from url_pipeline import UrlRuleMatcher, DEFAULT_URL_RULES
+
+
+def build_urls(count, seed=42):
+    """Generate a reproducible mix of URLs resembling a large WordPress/shop sitemap."""
+    rng = random.Random(seed)
+    shapes = [
+        'https://example.com/blog/{slug}-{n}/',
+        'https://example.com/{year}/{month:02d}/{slug}-{n}/',
+        'https://example.com/products/{slug}-{n}',
+        'https://example.com/docs/{slug}/{slug}-{n}',
+        'https://example.com/tag/{slug}/',
+        'https://example.com/category/{slug}/page/{page}/',
+        'https://example.com/author/{slug}/',
+        'https://example.com/wp-content/uploads/{year}/{month:02d}/{slug}-{n}.jpg',
+        'https://example.com/files/{slug}-{n}.pdf',
+    ]
+    words = ['guide', 'pricing', 'release', 'python', 'scraper', 'sitemap', 'seo', 'tips']
+    for n in range(count):
+        yield rng.choice(shapes).format(
+            slug=f"{rng.choice(words)}-{rng.choice(words)}", n=n,
+            year=rng.randint(2015, 2025), month=rng.randint(1, 12), page=rng.randint(2, 50))
+
+
+def naive_matcher(rules):
+    """One re.search per rule, the way URL checks are done elsewhere in the code."""
+    patterns = []
+    for rule in rules['exclude']:
+        if rule.startswith('re:'):
+            patterns.append(re.compile(rule[3:], re.IGNORECASE))
+        else:
+            # Same semantics as the glob, searched without anchors
+            patterns.append(re.compile(re.escape(rule.strip('*')).replace(r'\[0\-9\]', '[0-9]'), re.IGNORECASE))
+
+    def matches(url):
+        return not any(pattern.search(url) for pattern in patterns)
+
+    return matches
+
+
+def run(name, matches, urls):
+    start = time.perf_counter()
+    kept = sum(1 for url in urls if matches(url))
+    elapsed = time.perf_counter() - start
+    print(f"{name:<28} {elapsed:7.3f}s  {elapsed / len(urls) * 1e9:8.0f} ns/URL  kept {kept}/{len(urls)}")
+    return kept
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    print(f"Generating {count} URLs...")
+    urls = list(build_urls(count))
+
+    matcher = UrlRuleMatcher(DEFAULT_URL_RULES['include'], DEFAULT_URL_RULES['exclude'])
+    print(f"{len(matcher.exclude)} exclude rules\n")
+    compiled = run('compiled UrlRuleMatcher', matcher.matches, urls)
+    naive = run('re.search per rule', naive_matcher(DEFAULT_URL_RULES), urls)
+    if compiled != naive:
+        print(f"⚠️ Matchers disagree: {compiled} vs {naive} URLs kept")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Per-host circuit breaker for the fetch path.
+
+When a site starts timing out, refusing connections or answering 403/429/5xx,
+every remaining URL would otherwise wait out its timeout and retries. The
+breaker counts consecutive failures per host and, past a threshold, opens:
+requests to that host fail at once with CircuitOpenError. After a cool-off
+one probe request is let through (half-open); its success closes the breaker
+again, its failure re-opens it. Opening is published in Redis so the other
+workers stop sending requests to the host as well.
+"""
+
+import json
+import time
+import logging
+import threading
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Answers that count as the host failing (blocking us or broken), rather than a page problem
+FAILURE_STATUSES = {403, 429, 500, 502, 503, 504}
+
+# How often a closed breaker looks in Redis for a host opened by another worker
+REMOTE_CHECK_INTERVAL = 1.0
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of sending a request to a host whose circuit is open."""
+
+    def __init__(self, host):
+        super().__init__(f"Circuit open for {host}: too many recent failures, not sending requests")
+        self.host = host
+
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker per host, shared by every thread of a process.
+
+    ``failure_threshold`` consecutive failures (no answer, or a status in
+    FAILURE_STATUSES) open a host's circuit for ``recovery_timeout`` seconds;
+    then a single probe is allowed through. With ``redis_conn`` an open
+    circuit is shared with other processes until its recovery timeout ends.
+    """
+
+    def __init__(self, redis_conn=None, failure_threshold=5, recovery_timeout=30.0, prefix='circuit'):
+        self.redis = redis_conn
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.recovery_timeout = recovery_timeout
+        self.prefix = prefix
+        self._hosts = {}
+        self._remote_checked = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _host(url):
+        return urlparse(url).netloc.lower()
+
+    def _state(self, host):
+        return self._hosts.setdefault(host, {'state': CLOSED, 'failures': 0, 'opened_at': 0.0, 'probe_at': None})
+
+    def state(self, url):
+        """Current state of this URL's host: 'closed', 'open' or 'half_open'."""
+        host = self._host(url)
+        self._check_remote(host)
+        with self._lock:
+            return self._state(host)['state']
+
+    def is_open(self, url):
+        """Check whether requests to this URL's host would be refused right now (without taking a probe)."""
+        host = self._host(url)
+        self._check_remote(host)
+        with self._lock:
+            state = self._state(host)
+            if state['state'] == OPEN:
+                return time.time() - state['opened_at'] < self.recovery_timeout
+            return state['state'] == HALF_OPEN and state['probe_at'] is not None and not self._probe_lost(state)
+
+    def open_hosts(self):
+        """Hosts whose circuit is currently open or half-open, for progress reports."""
+        with self._lock:
+            return sorted(host for host, state in self._hosts.items() if state['state'] != CLOSED)
+
+    def allow(self, url):
+        """Check whether a request to this URL's host may be sent; a half-open host allows one probe."""
+        host = self._host(url)
+        self._check_remote(host)
+        with self._lock:
+            state = self._state(host)
+            if state['state'] == OPEN:
+                if time.time() - state['opened_at'] < self.recovery_timeout:
+                    return False
+                state['state'] = HALF_OPEN
+                state['probe_at'] = None
+            if state['state'] == HALF_OPEN:
+                if state['probe_at'] is not None and not self._probe_lost(state):
+                    return False
+                state['probe_at'] = time.time()
+                logger.info(f"Circuit for {host} half-open, sending a probe request")
+            return True
+
+    def _probe_lost(self, state):
+        # A probe that never reported back (e.g. the caller crashed) doesn't block the host forever
+        return state['probe_at'] is not None and time.time() - state['probe_at'] >= self.recovery_timeout
+
+    def record(self, url, status=None):
+        """Report how a request went: ``status`` is the HTTP status, None if there was no answer."""
+        if status is None or status in FAILURE_STATUSES:
+            self._record_failure(self._host(url), status)
+        else:
+            self._record_success(self._host(url))
+
+    def _record_success(self, host):
+        with self._lock:
+            state = self._state(host)
+            was_open = state['state'] != CLOSED
+            state.update(state=CLOSED, failures=0, probe_at=None)
+        if was_open:
+            logger.info(f"Circuit for {host} closed again")
+            self._publish(host, None)
+
+    def _record_failure(self, host, status):
+        with self._lock:
+            state = self._state(host)
+            state['failures'] += 1
+            if state['state'] == OPEN:
+                return
+            if state['state'] == CLOSED and state['failures'] < self.failure_threshold:
+                return
+            state.update(state=OPEN, opened_at=time.time(), probe_at=None)
+            opened_at = state['opened_at']
+            failures = state['failures']
+        reason = 'no answer' if status is None else f'HTTP {status}'
+        logger.warning(f"Circuit for {host} opened after {failures} failures (last: {reason}); "
+                       f"refusing requests for {self.recovery_timeout:.0f}s")
+        self._publish(host, opened_at)
+
+    def _publish(self, host, opened_at):
+        """Share an opened (or closed, with None) circuit with the other workers."""
+        if self.redis is None:
+            return
+        key = f'{self.prefix}:{host}'
+        try:
+            if opened_at is None:
+                self.redis.delete(key)
+            else:
+                self.redis.setex(key, max(1, int(self.recovery_timeout)), json.dumps({'opened_at': opened_at}))
+        except Exception as e:
+            logger.warning(f"Could not share circuit state for {host}: {e}")
+
+    def _check_remote(self, host):
+        """Adopt a circuit another worker opened for this host."""
+        if self.redis is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if self._state(host)['state'] != CLOSED or now - self._remote_checked.get(host, float('-inf')) < REMOTE_CHECK_INTERVAL:
+                return
+            self._remote_checked[host] = now
+        try:
+            value = self.redis.get(f'{self.prefix}:{host}')
+        except Exception as e:
+            logger.warning(f"Circuit state unavailable: {e}")
+            return
+        if not value:
+            return
+        opened_at = json.loads(value)['opened_at']
+        with self._lock:
+            state = self._state(host)
+            if state['state'] == CLOSED:
+                state.update(state=OPEN, opened_at=opened_at, probe_at=None)
+                logger.info(f"Circuit for {host} opened by another worker")
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Adaptive per-host concurrency for the page fetchers.
+
+AdaptiveConcurrency keeps a congestion window per target host, the way TCP
+does (AIMD): every answer that comes back quickly and successfully widens the
+window a little, while a 429/503, a Retry-After header, a timeout or a latency
+spike halves it. A CDN-backed site quickly gets many requests in flight; a
+struggling shared-hosting box is held at one or two.
+"""
+
+import time
+import asyncio
+import logging
+import threading
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# Answers that mean the host wants us to slow down
+OVERLOAD_STATUSES = {429, 503}
+
+# Latencies this close to the baseline are never treated as a spike, however small the baseline
+MIN_SPIKE_SECONDS = 0.05
+
+# Weight of a new latency sample in the host's baseline (exponentially weighted moving average)
+BASELINE_WEIGHT = 0.1
+
+
+class AdaptiveConcurrency:
+    """AIMD concurrency window per host, shared by every thread (and event loop) of a process.
+
+    A host starts at ``initial`` requests in flight. Each successful answer
+    adds ``increase / window``, so the window grows by about ``increase`` per
+    window's worth of answers, up to ``max_window``. An answer with status
+    429/503 or a Retry-After header, a failed request, or a latency above
+    ``latency_spike`` times the host's baseline multiplies the window by
+    ``decrease`` (not below ``min_window``), at most once per ``cooldown``
+    seconds so one burst of failures counts as one congestion event.
+    """
+
+    def __init__(self, initial=4, min_window=1, max_window=40, increase=1.0, decrease=0.5,
+                 latency_spike=2.0, cooldown=1.0):
+        self.min_window = max(1, int(min_window))
+        self.max_window = max(self.min_window, int(max_window))
+        self.initial = min(max(float(initial), self.min_window), self.max_window)
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_spike = latency_spike
+        self.cooldown = cooldown
+        self._windows = {}
+        self._in_flight = {}
+        self._baselines = {}
+        self._last_decrease = {}
+        # Coroutines waiting for a slot, per host: (event loop, future) pairs
+        self._waiters = {}
+        self._condition = threading.Condition()
+
+    @staticmethod
+    def _host(url):
+        return urlparse(url).netloc.lower()
+
+    def window(self, url):
+        """Current window (allowed requests in flight) for this URL's host."""
+        with self._condition:
+            return self._windows.get(self._host(url), self.initial)
+
+    def windows(self):
+        """Current window of every host seen so far, for progress reports."""
+        with self._condition:
+            return {host: round(window, 1) for host, window in self._windows.items()}
+
+    def try_acquire(self, url):
+        """Take a slot for this URL's host if its window has room, without waiting."""
+        host = self._host(url)
+        with self._condition:
+            return self._take(host)
+
+    def acquire(self, url):
+        """Block until this URL's host has room in its window, then take a slot."""
+        host = self._host(url)
+        with self._condition:
+            while not self._take(host):
+                self._condition.wait()
+
+    async def acquire_async(self, url):
+        """Wait on the event loop until this URL's host has room in its window, then take a slot."""
+        host = self._host(url)
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._condition:
+                if self._take(host):
+                    return
+                waiter = loop.create_future()
+                self._waiters.setdefault(host, []).append((loop, waiter))
+            await waiter
+
+    def _wake(self, host):
+        """Let the coroutines waiting on this host try again (called with the lock held)."""
+        for loop, waiter in self._waiters.pop(host, ()):
+            try:
+                loop.call_soon_threadsafe(_resolve, waiter)
+            except RuntimeError:
+                # The waiter's event loop has been closed
+                pass
+
+    def _take(self, host):
+        window = self._windows.setdefault(host, self.initial)
+        in_flight = self._in_flight.get(host, 0)
+        if in_flight >= int(window):
+            return False
+        self._in_flight[host] = in_flight + 1
+        return True
+
+    def cancel(self, url):
+        """Give back a slot that was taken but not used for a request."""
+        host = self._host(url)
+        with self._condition:
+            self._in_flight[host] = max(0, self._in_flight.get(host, 0) - 1)
+            self._condition.notify_all()
+            self._wake(host)
+
+    def release(self, url, latency=None, status=None, retry_after=None):
+        """Give back a slot and adjust the window from how the request went.
+
+        ``status`` None means the request failed without an answer (connection
+        error or timeout). ``latency`` is the time to the response headers.
+        """
+        host = self._host(url)
+        with self._condition:
+            self._in_flight[host] = max(0, self._in_flight.get(host, 0) - 1)
+            window = self._windows.get(host, self.initial)
+            baseline = self._baselines.get(host)
+            spike = (latency is not None and baseline is not None
+                     and latency > max(baseline * self.latency_spike, baseline + MIN_SPIKE_SECONDS))
+            if latency is not None and status is not None:
+                self._baselines[host] = latency if baseline is None else baseline + BASELINE_WEIGHT * (latency - baseline)
+
+            if status is None or status in OVERLOAD_STATUSES or retry_after is not None or spike:
+                now = time.monotonic()
+                if now - self._last_decrease.get(host, float('-inf')) >= self.cooldown:
+                    self._last_decrease[host] = now
+                    reason = 'failed' if status is None else 'slow' if spike and status < 400 else str(status)
+                    window = max(self.min_window, window * self.decrease)
+                    logger.info(f"Concurrency for {host} reduced to {window:.1f} ({reason})")
+            elif status < 500:
+                window = min(self.max_window, window + self.increase / window)
+            self._windows[host] = window
+            self._condition.notify_all()
+            self._wake(host)
+
+
+def _resolve(waiter):
+    if not waiter.done():
+        waiter.set_result(None)
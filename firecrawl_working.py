@@ -11,6 +11,8 @@ from datetime import datetime
 from typing import Dict, List, Optional, Any
 from urllib.parse import urlparse
 
+from http_transport import classify_failure
+
 try:
     from firecrawl import FirecrawlApp
     FIRECRAWL_AVAILABLE = True
@@ -53,6 +55,8 @@ class WorkingFirecrawlScraper:
             raise ImportError("Firecrawl not installed. Run: pip install firecrawl-py")
         
         self.app = FirecrawlApp(api_key=self.api_key)
+        # Why the last attempt at a URL failed: {url: (reason, retryable)}, see classify_failure
+        self.failures = {}
         logger.info("Working Firecrawl scraper initialized")
     
     def scrape_content(self, url: str, config: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
@@ -73,6 +77,8 @@ class WorkingFirecrawlScraper:
             
             if not result or not result.success:
                 logger.warning(f"Firecrawl failed to scrape {url}")
+                # Firecrawl gives no reason, so it may well work on a later try
+                self.failures[url] = ('unknown', True)
                 return None
             
             # Extract content from result
@@ -100,6 +106,7 @@ class WorkingFirecrawlScraper:
             
         except Exception as e:
             logger.error(f"Error scraping {url} with Firecrawl: {e}")
+            self.failures[url] = classify_failure(e)
             return None
     
     def scrape_content_with_lastmod(self, url: str, lastmod: str, config: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
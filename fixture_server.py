@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Local HTTP fixture server used by the offline test scripts.
+
+Serves canned responses from a dict of path -> route so sitemap, robots.txt
+and page handling can be exercised without touching real websites.
+"""
+
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+class FixtureServer:
+    """Serve canned responses on localhost and record every request made."""
+
+    def __init__(self, routes=None):
+        # path -> body (bytes/str) or dict(body=..., status=..., headers=..., handler=callable)
+        self.routes = routes if routes is not None else {}
+        self.requests = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def url(self, path):
+        return self.base_url + path
+
+    def hits(self, path, method=None):
+        """Number of requests received for a path."""
+        with self._lock:
+            return sum(1 for m, p, _ in self.requests if p == path and (method is None or m == method))
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _make_handler(self):
+        fixture = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _respond(self, send_body):
+                with fixture._lock:
+                    fixture.requests.append((self.command, self.path, dict(self.headers)))
+                route = fixture.routes.get(self.path)
+                if route is None:
+                    route = {'status': 404, 'body': b'not found'}
+                elif not isinstance(route, dict):
+                    route = {'body': route}
+                if route.get('handler'):
+                    route = route['handler'](self.headers)
+
+                body = route.get('body', b'')
+                if isinstance(body, str):
+                    body = body.encode('utf-8')
+                self.send_response(route.get('status', 200))
+                headers = {'Content-Type': 'application/xml', 'Content-Length': str(len(body))}
+                headers.update(route.get('headers', {}))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                if send_body and body:
+                    try:
+                        self.wfile.write(body)
+                    except (BrokenPipeError, ConnectionResetError):
+                        pass
+
+            def do_GET(self):
+                self._respond(send_body=True)
+
+            def do_HEAD(self):
+                self._respond(send_body=False)
+
+        return Handler
+
+
+def urlset(locs):
+    """Build a urlset document for the given locations."""
+    entries = ''.join(f"<url><loc>{loc}</loc></url>" for loc in locs)
+    return ('<?xml version="1.0" encoding="UTF-8"?>'
+            '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+            f'{entries}</urlset>')
+
+
+def sitemapindex(locs):
+    """Build a sitemap index document for the given child sitemap locations."""
+    entries = ''.join(f"<sitemap><loc>{loc}</loc></sitemap>" for loc in locs)
+    return ('<?xml version="1.0" encoding="UTF-8"?>'
+            '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+            f'{entries}</sitemapindex>')
+
+
+def connect_test_redis():
+    """Redis connection for tests: REDIS_URL if reachable, else fakeredis if installed, else None."""
+    import os
+    import redis
+    try:
+        conn = redis.Redis.from_url(os.environ.get('REDIS_URL', 'redis://localhost:6379/15'))
+        conn.ping()
+        return conn
+    except Exception:
+        pass
+    try:
+        import fakeredis
+        return fakeredis.FakeRedis()
+    except ImportError:
+        return None
@@ -0,0 +1,591 @@
+#!/usr/bin/env python3
+"""
+Shared HTTP layer for every fetch made while generating an llms.txt file.
+
+HttpTransport gives each thread its own keep-alive session, retries transient
+failures with jittered exponential backoff, applies the timeouts configured
+under ``performance`` and sits in front of the optional on-disk ResponseCache,
+so robots.txt, sitemaps, pages and site analysis all get the same behaviour.
+Responses served from the cache look like ordinary ``requests`` responses,
+streamed or not.
+"""
+
+import io
+import time
+import socket
+import random
+import logging
+import threading
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from response_cache import ResponseCache
+from latency import LatencyTracker, HedgeBudget
+from circuit_breaker import CircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = 'LLMs.txt Generator Bot (+https://github.com/your-repo)'
+
+CONDITIONAL_HEADERS = ('If-None-Match', 'If-Modified-Since')
+
+# Statuses worth retrying: rate limiting and temporary server trouble
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Longest single backoff, whatever Retry-After or the exponential schedule say
+MAX_RETRY_WAIT = 30.0
+
+# Keep-alive connections a thread keeps per host (a streamed body plus a request made while reading it)
+CONNECTIONS_PER_HOST = 2
+
+# Threads that send the duplicates of hedged requests for all callers
+HEDGE_WORKERS = 32
+
+DEFAULT_PERFORMANCE = {
+    'request_timeout': 30,
+    'connection_pool_size': 20,
+    'max_retries': 3,
+    'retry_delay': 1,
+    'adaptive_timeouts': True,
+    'hedge_requests': False,
+    'hedge_budget': 0.05,
+}
+
+
+def performance_settings(config):
+    """The ``performance`` config section with defaults filled in."""
+    return {**DEFAULT_PERFORMANCE, **(config.get('performance') or {})}
+
+
+def retry_after_seconds(response):
+    """Seconds asked for by a Retry-After header (delta-seconds or HTTP date), or None."""
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def classify_failure(error):
+    """Why a fetch failed and whether trying again later may help, as (reason, retryable).
+
+    Timeouts, connection errors, 429 and 5xx answers, and requests refused by
+    an open circuit breaker are retryable; other HTTP errors (404, 403, ...)
+    and anything else (e.g. unparseable content) are not. Works with requests
+    exceptions and aiohttp's ClientResponseError.
+    """
+    if isinstance(error, CircuitOpenError):
+        return 'circuit_open', True
+    response = getattr(error, 'response', None)
+    status = getattr(response, 'status_code', None) or getattr(error, 'status', None)
+    if isinstance(status, int):
+        return f'http_{status}', status in RETRY_STATUSES
+    if isinstance(error, (requests.Timeout, TimeoutError)):
+        return 'timeout', True
+    if isinstance(error, (requests.ConnectionError, requests.exceptions.ChunkedEncodingError, ConnectionError, OSError)):
+        return 'connection', True
+    return 'error', False
+
+
+class CachingReader(io.RawIOBase):
+    """Raw body stream that copies the decoded bytes into a CacheWriter as they are read.
+
+    The entry is committed when the body has been read to EOF and discarded
+    if the response is closed before that. A partial body can't stand in for
+    the full page, so pages read only up to </head> (ContentScraper's
+    head_only) or cut off at max_page_bytes are not cached and are downloaded
+    again on the next run; a page cached from a full read serves both.
+    """
+
+    def __init__(self, source, writer):
+        self.source = source
+        self.writer = writer
+        self.source.decode_content = True
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.source.read(len(buffer))
+        if not data:
+            self.writer.commit()
+            return 0
+        self.writer.write(data)
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            self.writer.abort()
+            self.source.close()
+        super().close()
+
+    def release_conn(self):
+        self.source.release_conn()
+
+
+class SlotReader(io.RawIOBase):
+    """Raw body stream that runs ``release`` once, when the body is read to EOF or closed.
+
+    Streamed responses hold their host's concurrency slot through it, so the
+    window counts whole downloads rather than just the wait for headers.
+    """
+
+    def __init__(self, source, release):
+        self.source = source
+        self.source.decode_content = True
+        self._release = release
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.source.read(len(buffer))
+        if not data:
+            self._done()
+            return 0
+        buffer[:len(data)] = data
+        return len(data)
+
+    def _done(self):
+        release, self._release = self._release, None
+        if release is not None:
+            release()
+
+    def close(self):
+        if not self.closed:
+            self._done()
+            self.source.close()
+        super().close()
+
+    def release_conn(self):
+        self.source.release_conn()
+
+
+class HttpTransport:
+    """Pooled, retrying HTTP client plus response cache, shared by every fetcher.
+
+    One transport is meant to be shared by all classes in a process: each
+    thread gets its own ``requests.Session`` (sessions are not thread-safe),
+    reused for every request that thread makes, so robots.txt, sitemaps and
+    pages of one site ride the same keep-alive connections. A thread keeps
+    connections to up to ``pool_size`` hosts.
+
+    Connection errors, timeouts and 429/5xx answers are retried up to
+    ``max_retries`` times, waiting a random time up to
+    ``retry_delay * 2**attempt`` (full jitter), or the server's Retry-After.
+
+    With an AdaptiveConcurrency controller, each attempt waits for a slot in
+    its host's window and reports its status and time to headers back to it.
+    A streamed response keeps its slot until its body is read or it is closed.
+
+    With a CircuitBreaker, each request first checks that its host's circuit
+    isn't open (raising CircuitOpenError at once if it is) and, once its
+    retries are over, reports whether the host answered.
+
+    With a LatencyTracker, requests that don't pass a timeout get one derived
+    from the host's recent p99. With a HedgeBudget as well, a GET still waiting
+    for headers after the host's p95 is sent a second time from the hedge pool
+    (budget and host window permitting); the first answer wins and the other is
+    closed, or cut off if it is the original still waiting on the calling thread.
+
+    With a cache, fresh entries are served from disk, stale entries are
+    revalidated with their own ETag/Last-Modified (a 304 refreshes the entry),
+    and 200 responses are stored once the caller has read them to the end
+    (see CachingReader for reads that stop early). A caller's own
+    If-None-Match / If-Modified-Since are answered from the cached entry, so a
+    conditional request still gets a 304 when its validators are current.
+    """
+
+    def __init__(self, cache=None, user_agent=USER_AGENT, timeout=30, pool_size=20, max_retries=3, retry_delay=1.0,
+                 concurrency=None, latency=None, hedge_budget=None, breaker=None):
+        self.cache = cache
+        self.concurrency = concurrency
+        self.breaker = breaker
+        self.latency = latency
+        self.hedge_budget = hedge_budget if latency is not None else None
+        self._hedge_pool = None
+        self._hedge_pool_lock = threading.Lock()
+        self.user_agent = user_agent
+        self.timeout = timeout
+        self.pool_size = max(1, int(pool_size))
+        self.max_retries = max(0, int(max_retries))
+        self.retry_delay = retry_delay
+        self._local = threading.local()
+
+    @classmethod
+    def from_config(cls, config, user_agent=USER_AGENT):
+        """Build a transport from the ``performance`` and ``response_cache`` config sections."""
+        settings = performance_settings(config)
+        latency = None
+        if settings['adaptive_timeouts'] or settings['hedge_requests']:
+            latency = LatencyTracker(timeout_multiplier=4.0 if settings['adaptive_timeouts'] else None)
+        return cls(cache=ResponseCache.from_config(config),
+                   user_agent=user_agent,
+                   timeout=settings['request_timeout'],
+                   pool_size=settings['connection_pool_size'],
+                   max_retries=settings['max_retries'],
+                   retry_delay=settings['retry_delay'],
+                   latency=latency,
+                   hedge_budget=HedgeBudget(settings['hedge_budget']) if settings['hedge_requests'] else None)
+
+    @property
+    def session(self):
+        """The calling thread's session, created on first use."""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update({'User-Agent': self.user_agent})
+            # Retries are handled in _request, where they can back off with jitter
+            adapter = _HedgingAdapter(pool_connections=self.pool_size, pool_maxsize=CONNECTIONS_PER_HOST, max_retries=0)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self._local.session = session
+        return session
+
+    def _backoff(self, attempt, response=None):
+        """Seconds to wait before retry number ``attempt`` (0-based)."""
+        wait = random.uniform(0, self.retry_delay * (2 ** attempt))
+        if response is not None:
+            retry_after = retry_after_seconds(response)
+            if retry_after is not None:
+                wait = retry_after
+        return min(wait, MAX_RETRY_WAIT)
+
+    def _request(self, method, url, timeout=None, **kwargs):
+        """Send a request on this thread's session, retrying transient failures."""
+        if timeout is None:
+            timeout = self.timeout if self.latency is None else self.latency.timeout(_host(url), self.timeout)
+        if self.breaker is not None and not self.breaker.allow(url):
+            raise CircuitOpenError(_host(url))
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            try:
+                response = self._send(method, url, timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if last_attempt:
+                    if self.breaker is not None:
+                        self.breaker.record(url)
+                    raise
+                wait = self._backoff(attempt)
+                logger.warning(f"{method} {url} failed ({e.__class__.__name__}), retrying in {wait:.1f}s")
+            else:
+                if response.status_code not in RETRY_STATUSES or last_attempt:
+                    # One outcome per request, however many attempts it took
+                    if self.breaker is not None:
+                        self.breaker.record(url, response.status_code)
+                    return response
+                wait = self._backoff(attempt, response)
+                response.close()
+                logger.warning(f"{method} {url} returned {response.status_code}, retrying in {wait:.1f}s")
+            time.sleep(wait)
+
+    def _send(self, method, url, timeout, **kwargs):
+        """One attempt, hedged with a duplicate request if the host is slower than usual."""
+        if self.latency is None:
+            return self._attempt(method, url, timeout, **kwargs)
+        start = time.monotonic()
+        delay = None
+        if self.hedge_budget is not None and method == 'GET':
+            self.hedge_budget.earn()
+            if self.hedge_budget.available():
+                delay = self.latency.percentile(_host(url), 95)
+        if delay is None:
+            try:
+                return self._attempt(method, url, timeout, **kwargs)
+            finally:
+                self.latency.record_request(time.monotonic() - start)
+        return self._hedged(method, url, timeout, delay, start, **kwargs)
+
+    def _hedged(self, method, url, timeout, delay, start, **kwargs):
+        """Send the attempt on the calling thread while the hedge pool waits ``delay`` to send a duplicate.
+
+        If the duplicate answers first, the original's connection is shut down so
+        this thread returns the duplicate's response instead of waiting.
+        """
+        race = _HedgeRace()
+        hedge = self._hedge_executor().submit(self._hedge, race, method, url, timeout, delay, **kwargs)
+        response = error = None
+        _hedging.race = race
+        try:
+            response = self._attempt(method, url, timeout, **kwargs)
+        except Exception as e:
+            error = e
+        finally:
+            _hedging.race = None
+            race.done.set()
+        observed = time.monotonic() - start
+        if response is not None and race.finish('primary'):
+            self.latency.record_request(observed)
+            return response
+        if response is not None:
+            # The duplicate got in first; its answer is the one used
+            response.close()
+
+        try:
+            hedged = hedge.result()
+        except Exception:
+            hedged = None
+        if hedged is None:
+            self.latency.record_request(observed)
+            raise error
+        logger.debug(f"Hedged request answered first: {url}")
+        # Cut off (or failed) at ``observed``, the original would have taken at least that long
+        self.latency.record_request(race.answered - start, max(observed, race.answered - start))
+        return hedged
+
+    def _hedge(self, race, method, url, timeout, delay, **kwargs):
+        """Duplicate of a hedged request, sent if the original is still waiting after ``delay``.
+
+        Returns the response if it answered first, None otherwise.
+        """
+        if race.done.wait(delay) or not self._take_hedge_slot(url):
+            return None
+        try:
+            response = self._attempt(method, url, timeout, slot_taken=True, **kwargs)
+        except Exception:
+            self.latency.count_hedge(False)
+            raise
+        won = race.finish('hedge')
+        self.latency.count_hedge(won)
+        if not won:
+            response.close()
+            return None
+        race.abort()
+        return response
+
+    def _take_hedge_slot(self, url):
+        """Check the budget and the host's window for one more request."""
+        if self.concurrency is not None and not self.concurrency.try_acquire(url):
+            return False
+        if not self.hedge_budget.spend():
+            if self.concurrency is not None:
+                self.concurrency.cancel(url)
+            return False
+        return True
+
+    def _hedge_executor(self):
+        with self._hedge_pool_lock:
+            if self._hedge_pool is None:
+                self._hedge_pool = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix='hedge')
+            return self._hedge_pool
+
+    def _attempt(self, method, url, timeout, slot_taken=False, **kwargs):
+        """One request on this thread's session, holding a slot of the host's concurrency window
+        until the body has been downloaded (``slot_taken`` if the caller already holds one)."""
+        if self.concurrency is not None and not slot_taken:
+            self.concurrency.acquire(url)
+        start = time.monotonic()
+        response = None
+        try:
+            response = self.session.request(method, url, timeout=timeout, **kwargs)
+            return response
+        finally:
+            latency = time.monotonic() - start
+            if self.latency is not None:
+                self.latency.record(_host(url), latency)
+            if self.concurrency is not None:
+                if response is None:
+                    self.concurrency.release(url)
+                else:
+                    release = partial(self.concurrency.release, url, latency=latency, status=response.status_code,
+                                      retry_after=retry_after_seconds(response))
+                    if kwargs.get('stream'):
+                        # The body is still to be read; the slot goes back at EOF or on close
+                        response.raw = SlotReader(response.raw, release)
+                    else:
+                        release()
+
+    def head(self, url, timeout=None, headers=None):
+        """HEAD request; never cached."""
+        return self._request('HEAD', url, timeout=timeout, headers=headers, allow_redirects=False)
+
+    def get(self, url, timeout=None, stream=False, headers=None):
+        """GET a URL through the response cache, if there is one."""
+        if self.cache is None:
+            return self._request('GET', url, timeout=timeout, stream=stream, headers=headers)
+
+        headers = dict(headers or {})
+        key = ResponseCache.key(url, CaseInsensitiveDict({**self.session.headers, **headers}))
+        entry = self.cache.get(key)
+        if entry and self.cache.is_fresh(entry):
+            response = self._cached_response(url, entry, headers, stream)
+            if response is not None:
+                logger.debug(f"Response cache hit: {url}")
+                return response
+
+        request_headers = headers
+        if entry:
+            # Revalidate with the cache's own validators; the caller's are answered from the entry
+            request_headers = {name: value for name, value in headers.items() if name not in CONDITIONAL_HEADERS}
+            if entry.get('etag'):
+                request_headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                request_headers['If-Modified-Since'] = entry['last_modified']
+
+        response = self._request('GET', url, timeout=timeout, stream=True, headers=request_headers)
+        if response.status_code == 304 and entry:
+            response.close()
+            entry = self.cache.refresh(key, entry, response.headers)
+            cached = self._cached_response(url, entry, headers, stream)
+            if cached is not None:
+                logger.debug(f"Response cache revalidated: {url}")
+                return cached
+            # Body evicted in the meantime; fetch it again in full
+            response = self._request('GET', url, timeout=timeout, stream=True, headers=headers)
+
+        if self._is_cacheable(response):
+            response.raw = CachingReader(response.raw, self.cache.writer(key, url, response.status_code, response.headers))
+        if not stream:
+            # Same as a non-streamed requests.get: read the body now (which stores it) and release the connection
+            response.content
+        return response
+
+    @staticmethod
+    def _is_cacheable(response):
+        cache_control = response.headers.get('Cache-Control', '').lower()
+        return response.status_code == 200 and 'no-store' not in cache_control
+
+    def _cached_response(self, url, entry, request_headers, stream):
+        """Build a response from a cache entry, or a 304 if the caller's validators match it."""
+        response = requests.Response()
+        response.url = url
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.from_cache = True
+        if _validators_match(entry, request_headers):
+            response.status_code = 304
+            response.reason = 'Not Modified'
+            response._content = b''
+            response._content_consumed = True
+            return response
+
+        body = self.cache.open_body(entry)
+        if body is None:
+            return None
+        response.status_code = entry['status']
+        response.reason = 'OK'
+        response.raw = body
+        if not stream:
+            with body:
+                response._content = body.read()
+            response._content_consumed = True
+        return response
+
+
+def _host(url):
+    return urlparse(url).netloc.lower()
+
+
+# The race of the hedged request whose original is being sent on this thread, if any
+_hedging = threading.local()
+
+
+class _HedgeRace:
+    """The original of a hedged request and its duplicate: which answered first, and
+    the original's connection, so the duplicate can cut it off."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.done = threading.Event()
+        self.winner = None
+        self.answered = None
+        self._connection = None
+
+    def finish(self, attempt):
+        """Claim the race for ``attempt``; True if it answered first."""
+        with self._lock:
+            if self.winner is None:
+                self.winner = attempt
+                self.answered = time.monotonic()
+            return self.winner == attempt
+
+    def attach(self, connection):
+        """Remember the original's connection, shutting it down if the duplicate has already won."""
+        with self._lock:
+            self._connection = connection
+            lost = self.winner == 'hedge'
+        if lost:
+            _shutdown(connection)
+
+    def abort(self):
+        """Shut down the original's connection, so the thread waiting on it gives up."""
+        with self._lock:
+            connection = self._connection
+        if connection is not None:
+            _shutdown(connection)
+
+
+def _shutdown(connection):
+    sock = connection.sock
+    if sock is not None:
+        try:
+            # The plain socket's shutdown, so a TLS socket isn't torn down under its reader
+            socket.socket.shutdown(sock, socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+class _RaceConnectionMixin:
+    """Hands the connection of a hedged request's original to its race."""
+
+    def connect(self):
+        super().connect()
+        self._join_race()
+
+    def request(self, *args, **kwargs):
+        self._join_race()
+        return super().request(*args, **kwargs)
+
+    def _join_race(self):
+        race = getattr(_hedging, 'race', None)
+        if race is not None:
+            race.attach(self)
+
+
+class _RaceHTTPConnection(_RaceConnectionMixin, HTTPConnection):
+    pass
+
+
+class _RaceHTTPSConnection(_RaceConnectionMixin, HTTPSConnection):
+    pass
+
+
+class _RaceHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _RaceHTTPConnection
+
+
+class _RaceHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _RaceHTTPSConnection
+
+
+class _HedgingAdapter(HTTPAdapter):
+    """HTTPAdapter whose connections a hedged request's duplicate can cut off."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {'http': _RaceHTTPConnectionPool, 'https': _RaceHTTPSConnectionPool}
+
+
+def _validators_match(entry, request_headers):
+    """Check a caller's If-None-Match / If-Modified-Since against a cached entry."""
+    if_none_match = request_headers.get('If-None-Match')
+    if if_none_match:
+        return bool(entry.get('etag')) and if_none_match == entry['etag']
+    if_modified_since = request_headers.get('If-Modified-Since')
+    return bool(if_modified_since) and if_modified_since == entry.get('last_modified')
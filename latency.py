@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Per-host latency tracking for adaptive timeouts and hedged requests.
+
+LatencyTracker keeps the recent response times of every host. HttpTransport
+derives each request's timeout from the host's p99 instead of waiting the full
+configured timeout on a page that is never coming, and with a HedgeBudget it
+sends a duplicate request once the host's p95 has passed, taking whichever
+answer arrives first. The tracker also collects what each request took with
+and without hedging, for the job's stats.
+"""
+
+import math
+import threading
+from collections import deque
+
+
+def percentile(samples, p):
+    """Nearest-rank percentile of a list of numbers, or None if it is empty."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+class LatencyTracker:
+    """Recent time to headers per host, and the adaptive timeouts derived from them.
+
+    The last ``window`` samples of each host are kept. Once a host has
+    ``min_samples``, its timeout is ``timeout_multiplier`` times its p99,
+    never below ``min_timeout`` nor above the configured timeout
+    (``timeout_multiplier=None`` keeps the configured timeout).
+    """
+
+    def __init__(self, window=200, min_samples=20, timeout_multiplier=4.0, min_timeout=2.0, report_size=100000):
+        self.window = window
+        self.min_samples = min_samples
+        self.timeout_multiplier = timeout_multiplier
+        self.min_timeout = min_timeout
+        self.report_size = report_size
+        self._samples = {}
+        self._lock = threading.Lock()
+        self.reset_report()
+
+    def record(self, host, seconds):
+        """Add a host's time to headers (or the time a request took to fail)."""
+        with self._lock:
+            self._samples.setdefault(host, deque(maxlen=self.window)).append(seconds)
+
+    def percentile(self, host, p):
+        """A host's latency percentile, or None until it has ``min_samples``."""
+        with self._lock:
+            samples = list(self._samples.get(host, ()))
+        if len(samples) < self.min_samples:
+            return None
+        return percentile(samples, p)
+
+    def timeout(self, host, default):
+        """Timeout for the next request to a host."""
+        if not self.timeout_multiplier:
+            return default
+        p99 = self.percentile(host, 99)
+        if p99 is None:
+            return default
+        return min(default, max(self.min_timeout, p99 * self.timeout_multiplier))
+
+    def reset_report(self):
+        """Start collecting a new report, e.g. at the start of a job."""
+        with self._lock:
+            self._observed = deque(maxlen=self.report_size)
+            self._unhedged = deque(maxlen=self.report_size)
+            self.hedged = 0
+            self.hedges_won = 0
+
+    def record_request(self, observed, unhedged=None):
+        """Record what a request took for its caller, and what it would have taken without a hedge
+        (for an original cut off by its duplicate, how long it had run)."""
+        with self._lock:
+            self._observed.append(observed)
+            self._unhedged.append(observed if unhedged is None else unhedged)
+
+    def count_hedge(self, won):
+        """Count a hedged request, and whether the duplicate answered first."""
+        with self._lock:
+            self.hedged += 1
+            self.hedges_won += bool(won)
+
+    def report(self):
+        """p50/p99 in ms with and without hedging, and the hedge counts, since the last reset."""
+        with self._lock:
+            observed = list(self._observed)
+            unhedged = list(self._unhedged)
+            report = {'hedged_requests': self.hedged, 'hedges_won': self.hedges_won}
+        if not observed:
+            return report
+        for p in (50, 99):
+            with_hedges = percentile(observed, p) * 1000
+            without_hedges = percentile(unhedged, p) * 1000
+            report[f'latency_p{p}_ms'] = round(with_hedges)
+            report[f'unhedged_latency_p{p}_ms'] = round(without_hedges)
+            report[f'hedging_saved_p{p}_ms'] = round(without_hedges - with_hedges)
+        return report
+
+
+class HedgeBudget:
+    """Global allowance of hedged requests, as a share of all requests.
+
+    Every request earns ``ratio`` of a hedge, up to ``burst`` saved up; a
+    hedge spends one. With ratio 0.05 at most about 5% extra requests are sent.
+    """
+
+    def __init__(self, ratio=0.05, burst=10):
+        self.ratio = ratio
+        self.burst = burst
+        self._tokens = float(burst)
+        self._lock = threading.Lock()
+
+    def earn(self):
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + self.ratio)
+
+    def available(self):
+        return self._tokens >= 1
+
+    def spend(self):
+        """Take one hedge from the budget, if there is one."""
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
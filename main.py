@@ -6,18 +6,35 @@ A Python tool that dynamically generates an llms.txt file for a website
 using its sitemap.xml to guide content scraping.
 """
 
-import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, UnicodeDammit
 import lxml.etree as ET
 import yaml
 from urllib.parse import urljoin, urlparse
 import os
 import time
-from datetime import datetime
+import gzip
+import io
+import shutil
+import tempfile
+import codecs
+import hashlib
+import json
+import zlib
+import base64
+from datetime import datetime, timezone
 import re
-from collections import Counter
+import sys
+import threading
+from collections import Counter, deque
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
 import logging
 
+from utils import ValidatorStore
+from http_transport import HttpTransport, classify_failure
+from robots import RobotsRules
+from url_pipeline import HreflangCollapser, UrlDeduplicator, UrlRuleMatcher, TopKSelector, chain_filters
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -25,77 +42,549 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+SITEMAP_NAMESPACE = {'ns': 'http://www.sitemaps.org/schemas/sitemap/0.9'}
+SITEMAP_URL_TAG = '{http://www.sitemaps.org/schemas/sitemap/0.9}url'
+SITEMAP_SITEMAP_TAG = '{http://www.sitemaps.org/schemas/sitemap/0.9}sitemap'
+XHTML_LINK_TAG = '{http://www.w3.org/1999/xhtml}link'
+
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+# Prefetched sitemap bodies stay in memory up to this size, then spill to a temporary file
+PREFETCH_SPOOL_BYTES = 1024 * 1024
+
+
+def open_sitemap_stream(response):
+    """Return a file-like view of a streamed sitemap response body.
+    
+    Transfer encodings are decoded by urllib3, and gzip-compressed documents
+    (sitemap.xml.gz) are detected by their magic bytes and decompressed on the
+    fly, so the parser is fed incrementally without buffering the whole document.
+    """
+    response.raw.decode_content = True
+    # Keep the raw stream readable at EOF; the response itself is closed by the caller
+    response.raw.auto_close = False
+    stream = io.BufferedReader(response.raw)
+    if stream.peek(2)[:2] == GZIP_MAGIC:
+        return gzip.GzipFile(fileobj=stream, mode='rb')
+    return stream
+
+
+def _discard_prefetched(future):
+    """Release the spooled body of a prefetched sitemap that won't be parsed."""
+    if not future.cancelled() and future.exception() is None:
+        body = future.result()[2]
+        if body is not None:
+            body.close()
+
+
+def conditional_headers(entry):
+    """Build If-None-Match / If-Modified-Since headers from stored validators."""
+    headers = {}
+    if entry:
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+    return headers
+
+
+def iter_sitemap_elements(source):
+    """Incrementally parse a sitemap document, yielding <url> and <sitemap> elements.
+    
+    Each element is cleared and detached from the tree once the caller moves on,
+    so only one entry is held in memory at a time.
+    """
+    for _, elem in ET.iterparse(source, events=('end',), tag=(SITEMAP_URL_TAG, SITEMAP_SITEMAP_TAG)):
+        yield elem
+        elem.clear()
+        while elem.getprevious() is not None:
+            del elem.getparent()[0]
+
+
+class RecordingReader:
+    """File-like wrapper that hashes everything read through it and keeps a gzip-compressed copy.
+    
+    The copy is dropped once it grows past ``max_bytes`` (compressed), so
+    huge documents are parsed as usual but not cached.
+    """
+    
+    def __init__(self, stream, max_bytes):
+        self.stream = stream
+        self.digest = hashlib.sha1()
+        self.max_bytes = max_bytes
+        self._compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        self._chunks = []
+        self._size = 0
+        self.too_large = False
+    
+    def read(self, size=-1):
+        data = self.stream.read(size)
+        self.digest.update(data)
+        if data and not self.too_large:
+            self._keep(self._compressor.compress(data))
+        return data
+    
+    def _keep(self, compressed):
+        self._size += len(compressed)
+        if self._size > self.max_bytes:
+            self.too_large = True
+            self._chunks = []
+        elif compressed:
+            self._chunks.append(compressed)
+    
+    def hexdigest(self):
+        return self.digest.hexdigest()
+    
+    def compressed_body(self):
+        """The gzip-compressed document once it has been read to the end, or None if it was too large to keep."""
+        if not self.too_large:
+            self._keep(self._compressor.flush())
+        return None if self.too_large else b''.join(self._chunks)
+
+
+# End of the document head: the closing tag, or the body starting without one
+HEAD_END_PATTERN = re.compile(rb'</head\s*>|<body[\s>]', re.IGNORECASE)
+
+
+class CappedBody:
+    """Collects a streamed response body, stopping once ``max_bytes`` have been read."""
+    
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.data = bytearray()
+        self.capped = False
+        self._head_end = None
+        self._searched = 0
+    
+    @property
+    def size(self):
+        return len(self.data)
+    
+    def feed(self, chunk):
+        """Add a chunk; returns False once the cap is reached and no more should be read."""
+        remaining = self.max_bytes - len(self.data)
+        if len(chunk) >= remaining:
+            self.data += chunk[:remaining]
+            self.capped = True
+            return False
+        self.data += chunk
+        return True
+    
+    def head_end(self):
+        """Offset where the document head ends, or None if that hasn't been read yet."""
+        if self._head_end is None:
+            # Only search what's new, overlapping enough to catch a tag split across chunks
+            match = HEAD_END_PATTERN.search(self.data, max(0, self._searched - 16))
+            self._searched = len(self.data)
+            if match:
+                self._head_end = match.start()
+        return self._head_end
+    
+    def getvalue(self):
+        return bytes(self.data)
+
+
+# charset parameter of a Content-Type header
+CHARSET_PARAM_PATTERN = re.compile(r'charset\s*=\s*["\']?([^"\';\s]+)', re.IGNORECASE)
+
+# <meta charset="..."> or <meta http-equiv="Content-Type" content="...; charset=...">
+META_CHARSET_PATTERN = re.compile(rb'<meta[^>]+?charset\s*=\s*["\']?\s*([a-zA-Z0-9_.:-]+)', re.IGNORECASE)
+
+# How far into a page a <meta charset> is looked for, as browsers do
+CHARSET_SNIFF_BYTES = 1024
+
+# Byte order marks, which win over any declared charset
+BYTE_ORDER_MARKS = ((codecs.BOM_UTF8, 'utf-8-sig'), (codecs.BOM_UTF16_LE, 'utf-16'), (codecs.BOM_UTF16_BE, 'utf-16'))
+
+
+def _codec_name(charset):
+    """Python codec for a declared charset label, or None if it is unknown."""
+    try:
+        name = codecs.lookup(charset.strip().lower()).name
+    except LookupError:
+        return None
+    # Browsers read latin-1 and ascii labels as windows-1252, and pages labelled so rely on it
+    return 'cp1252' if name in ('iso8859-1', 'ascii') else name
+
+
+def declared_charset(data, content_type=None):
+    """Charset from the Content-Type header, else from a <meta> tag in the first KB; None if neither."""
+    match = CHARSET_PARAM_PATTERN.search(content_type or '')
+    if match and _codec_name(match.group(1)):
+        return _codec_name(match.group(1))
+    match = META_CHARSET_PATTERN.search(data, 0, CHARSET_SNIFF_BYTES)
+    if match:
+        name = _codec_name(match.group(1).decode('ascii'))
+        # A page whose first KB is readable as ASCII isn't UTF-16, whatever it says
+        return 'utf-8' if name and name.startswith('utf-16') else name
+    return None
+
+
+def _decode(data, codec):
+    """Strictly decode ``data``, ignoring a multi-byte character cut off at the end (capped bodies)."""
+    return codecs.getincrementaldecoder(codec)().decode(data, final=False)
+
+
+def decode_html(data, content_type=None):
+    """Decode an HTML body to text once, so BeautifulSoup doesn't sniff the encoding itself.
+    
+    A byte order mark wins, then the Content-Type charset, then a <meta>
+    charset in the first KB. Undeclared pages are tried as UTF-8; only if that
+    fails (or the declared charset is wrong) does UnicodeDammit's much slower
+    detection run.
+    """
+    data = bytes(data)
+    for bom, codec in BYTE_ORDER_MARKS:
+        if data.startswith(bom):
+            return data.decode(codec, errors='replace')
+    charset = declared_charset(data, content_type)
+    for codec in (charset, 'utf-8'):
+        if codec:
+            try:
+                return _decode(data, codec)
+            except UnicodeDecodeError:
+                logger.debug(f"Page doesn't decode as {codec}, detecting its encoding")
+    text = UnicodeDammit(data, is_html=True).unicode_markup
+    return text if text is not None else data.decode('cp1252', errors='replace')
+
+
+def parse_html(body, content_type=None):
+    """BeautifulSoup tree of an HTML body, decoded with decode_html."""
+    return BeautifulSoup(decode_html(body, content_type), 'html.parser')
+
+
+def url_origin(url):
+    """scheme://host[:port] of a URL, the unit politeness limits apply to."""
+    parts = urlparse(url)
+    return f"{parts.scheme}://{parts.netloc}".lower()
+
+
+class HostScheduler:
+    """Per-origin token buckets that space out requests to the same site.
+    
+    Each origin gets a bucket refilled at one token per interval, where the
+    interval is the larger of the requested delay (e.g. request_delay) and the
+    origin's robots.txt Crawl-delay; ``burst`` tokens may be spent back to back.
+    Requests to different origins never wait for each other. ``reserve`` books
+    the next slot and returns how long to wait, so it works for threads
+    (``wait``) as well as coroutines (``asyncio.sleep(reserve(...))``).
+    One scheduler is meant to be shared by every fetcher in a process.
+    """
+    
+    def __init__(self, default_delay=0.0, burst=1):
+        self.default_delay = default_delay or 0.0
+        self.burst = max(1, int(burst))
+        self._crawl_delays = {}
+        self._next_slot = {}
+        self._lock = threading.Lock()
+    
+    def set_crawl_delay(self, origin_or_url, delay):
+        """Record an origin's robots.txt Crawl-delay (seconds), or clear it with None."""
+        origin = url_origin(origin_or_url)
+        with self._lock:
+            if delay:
+                self._crawl_delays[origin] = float(delay)
+            else:
+                self._crawl_delays.pop(origin, None)
+    
+    def interval(self, url, delay=None):
+        """Minimum spacing between requests to this URL's origin."""
+        delay = self.default_delay if delay is None else delay
+        return max(delay or 0.0, self._crawl_delays.get(url_origin(url), 0.0))
+    
+    def reserve(self, url, delay=None):
+        """Book the next request slot for this URL's origin and return the seconds to wait for it."""
+        origin = url_origin(url)
+        interval = self.interval(url, delay)
+        if interval <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            # next_slot is when the bucket is empty again; earlier slots are banked burst tokens
+            next_slot = max(now, self._next_slot.get(origin, now))
+            start = max(now, next_slot - (self.burst - 1) * interval)
+            self._next_slot[origin] = next_slot + interval
+        return start - now
+    
+    def wait(self, url, delay=None):
+        """Block until a request to this URL's origin may start."""
+        pause = self.reserve(url, delay)
+        if pause > 0:
+            time.sleep(pause)
+
+
+def parse_lastmod(value):
+    """Convert a W3C datetime lastmod into epoch seconds, or return it unchanged if unparseable.
+    
+    A date or datetime without a timezone is taken as UTC.
+    """
+    text = value.strip()
+    try:
+        parsed = datetime.fromisoformat(text.replace('Z', '+00:00'))
+    except ValueError:
+        return text
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp())
+
+
+def format_lastmod(timestamp):
+    """Render epoch seconds as a W3C date (midnight UTC) or datetime in UTC."""
+    parsed = datetime.fromtimestamp(timestamp, tz=timezone.utc)
+    if parsed.hour == parsed.minute == parsed.second == 0:
+        return parsed.strftime('%Y-%m-%d')
+    return parsed.strftime('%Y-%m-%dT%H:%M:%S+00:00')
+
+
+class UrlRecord(Mapping):
+    """Compact record for one sitemap <url> entry with a dict-compatible view.
+    
+    Large sitemaps produce hundreds of thousands of these, so fields live in
+    __slots__ instead of a per-URL dict, changefreq/source_type are interned and
+    priority is a float. A lastmod that format_lastmod renders back exactly (a
+    plain date, or a datetime in UTC) is kept as epoch seconds; any other
+    lastmod (another timezone offset, fractional seconds, unparseable text) is
+    kept as the original string, so values always read back as the sitemap
+    had them. Consumers can keep using record['loc'], record.get('lastmod')
+    and record['source_type'] = ...
+    
+    ``alternates`` holds hreflang alternates as a tuple of (language, href)
+    pairs. Like source_type, it only shows up in the mapping view when set.
+    """
+    
+    __slots__ = ('loc', '_lastmod', '_changefreq', 'priority', '_source_type', '_alternates')
+    FIELDS = ('loc', 'lastmod', 'changefreq', 'priority', 'source_type', 'alternates')
+    OPTIONAL_FIELDS = ('source_type', 'alternates')
+    
+    def __init__(self, loc, lastmod=None, changefreq=None, priority=None, source_type=None, alternates=None):
+        self.loc = loc
+        self.lastmod = lastmod
+        self.changefreq = changefreq
+        self.priority = float(priority) if priority is not None else None
+        self.source_type = source_type
+        self.alternates = alternates
+    
+    @classmethod
+    def from_dict(cls, data):
+        """Build a record from a plain dict such as a cached sitemap entry."""
+        return cls(data['loc'], data.get('lastmod'), data.get('changefreq'),
+                   data.get('priority'), data.get('source_type'), data.get('alternates'))
+    
+    @property
+    def lastmod(self):
+        if isinstance(self._lastmod, int):
+            return format_lastmod(self._lastmod)
+        return self._lastmod
+    
+    @lastmod.setter
+    def lastmod(self, value):
+        if isinstance(value, str):
+            value = value.strip() or None
+            if value is not None:
+                timestamp = parse_lastmod(value)
+                if isinstance(timestamp, int) and format_lastmod(timestamp) == value:
+                    value = timestamp
+        self._lastmod = value
+    
+    @property
+    def lastmod_ts(self):
+        """Lastmod as epoch seconds, or None if missing or unparseable."""
+        if isinstance(self._lastmod, str):
+            timestamp = parse_lastmod(self._lastmod)
+            return timestamp if isinstance(timestamp, int) else None
+        return self._lastmod
+    
+    @property
+    def changefreq(self):
+        return self._changefreq
+    
+    @changefreq.setter
+    def changefreq(self, value):
+        self._changefreq = sys.intern(value.strip()) if value else None
+    
+    @property
+    def source_type(self):
+        return self._source_type
+    
+    @source_type.setter
+    def source_type(self, value):
+        self._source_type = sys.intern(value) if value else None
+    
+    @property
+    def alternates(self):
+        return self._alternates
+    
+    @alternates.setter
+    def alternates(self, value):
+        self._alternates = tuple((sys.intern(lang), href) for lang, href in value) if value else None
+    
+    def __getitem__(self, key):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        value = getattr(self, key)
+        if value is None and key in self.OPTIONAL_FIELDS:
+            raise KeyError(key)
+        return value
+    
+    def __setitem__(self, key, value):
+        if key not in self.FIELDS:
+            raise KeyError(f"UrlRecord has no field '{key}'")
+        if key == 'priority' and value is not None:
+            value = float(value)
+        setattr(self, key, value)
+    
+    def __iter__(self):
+        # Optional fields (source_type once categorized, hreflang alternates) only appear when set
+        for key in self.FIELDS:
+            if key not in self.OPTIONAL_FIELDS or getattr(self, key) is not None:
+                yield key
+    
+    def __len__(self):
+        return sum(1 for _ in self)
+    
+    def __repr__(self):
+        return f"UrlRecord({dict(self)!r})"
+    
+    def to_dict(self):
+        """Plain dict copy, e.g. for JSON serialization."""
+        return dict(self)
+
 
 class RobotsTxtChecker:
-    """Check robots.txt for allowed/disallowed URLs."""
+    """Check robots.txt for allowed/disallowed URLs.
+    
+    The file is fetched once per origin and compiled into RobotsRules; with a
+    RobotsCache the parsed rules are shared through Redis, so other batches and
+    workers crawling the same site don't fetch or parse it again. A missing
+    robots.txt (4xx) allows everything; a network failure does too, without
+    caching that answer.
+    """
     
-    def __init__(self, base_url):
+    def __init__(self, base_url, transport=None, cache=None, user_agent='*'):
         self.base_url = base_url
-        self.allowed_urls = set()
-        self.disallowed_urls = set()
-        self._load_robots_txt()
+        self.origin = url_origin(base_url)
+        self.transport = transport or HttpTransport()
+        self.cache = cache
+        self.user_agent = user_agent
+        self.rules = self._load_rules()
+        self.crawl_delay = self.rules.crawl_delay
+        self.sitemaps = self.rules.sitemaps
     
-    def _load_robots_txt(self):
-        """Load and parse robots.txt file."""
+    def _load_rules(self):
+        """Get the origin's rules from the cache, or fetch and parse robots.txt."""
+        if self.cache:
+            rules = self.cache.get(self.origin)
+            if rules is not None:
+                logger.debug(f"Robots cache hit: {self.origin}")
+                return rules
         try:
-            robots_url = urljoin(self.base_url, '/robots.txt')
-            response = requests.get(robots_url, timeout=10)
-            if response.status_code == 200:
-                self._parse_robots_txt(response.text)
+            response = self.transport.get(urljoin(self.base_url, '/robots.txt'))
         except Exception as e:
             logger.warning(f"Could not load robots.txt: {e}")
-    
-    def _parse_robots_txt(self, content):
-        """Parse robots.txt content."""
-        current_user_agent = None
-        for line in content.split('\n'):
-            line = line.strip()
-            if line.startswith('User-agent:'):
-                current_user_agent = line.split(':', 1)[1].strip()
-            elif line.startswith('Allow:') and (current_user_agent == '*' or current_user_agent is None):
-                path = line.split(':', 1)[1].strip()
-                self.allowed_urls.add(urljoin(self.base_url, path))
-            elif line.startswith('Disallow:') and (current_user_agent == '*' or current_user_agent is None):
-                path = line.split(':', 1)[1].strip()
-                self.disallowed_urls.add(urljoin(self.base_url, path))
+            return RobotsRules()
+        if response.status_code == 200:
+            rules = RobotsRules.parse(response.text, self.user_agent)
+        elif 400 <= response.status_code < 500:
+            rules = RobotsRules()
+        else:
+            logger.warning(f"Could not load robots.txt: HTTP {response.status_code}")
+            return RobotsRules()
+        if self.cache:
+            self.cache.set(self.origin, rules)
+        return rules
     
     def is_allowed(self, url):
         """Check if a URL is allowed by robots.txt."""
-        if not self.disallowed_urls and not self.allowed_urls:
+        # URLs on our own origin just drop it; anything else is split by the rules engine
+        if url.startswith(self.origin):
+            path = url[len(self.origin):]
+            if path.startswith('/') and '#' not in path:
+                url = path
+        return self.rules.is_allowed(url)
+
+
+class SitemapQuota:
+    """Per-type URL quotas used to stop sitemap ingestion early.
+    
+    Limits are keyed by source type ('blog', 'page', 'product', 'uncategorized');
+    types without a limit are unbounded. ``share`` lets one type count against
+    another type's quota, e.g. ``{'uncategorized': 'page'}``.
+    """
+    
+    def __init__(self, limits, share=None):
+        self.limits = dict(limits)
+        self.share = dict(share or {})
+        self.counts = {key: 0 for key in self.limits}
+    
+    def _key(self, source_type):
+        key = source_type if source_type in ('blog', 'page', 'product') else 'uncategorized'
+        return self.share.get(key, key)
+    
+    def is_full(self, source_type):
+        """Check whether no more URLs of this source type are needed."""
+        key = self._key(source_type)
+        return key in self.limits and self.counts[key] >= self.limits[key]
+    
+    def all_full(self):
+        """Check whether every quota has been filled."""
+        return all(self.counts[key] >= limit for key, limit in self.limits.items())
+    
+    def accept(self, url_data):
+        """Count a URL against its quota, returning False if the quota is already full."""
+        key = self._key(url_data.get('source_type'))
+        if key not in self.limits:
             return True
-        
-        url_path = urlparse(url).path
-        for disallowed in self.disallowed_urls:
-            if url_path.startswith(urlparse(disallowed).path):
-                return False
+        if self.counts[key] >= self.limits[key]:
+            return False
+        self.counts[key] += 1
         return True
 
 
+def select_sitemap_urls(sitemap_parser, sitemap_url, config, limits, share=None, url_filter=None):
+    """Pick the URL records to scrape within per-type ``limits``, as set by ``url_selection``.
+    
+    "priority" ranks URLs with TopKSelector. To keep the early stop, only the
+    first ``url_selection_candidates`` times each limit are read and ranked
+    (0 reads every sitemap). "sitemap" keeps the first URLs in sitemap order.
+    Returns (records, number of URLs ranked, or None in "sitemap" mode).
+    """
+    if config.get('url_selection', 'priority') != 'priority':
+        quota = SitemapQuota(limits, share=share)
+        return list(sitemap_parser.iter_sitemap(sitemap_url, quota=quota, url_filter=url_filter)), None
+    
+    factor = config.get('url_selection_candidates', 10)
+    candidates = SitemapQuota({key: limit * factor for key, limit in limits.items()}, share=share) if factor else None
+    selector = TopKSelector.from_config(config, limits, share=share)
+    for url_data in sitemap_parser.iter_sitemap(sitemap_url, quota=candidates, url_filter=url_filter):
+        selector.offer(url_data)
+    return list(selector.results()), selector.offered
+
+
 class SitemapIndexParser:
     """Parse sitemap index files."""
     
-    def __init__(self, config):
+    def __init__(self, config, scheduler=None, transport=None):
         self.config = config
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'LLMs.txt Generator Bot (+https://github.com/your-repo)'
-        })
+        self.scheduler = scheduler or HostScheduler()
+        self.transport = transport or HttpTransport.from_config(config)
     
     def parse_sitemap_index(self, sitemap_index_url):
         """Parse sitemap index and extract sitemap URLs."""
         try:
             logger.info(f"Parsing sitemap index: {sitemap_index_url}")
-            response = self.session.get(sitemap_index_url, timeout=30)
-            response.raise_for_status()
-            
-            root = ET.fromstring(response.content)
-            namespace = {'ns': 'http://www.sitemaps.org/schemas/sitemap/0.9'}
-            
-            sitemaps = []
-            for sitemap_elem in root.findall('ns:sitemap', namespace):
-                sitemap_data = self._extract_sitemap_data(sitemap_elem, namespace)
-                if sitemap_data:
-                    sitemaps.append(sitemap_data)
+            self.scheduler.wait(sitemap_index_url, self.config.get('sitemap_host_delay', 0.2))
+            response = self.transport.get(sitemap_index_url, stream=True)
+            with response:
+                response.raise_for_status()
+                
+                sitemaps = []
+                for elem in iter_sitemap_elements(open_sitemap_stream(response)):
+                    if elem.tag != SITEMAP_SITEMAP_TAG:
+                        continue
+                    sitemap_data = self._extract_sitemap_data(elem, SITEMAP_NAMESPACE)
+                    if sitemap_data:
+                        sitemaps.append(sitemap_data)
             
             logger.info(f"Found {len(sitemaps)} sitemaps in index")
             return sitemaps
@@ -131,78 +620,308 @@ class SitemapIndexParser:
 class SitemapParser:
     """Parse sitemap.xml files and sitemap indexes."""
     
-    def __init__(self, config):
+    def __init__(self, config, cache=None, validator_store=None, scheduler=None, transport=None):
         self.config = config
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'LLMs.txt Generator Bot (+https://github.com/your-repo)'
-        })
-        self.sitemap_index_parser = SitemapIndexParser(config)
+        self.cache = cache
+        self.validator_store = validator_store
+        # Shared HTTP layer (pooled sessions, retries and the on-disk response cache)
+        self.transport = transport or HttpTransport.from_config(config)
+        # Shared with the page scraper when given, so sitemaps and pages of one site share a budget
+        self.scheduler = scheduler or HostScheduler()
+        self.sitemap_delay = config.get('sitemap_host_delay', 0.2)
+        # Larger documents (gzip-compressed size) are parsed but not cached
+        self.max_cached_bytes = config.get('sitemap_cache_max_kb', 4096) * 1024
+        self.sitemap_index_parser = SitemapIndexParser(config, scheduler=self.scheduler, transport=self.transport)
     
     def parse_sitemap(self, sitemap_url):
         """Parse sitemap.xml or sitemap index and extract URLs with metadata."""
+        return list(self.iter_sitemap(sitemap_url))
+    
+    def iter_sitemap(self, sitemap_url, quota=None, url_filter=None):
+        """Stream URL records from a sitemap or sitemap index one at a time.
+        
+        The response body is parsed incrementally and each <url> element is
+        discarded once its record has been yielded, so memory stays flat no
+        matter how large the sitemap is. When a SitemapQuota is given, only URLs
+        that fit the quota are yielded and fetching stops once it is full.
+        ``url_filter`` is called with each record before the quota is checked;
+        records it rejects are dropped (see url_pipeline).
+        """
+        child_sitemaps = []
+        url_count = 0
         try:
             logger.info(f"Parsing sitemap: {sitemap_url}")
-            response = self.session.get(sitemap_url, timeout=30)
-            response.raise_for_status()
-            
-            root = ET.fromstring(response.content)
-            namespace = {'ns': 'http://www.sitemaps.org/schemas/sitemap/0.9'}
-            
-            # Check if this is a sitemap index
-            if root.findall('ns:sitemap', namespace):
-                logger.info("Detected sitemap index, processing all sitemaps...")
-                return self._process_sitemap_index(sitemap_url)
-            else:
-                # Regular sitemap
-                return self._process_regular_sitemap(root, namespace)
-                
+            for kind, record in self._iter_sitemap_document(sitemap_url):
+                if kind == 'sitemap':
+                    child_sitemaps.append(record)
+                elif self._accept(record, quota, url_filter):
+                    url_count += 1
+                    yield record
+                    if quota is not None and quota.all_full():
+                        logger.info(f"All URL quotas filled after {url_count} URLs, stopping sitemap ingestion")
+                        return
         except Exception as e:
             logger.error(f"Error parsing sitemap: {e}")
             raise
+        
+        if child_sitemaps:
+            logger.info("Detected sitemap index, processing all sitemaps...")
+            yield from self._iter_sitemap_index(child_sitemaps, visited={sitemap_url.strip()},
+                                                quota=quota, url_filter=url_filter)
+        else:
+            logger.info(f"Found {url_count} URLs in sitemap")
+    
+    def _accept(self, url_data, quota, url_filter):
+        """Check a URL record against the URL filter and then the quota."""
+        if url_filter is not None and not url_filter(url_data):
+            return False
+        return quota is None or quota.accept(url_data)
     
-    def _process_sitemap_index(self, sitemap_index_url):
-        """Process a sitemap index by parsing all contained sitemaps."""
-        sitemaps = self.sitemap_index_parser.parse_sitemap_index(sitemap_index_url)
-        all_urls = []
+    def _iter_sitemap_index(self, sitemaps, visited=None, quota=None, url_filter=None):
+        """Stream URL records from the sitemaps listed in a sitemap index.
+        
+        Sitemaps are read in index order, each parsed straight from its response
+        while the bodies of the next few (up to sitemap_fetch_workers in all) are
+        downloaded in the background as raw bytes, spooled to disk past
+        PREFETCH_SPOOL_BYTES, so memory doesn't grow with the number of workers.
+        Nested sitemap indexes are followed depth-first, and each sitemap URL is
+        visited at most once so cyclic indexes terminate. Sitemaps whose type
+        quota is already full are never fetched.
+        """
         max_sitemaps = self.config.get('max_sitemaps_to_process', 5)
-        for i, sitemap_data in enumerate(sitemaps[:max_sitemaps]):
+        max_workers = max(1, self.config.get('sitemap_fetch_workers', 4))
+        visited = set(visited or ())
+        
+        def unvisited(entries):
+            for sitemap_data in entries:
+                loc = sitemap_data['loc'].strip()
+                if loc not in visited:
+                    visited.add(loc)
+                    yield sitemap_data
+        
+        def wanted(sitemap_data):
+            # Untyped sitemaps may be nested indexes of anything, so only typed ones are skipped
+            source_type = self._detect_source_type(sitemap_data['loc'])
+            return quota is None or source_type is None or not quota.is_full(source_type)
+        
+        pending = deque(unvisited(sitemaps))
+        futures = {}
+        sitemaps_processed = 0
+        total_urls = 0
+        
+        executor = ThreadPoolExecutor(max_workers=max(1, max_workers - 1))
+        try:
+            while pending and sitemaps_processed < max_sitemaps:
+                if quota is not None and quota.all_full():
+                    logger.info(f"All URL quotas filled after {total_urls} URLs, skipping remaining sitemaps")
+                    break
+                
+                sitemap_data = pending.popleft()
+                loc = sitemap_data['loc'].strip()
+                future = futures.pop(loc, None)
+                if not wanted(sitemap_data):
+                    logger.info(f"Skipping sitemap {sitemap_data['loc']} (quota already full)")
+                    if future is not None:
+                        future.add_done_callback(_discard_prefetched)
+                    continue
+                
+                # Download the next few wanted sitemaps (in output order) while this one is parsed
+                window = min(max_workers, max_sitemaps - sitemaps_processed) - 1
+                for next_data in list(pending)[:window]:
+                    next_loc = next_data['loc'].strip()
+                    if next_loc not in futures and wanted(next_data):
+                        futures[next_loc] = executor.submit(self._prefetch_document, next_data['loc'])
+                
+                source_type = self._detect_source_type(sitemap_data['loc'])
+                nested_sitemaps = []
+                sitemap_url_count = 0
+                try:
+                    prefetched = future.result() if future is not None else None
+                    document = self._iter_sitemap_document(sitemap_data['loc'], source_type=source_type,
+                                                           prefetched=prefetched)
+                    try:
+                        for kind, record in document:
+                            if kind == 'sitemap':
+                                nested_sitemaps.append(record)
+                                continue
+                            sitemap_url_count += 1
+                            if self._accept(record, quota, url_filter):
+                                total_urls += 1
+                                yield record
+                            if quota is not None and source_type is not None and quota.is_full(source_type):
+                                break
+                    finally:
+                        document.close()
+                except Exception as e:
+                    logger.warning(f"Error processing sitemap {sitemap_data['loc']}: {e}")
+                    continue
+                
+                if nested_sitemaps:
+                    logger.info(f"Sitemap {sitemap_data['loc']} is a nested index with {len(nested_sitemaps)} sitemaps")
+                    pending.extendleft(reversed(list(unvisited(nested_sitemaps))))
+                
+                if sitemap_url_count:
+                    sitemaps_processed += 1
+                    logger.info(f"Processed sitemap {sitemaps_processed}/{max_sitemaps}: {sitemap_data['loc']} ({sitemap_url_count} URLs)")
+        finally:
+            # Don't wait for prefetched sitemaps that are no longer needed
+            executor.shutdown(wait=False, cancel_futures=True)
+            for future in futures.values():
+                future.add_done_callback(_discard_prefetched)
+        
+        logger.info(f"Total URLs from all sitemaps: {total_urls}")
+    
+    def _open_document(self, sitemap_url):
+        """Start reading one sitemap document, as (stored, response).
+        
+        ``stored`` is a previously stored document to replay, when the cache has
+        a fresh one or the server confirms it is unchanged; otherwise
+        ``response`` is the streamed 200 response, which the caller closes.
+        """
+        record = None
+        stored = None
+        if self.cache:
+            record = self.cache.get_record(sitemap_url)
+            if self.cache.is_fresh(record):
+                document = self.cache.find_document(sitemap_url, record['validator'])
+                if document:
+                    logger.info(f"Using cached sitemap: {sitemap_url}")
+                    return document, None
+        elif self.validator_store:
+            stored = self.validator_store.get(sitemap_url)
+        
+        self.scheduler.wait(sitemap_url, self.sitemap_delay)
+        response = self.transport.get(sitemap_url, stream=True, headers=conditional_headers(record or stored))
+        if response.status_code == 304:
+            response.close()
+            document = self._revalidated_document(sitemap_url, record, stored)
+            if document is not None:
+                logger.info(f"Sitemap not modified: {sitemap_url}")
+                return document, None
+            # The validators outlived the stored document, so fetch it again in full
+            self.scheduler.wait(sitemap_url, self.sitemap_delay)
+            response = self.transport.get(sitemap_url, stream=True)
+        
+        try:
+            response.raise_for_status()
+            if self.cache:
+                etag = response.headers.get('ETag')
+                last_modified = response.headers.get('Last-Modified')
+                validator = self.cache.validator_key(etag, last_modified)
+                document = self.cache.find_document(sitemap_url, validator)
+                if document:
+                    logger.info(f"Sitemap unchanged, using cached copy: {sitemap_url}")
+                    self.cache.touch_document(sitemap_url, {'validator': validator, 'etag': etag, 'last_modified': last_modified})
+                    response.close()
+                    return document, None
+        except Exception:
+            response.close()
+            raise
+        return None, response
+    
+    def _prefetch_document(self, sitemap_url):
+        """Open a sitemap document and download its body ahead of parsing, as (stored, response, body).
+        
+        The body is kept as raw (decompressed) bytes in a temporary file that
+        stays in memory up to PREFETCH_SPOOL_BYTES, not as parsed records.
+        """
+        stored, response = self._open_document(sitemap_url)
+        if response is None:
+            return stored, None, None
+        body = tempfile.SpooledTemporaryFile(max_size=PREFETCH_SPOOL_BYTES)
+        try:
+            with response:
+                shutil.copyfileobj(open_sitemap_stream(response), body)
+        except Exception:
+            body.close()
+            raise
+        body.seek(0)
+        return None, response, body
+    
+    def _iter_sitemap_document(self, sitemap_url, source_type=None, prefetched=None):
+        """Stream ('url', url_data) and ('sitemap', sitemap_data) pairs from one sitemap document.
+        
+        With a sitemap cache, fresh documents are replayed without a request and
+        documents read to the end are stored, gzip-compressed, under their
+        validator (unless larger than sitemap_cache_max_kb). Stale documents
+        (or, without a cache, documents in the validator store) are revalidated
+        with a conditional request, and a 304 replays the stored document.
+        ``prefetched`` is the result of _prefetch_document for this URL.
+        """
+        if prefetched is not None:
+            stored, response, body = prefetched
+        else:
+            stored, response = self._open_document(sitemap_url)
+            body = None
+        if response is None:
+            yield from self._replay_document(stored, source_type)
+            return
+        
+        with response:
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+            stream = body if body is not None else open_sitemap_stream(response)
+            if self.cache or self.validator_store:
+                stream = RecordingReader(stream, self.max_cached_bytes)
             try:
-                logger.info(f"Processing sitemap {i+1}/{min(len(sitemaps), max_sitemaps)}: {sitemap_data['loc']}")
-                response = self.session.get(sitemap_data['loc'], timeout=30)
-                response.raise_for_status()
-                root = ET.fromstring(response.content)
-                namespace = {'ns': 'http://www.sitemaps.org/schemas/sitemap/0.9'}
-                # Determine if this sitemap is a blog/post sitemap, page sitemap, or product sitemap
-                source_type = None
-                loc_lower = sitemap_data['loc'].lower()
-                if 'post' in loc_lower or 'blog' in loc_lower:
-                    source_type = 'blog'
-                elif 'page' in loc_lower:
-                    source_type = 'page'
-                elif 'product' in loc_lower:
-                    source_type = 'product'
-                sitemap_urls = self._process_regular_sitemap(root, namespace, source_type=source_type)
-                all_urls.extend(sitemap_urls)
-                if i < len(sitemaps) - 1:
-                    time.sleep(1)
-            except Exception as e:
-                logger.warning(f"Error processing sitemap {sitemap_data['loc']}: {e}")
-                continue
-        logger.info(f"Total URLs from all sitemaps: {len(all_urls)}")
-        return all_urls
-    
-    def _process_regular_sitemap(self, root, namespace, source_type=None):
-        """Process a regular sitemap (not an index)."""
-        urls = []
-        for url_elem in root.findall('ns:url', namespace):
-            url_data = self._extract_url_data(url_elem, namespace)
-            if url_data:
-                if source_type:
-                    url_data['source_type'] = source_type
-                urls.append(url_data)
-        logger.info(f"Found {len(urls)} URLs in sitemap")
-        return urls
+                yield from self._iter_elements(stream, source_type)
+            finally:
+                if body is not None:
+                    body.close()
+        
+        # Only reached when the whole document was consumed
+        if not isinstance(stream, RecordingReader):
+            return
+        document = stream.compressed_body()
+        if document is None:
+            logger.info(f"Sitemap {sitemap_url} is over {self.max_cached_bytes // 1024} KB compressed, not caching it")
+        elif self.cache:
+            validator = self.cache.validator_key(etag, last_modified, content_hash=stream.hexdigest())
+            self.cache.set_document(sitemap_url, validator, document, etag=etag, last_modified=last_modified)
+        elif etag or last_modified:
+            self.validator_store.set(sitemap_url, etag, last_modified,
+                                     {'sitemap_gz': base64.b64encode(document).decode('ascii')})
+    
+    def _iter_elements(self, stream, source_type=None):
+        """Parse a sitemap document stream into ('url', url_data) and ('sitemap', sitemap_data) pairs."""
+        for elem in iter_sitemap_elements(stream):
+            if elem.tag == SITEMAP_URL_TAG:
+                url_data = self._extract_url_data(elem, SITEMAP_NAMESPACE)
+                if url_data:
+                    if source_type:
+                        url_data.source_type = source_type
+                    yield 'url', url_data
+            else:
+                sitemap_data = self.sitemap_index_parser._extract_sitemap_data(elem, SITEMAP_NAMESPACE)
+                if sitemap_data:
+                    yield 'sitemap', sitemap_data
+    
+    def _revalidated_document(self, sitemap_url, record, stored):
+        """Get the stored document after a 304 response, or None if it is gone."""
+        if record:
+            document = self.cache.find_document(sitemap_url, record['validator'])
+            if document:
+                self.cache.touch_document(sitemap_url, record)
+            return document
+        if stored and 'sitemap_gz' in stored['payload']:
+            return base64.b64decode(stored['payload']['sitemap_gz'])
+        return None
+    
+    def _replay_document(self, document, source_type=None):
+        """Replay a stored (gzip-compressed) sitemap document as ('url' | 'sitemap', record) pairs."""
+        with gzip.GzipFile(fileobj=io.BytesIO(document), mode='rb') as stream:
+            yield from self._iter_elements(stream, source_type)
+    
+    def _detect_source_type(self, sitemap_loc):
+        """Determine if a sitemap is a blog/post sitemap, page sitemap, or product sitemap."""
+        loc_lower = sitemap_loc.lower()
+        if 'post' in loc_lower or 'blog' in loc_lower:
+            return 'blog'
+        elif 'page' in loc_lower:
+            return 'page'
+        elif 'product' in loc_lower:
+            return 'product'
+        return None
     
     def _extract_url_data(self, url_elem, namespace):
         """Extract data from a URL element in sitemap."""
@@ -211,27 +930,31 @@ class SitemapParser:
             if loc_elem is None:
                 return None
             
-            url_data = {
-                'loc': loc_elem.text.strip(),
-                'lastmod': None,
-                'changefreq': None,
-                'priority': None
-            }
+            url_data = UrlRecord(loc_elem.text.strip())
             
             # Extract lastmod
             lastmod_elem = url_elem.find('ns:lastmod', namespace)
-            if lastmod_elem is not None:
-                url_data['lastmod'] = lastmod_elem.text.strip()
+            if lastmod_elem is not None and lastmod_elem.text:
+                url_data.lastmod = lastmod_elem.text
             
             # Extract changefreq
             changefreq_elem = url_elem.find('ns:changefreq', namespace)
-            if changefreq_elem is not None:
-                url_data['changefreq'] = changefreq_elem.text.strip()
+            if changefreq_elem is not None and changefreq_elem.text:
+                url_data.changefreq = changefreq_elem.text
             
             # Extract priority
             priority_elem = url_elem.find('ns:priority', namespace)
             if priority_elem is not None:
-                url_data['priority'] = float(priority_elem.text.strip())
+                url_data.priority = float(priority_elem.text.strip())
+            
+            # Extract hreflang alternates (<xhtml:link rel="alternate" hreflang="..." href="..."/>)
+            alternates = [
+                (link.get('hreflang').strip().lower().replace('_', '-'), link.get('href').strip())
+                for link in url_elem.iterchildren(XHTML_LINK_TAG)
+                if link.get('rel') == 'alternate' and link.get('hreflang') and link.get('href')
+            ]
+            if alternates:
+                url_data.alternates = alternates
             
             return url_data
             
@@ -243,57 +966,255 @@ class SitemapParser:
 class ContentScraper:
     """Scrape content from web pages."""
     
-    def __init__(self, config):
+    # Settings that change what is extracted from an unchanged page
+    EXTRACTION_SETTINGS = ('content_selector', 'title_selector', 'max_content_length', 'max_nested_links', 'max_page_bytes')
+    
+    # Responses worth parsing; anything else (PDFs, images, feeds) is skipped unread
+    HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml')
+    
+    # Extracted content is a few thousand characters at most, so huge pages are only read this far
+    DEFAULT_MAX_PAGE_BYTES = 2 * 1024 * 1024
+    
+    def __init__(self, config, validator_store=None, scheduler=None, transport=None, rate_limiter=None):
         self.config = config
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'LLMs.txt Generator Bot (+https://github.com/your-repo)'
-        })
+        # Shared HTTP layer (pooled sessions, retries and the on-disk response cache)
+        self.transport = transport or HttpTransport.from_config(config)
         self.robots_checker = None
+        self.validator_store = validator_store
+        # Enforces request_delay (and robots Crawl-delay) per origin instead of sleeping after every page
+        self.scheduler = scheduler or HostScheduler(config.get('request_delay', 1.0))
+        # Optional RedisRateLimiter shared by all workers; every page request takes a token from it
+        self.rate_limiter = rate_limiter
+        # Pages skipped as non-HTML and pages cut off at max_page_bytes
+        self.download_stats = Counter()
+        # Why the last attempt at a URL failed: {url: (reason, retryable)}, see classify_failure
+        self.failures = {}
+        self._stats_lock = threading.Lock()
     
     def set_robots_checker(self, robots_checker):
         """Set robots.txt checker."""
         self.robots_checker = robots_checker
+        self.scheduler.set_crawl_delay(robots_checker.base_url, robots_checker.crawl_delay)
+    
+    def wait_for_slot(self, url, config):
+        """Wait until the politeness scheduler (and the rate limiter, if any) allows a request to this URL's site."""
+        self.scheduler.wait(url, config.get('request_delay', 1.0))
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(url)
     
-    def scrape_content(self, url, config=None):
-        """Scrape content from a URL, including following nested links if needed."""
+    def scrape_content(self, url, config=None, head_only=False):
+        """Scrape content from a URL, including following nested links if needed.
+        
+        With ``head_only`` the page is only read up to </head> and just the
+        listing fields (title, description, keywords) are extracted, unless the
+        head has no description; then the full page is read and extracted.
+        """
         if config is None:
             config = self.config
         
-        # Check robots.txt ONLY if explicitly enabled
-        respect_robots = config.get('respect_robots_txt', False)  # Default to False
-        if respect_robots and self.robots_checker:
-            if not self.robots_checker.is_allowed(url):
-                logger.info(f"Skipping {url} (disallowed by robots.txt)")
-                return None
-        else:
-            logger.info(f"Robots.txt bypassed for {url}")
+        if not self.is_allowed(url, config):
+            return None
         
         try:
             logger.info(f"Scraping content from: {url}")
-            response = self.session.get(url, timeout=30)
-            response.raise_for_status()
+            stored = self._get_stored_content(url, config)
+            self.wait_for_slot(url, config)
+            response = self.transport.get(url, stream=True, headers=conditional_headers(stored))
+            if response.status_code == 304:
+                response.close()
+                if stored:
+                    logger.info(f"Not modified since last run, reusing extracted content: {url}")
+                    return dict(stored['payload']['content'])
+                # 304 without stored content (we sent no validators); fetch again unconditionally
+                self.wait_for_slot(url, config)
+                response = self.transport.get(url, stream=True)
+            if not response.ok:
+                # The body is never read, so give the connection back before raising
+                response.close()
+                response.raise_for_status()
             
-            soup = BeautifulSoup(response.content, 'html.parser')
+            if head_only:
+                content, body = self.read_head(response, url, config)
+                if content:
+                    return content
+            else:
+                body = self.read_page(response, url, config)
+            if body is None:
+                return None
+            soup = parse_html(body, response.headers.get('Content-Type'))
             
             # Check if this is a pagination/archive page that needs to follow links
             if self._is_pagination_page(soup, url):
                 logger.info(f"Detected pagination/archive page: {url}")
-                return self._scrape_pagination_page(soup, url, config)
+                content = self._scrape_pagination_page(soup, url, config)
             else:
                 logger.info(f"Processing as regular content page: {url}")
+                content = self.extract_regular_page(soup, url, config)
             
-            # Regular content extraction
-            content = self._extract_page_content(soup, url, config)
-            if content:
-                logger.info(f"Successfully extracted content from {url}: {len(content.get('content', ''))} chars")
-            else:
-                logger.warning(f"No content extracted from {url}")
+            self._store_content(url, response, content, config)
             return content
             
         except Exception as e:
             logger.error(f"Error scraping {url}: {e}")
+            self.record_failure(url, e)
+            return None
+    
+    def record_failure(self, url, error, reason=None, retryable=None):
+        """Remember why scraping a URL failed, classified by classify_failure unless given."""
+        if reason is None:
+            reason, retryable = classify_failure(error)
+        with self._stats_lock:
+            self.failures[url] = (reason, retryable)
+    
+    def max_page_bytes(self, config):
+        return config.get('max_page_bytes', self.DEFAULT_MAX_PAGE_BYTES)
+    
+    def page_skip_reason(self, url, headers, config):
+        """Check a response's headers before reading its body; returns why it is skipped, or None.
+        
+        Non-HTML responses are skipped and counted. A Content-Length over
+        max_page_bytes only means the body will be cut off at the cap.
+        """
+        content_type = headers.get('Content-Type', '').split(';', 1)[0].strip().lower()
+        if content_type and content_type not in self.HTML_CONTENT_TYPES:
+            self.count_download('skipped')
+            logger.info(f"Skipping {url}: not an HTML page ({content_type})")
+            return f"not HTML ({content_type})"
+        content_length = headers.get('Content-Length', '')
+        if content_length.isdigit() and int(content_length) > self.max_page_bytes(config):
+            logger.info(f"{url} is {int(content_length)} bytes, reading only the first {self.max_page_bytes(config)}")
+        return None
+    
+    def count_download(self, kind):
+        with self._stats_lock:
+            self.download_stats[kind] += 1
+    
+    def read_page(self, response, url, config):
+        """Read a streamed HTML response up to max_page_bytes; None if the page is skipped."""
+        with response:
+            if self.page_skip_reason(url, response.headers, config):
+                return None
+            body = CappedBody(self.max_page_bytes(config))
+            for chunk in response.iter_content(chunk_size=65536):
+                if not body.feed(chunk):
+                    break
+        if body.capped:
+            self.count_download('capped')
+            logger.info(f"Truncated {url} at {body.size} bytes")
+        return body.getvalue()
+    
+    def read_head(self, response, url, config):
+        """Read a streamed HTML response only as far as </head>, for a listing entry.
+        
+        Returns (content, None) when the head has a description. Otherwise the
+        rest of the page is read (up to max_page_bytes) and (None, body) is
+        returned, or (None, None) if the page is skipped.
+        """
+        with response:
+            if self.page_skip_reason(url, response.headers, config):
+                return None, None
+            body = CappedBody(self.max_page_bytes(config))
+            chunks = response.iter_content(chunk_size=16384)
+            for chunk in chunks:
+                if not body.feed(chunk) or body.head_end() is not None:
+                    break
+            content = self.head_content(body, url, config, response.headers.get('Content-Type'))
+            if content:
+                return content, None
+            for chunk in chunks:
+                if not body.feed(chunk):
+                    break
+        if body.capped:
+            self.count_download('capped')
+            logger.info(f"Truncated {url} at {body.size} bytes")
+        return None, body.getvalue()
+    
+    def head_content(self, body, url, config, content_type=None):
+        """Listing fields from a page read up to its </head>, or None if the head has no description."""
+        head_end = body.head_end()
+        if head_end is None:
+            return None
+        soup = parse_html(body.data[:head_end], content_type)
+        description = self._extract_meta_description(soup, config)
+        if not description:
+            logger.info(f"No description in the head of {url}, reading the full page")
+            return None
+        
+        # title_selector first, as for full pages, in case it targets something in <head>
+        title_elem = soup.select_one(config.get('title_selector', 'h1, .title, .post-title'))
+        og_title = soup.find('meta', attrs={'property': 'og:title'})
+        if title_elem and title_elem.get_text(strip=True):
+            title = title_elem.get_text(strip=True)
+        elif og_title and og_title.get('content'):
+            title = og_title['content'].strip()
+        else:
+            title_tag = soup.find('title')
+            title = title_tag.get_text(strip=True) if title_tag else ""
+        
+        keywords = []
+        meta_keywords = soup.find('meta', attrs={'name': 'keywords'})
+        if meta_keywords and meta_keywords.get('content'):
+            keywords = list({keyword.strip() for keyword in meta_keywords['content'].split(',') if keyword.strip()})
+        
+        self.count_download('head_only')
+        logger.info(f"Extracted listing fields from the head of {url} ({head_end} bytes)")
+        return {
+            'url': url,
+            'title': title,
+            'description': description,
+            'content': '',
+            'keywords': keywords,
+            'scraped_at': datetime.now().isoformat(),
+            # Only the head was read; the generator keeps these out of Detailed Content when it can
+            'fetch': 'head'
+        }
+    
+    def is_allowed(self, url, config):
+        """Check robots.txt for a URL, if robots.txt checking is enabled."""
+        # Check robots.txt ONLY if explicitly enabled
+        respect_robots = config.get('respect_robots_txt', False)  # Default to False
+        if respect_robots and self.robots_checker:
+            if not self.robots_checker.is_allowed(url):
+                logger.info(f"Skipping {url} (disallowed by robots.txt)")
+                return False
+        else:
+            logger.info(f"Robots.txt bypassed for {url}")
+        return True
+    
+    def extract_regular_page(self, soup, url, config):
+        """Extract content from a parsed regular (non-pagination) page."""
+        content = self._extract_page_content(soup, url, config)
+        if content:
+            logger.info(f"Successfully extracted content from {url}: {len(content.get('content', ''))} chars")
+        else:
+            logger.warning(f"No content extracted from {url}")
+        return content
+    
+    def _extraction_fingerprint(self, config):
+        """Hash the settings that affect extraction, so stored results are only reused for the same settings."""
+        settings = {key: config.get(key) for key in self.EXTRACTION_SETTINGS}
+        return hashlib.sha1(json.dumps(settings, sort_keys=True).encode('utf-8')).hexdigest()
+    
+    def _get_stored_content(self, url, config):
+        """Get the stored validators and extracted content for a URL, if still usable."""
+        if not self.validator_store:
             return None
+        stored = self.validator_store.get(url)
+        if stored and stored['payload'].get('extraction') == self._extraction_fingerprint(config):
+            return stored
+        return None
+    
+    def _store_content(self, url, response, content, config):
+        """Remember a page's validators together with the content extracted from it."""
+        if not self.validator_store or not content:
+            return
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if etag or last_modified:
+            self.validator_store.set(url, etag, last_modified, {
+                'content': dict(content),
+                'extraction': self._extraction_fingerprint(config)
+            })
     
     def _is_pagination_page(self, soup, url):
         """Check if this is a pagination or archive page that contains links to actual content."""
@@ -385,6 +1306,24 @@ class ContentScraper:
     
     def _scrape_pagination_page(self, soup, url, config):
         """Scrape content from a pagination page by following links to actual content."""
+        content_links = self.pagination_links(soup, url, config)
+        
+        # Scrape content from each link
+        all_content = []
+        for i, link_url in enumerate(content_links):
+            logger.info(f"Following nested link {i+1}/{len(content_links)}: {link_url}")
+            
+            try:
+                nested_content = self._extract_page_content_from_url(link_url, config)
+                if nested_content:
+                    all_content.append(nested_content)
+            except Exception as e:
+                logger.warning(f"Error scraping nested link {link_url}: {e}")
+        
+        return self.combine_pagination_content(all_content, soup, url, config)
+    
+    def pagination_links(self, soup, url, config):
+        """Collect the content links to follow from a pagination page, up to max_nested_links."""
         # Find all content links on the page
         article_links = soup.find_all('a', href=True)
         content_links = []
@@ -394,7 +1333,6 @@ class ContentScraper:
             if self._is_content_link(href):
                 # Make relative URLs absolute
                 if href.startswith('/'):
-                    from urllib.parse import urljoin
                     href = urljoin(url, href)
                 content_links.append(href)
         
@@ -405,27 +1343,10 @@ class ContentScraper:
         
         # Limit the number of links to follow
         max_nested_links = config.get('max_nested_links', 5)
-        content_links = content_links[:max_nested_links]
-        
-        # Scrape content from each link
-        all_content = []
-        for i, link_url in enumerate(content_links):
-            logger.info(f"Following nested link {i+1}/{len(content_links)}: {link_url}")
-            
-            try:
-                nested_content = self._extract_page_content_from_url(link_url, config)
-                if nested_content:
-                    all_content.append(nested_content)
-                
-                # Respect request delay
-                request_delay = config.get('request_delay', 1.0)
-                if request_delay > 0 and i < len(content_links) - 1:
-                    import time
-                    time.sleep(request_delay)
-                    
-            except Exception as e:
-                logger.warning(f"Error scraping nested link {link_url}: {e}")
-        
+        return content_links[:max_nested_links]
+    
+    def combine_pagination_content(self, all_content, soup, url, config):
+        """Combine content scraped from nested links, or fall back to the pagination page itself."""
         # Combine content from all nested pages
         if all_content:
             return self._combine_nested_content(all_content, url)
@@ -436,9 +1357,15 @@ class ContentScraper:
     def _extract_page_content_from_url(self, url, config):
         """Extract content from a URL."""
         try:
-            response = self.session.get(url, timeout=30)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'html.parser')
+            self.wait_for_slot(url, config)
+            response = self.transport.get(url, stream=True)
+            if not response.ok:
+                response.close()
+                response.raise_for_status()
+            body = self.read_page(response, url, config)
+            if body is None:
+                return None
+            soup = parse_html(body, response.headers.get('Content-Type'))
             return self._extract_page_content(soup, url, config)
         except Exception as e:
             logger.error(f"Error extracting content from {url}: {e}")
@@ -626,9 +1553,9 @@ class ContentScraper:
         
         return list(set(keywords))  # Remove duplicates
 
-    def scrape_content_with_lastmod(self, url, lastmod, config=None):
+    def scrape_content_with_lastmod(self, url, lastmod, config=None, head_only=False):
         """Scrape content from a URL with lastmod date."""
-        content = self.scrape_content(url, config)
+        content = self.scrape_content(url, config, head_only=head_only)
         if content and lastmod:
             content['lastmod'] = lastmod
         return content
@@ -640,6 +1567,25 @@ class LLMsTxtGenerator:
     def __init__(self, config):
         self.config = config
     
+    def detailed_content_urls(self, urls_data):
+        """URLs expected in the Detailed Content section: the most recent max_detailed_content by lastmod.
+        
+        Uses the same ordering as _prepare_detailed_content, so these are the
+        only pages whose body text is needed.
+        """
+        ranked = sorted(urls_data, key=lambda url_data: url_data.get('lastmod') or '', reverse=True)
+        return {url_data['loc'] for url_data in ranked[:self.config.get('max_detailed_content', 10)]}
+    
+    def head_only_urls(self, urls_data):
+        """URLs that only need their <head> fetched, for the title/description rows of the listings.
+        
+        Empty unless fetch_plan is 'two_tier' (the default); 'full' fetches every page in full.
+        """
+        if self.config.get('fetch_plan', 'two_tier') != 'two_tier':
+            return set()
+        detailed = self.detailed_content_urls(urls_data)
+        return {url_data['loc'] for url_data in urls_data if url_data['loc'] not in detailed}
+    
     def generate_llms_txt(self, urls_data, scraped_content, output_path=None):
         """Generate llms.txt file."""
         if output_path is None:
@@ -725,7 +1671,8 @@ class LLMsTxtGenerator:
                     all_titles.append(content['title'])
                 if content.get('description'):
                     all_descriptions.append(content['description'])
-                if content.get('content'):
+                # Listing pages read only up to </head> have no body to find topics in
+                if content.get('content') and content.get('fetch') != 'head':
                     all_content.append(content['content'])
         
         # Combine all text for analysis
@@ -962,11 +1909,12 @@ class LLMsTxtGenerator:
                     'content': content.get('content', ''),
                     'lastmod': content.get('lastmod', ''),
                     'scraped_at': content.get('scraped_at', ''),
-                    'source_type': content.get('source_type')
+                    'source_type': content.get('source_type'),
+                    'full_page': content.get('fetch') != 'head'
                 })
         
-        # Sort by lastmod or scraped_at date (most recent first)
-        all_content.sort(key=lambda x: x.get('lastmod', x.get('scraped_at', '')), reverse=True)
+        # Sort by lastmod or scraped_at date (most recent first), fully fetched pages first on ties
+        all_content.sort(key=lambda x: (x.get('lastmod', x.get('scraped_at', '')), x['full_page']), reverse=True)
         
         # Take the latest items
         latest_content = all_content[:max_detailed_items]
@@ -1216,11 +2164,9 @@ class LLMsTxtGenerator:
 class SitemapDetector:
     """Detect sitemap URLs from a main website URL."""
     
-    def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'LLMs.txt Generator Bot (+https://github.com/your-repo)'
-        })
+    def __init__(self, cache=None, transport=None):
+        self.cache = cache
+        self.transport = transport or HttpTransport()
     
     def detect_sitemap_url(self, main_url):
         """Detect sitemap URL from main website URL."""
@@ -1234,41 +2180,17 @@ class SitemapDetector:
             
             logger.info(f"Detecting sitemap for: {main_url}")
             
-            # Common sitemap locations to try
-            sitemap_candidates = [
-                f"{main_url}/sitemap.xml",
-                f"{main_url}/sitemap_index.xml",
-                f"{main_url}/sitemap/sitemap.xml",
-                f"{main_url}/sitemap/sitemap_index.xml",
-                f"{main_url}/sitemaps/sitemap.xml",
-                f"{main_url}/sitemaps/sitemap_index.xml",
-                f"{main_url}/wp-sitemap.xml",
-                f"{main_url}/sitemap1.xml"
-            ]
-            
-            # Try each candidate
-            for sitemap_url in sitemap_candidates:
-                try:
-                    logger.info(f"Trying sitemap candidate: {sitemap_url}")
-                    response = self.session.head(sitemap_url, timeout=10)
-                    if response.status_code == 200:
-                        logger.info(f"Found sitemap at: {sitemap_url}")
-                        return sitemap_url
-                except Exception as e:
-                    logger.debug(f"Failed to access {sitemap_url}: {e}")
-                    continue
-            
-            # If no direct sitemap found, try robots.txt
-            robots_sitemap = self._check_robots_txt(main_url)
-            if robots_sitemap:
-                logger.info(f"Found sitemap in robots.txt: {robots_sitemap}")
-                return robots_sitemap
+            if self.cache:
+                cached_sitemap = self.cache.get_detected(main_url)
+                if cached_sitemap:
+                    logger.info(f"Using cached sitemap location: {cached_sitemap}")
+                    return cached_sitemap
             
-            # If still no sitemap found, try to discover from HTML
-            html_sitemap = self._discover_from_html(main_url)
-            if html_sitemap:
-                logger.info(f"Found sitemap link in HTML: {html_sitemap}")
-                return html_sitemap
+            sitemap_url = self._probe_sitemap_locations(main_url)
+            if sitemap_url:
+                if self.cache:
+                    self.cache.set_detected(main_url, sitemap_url)
+                return sitemap_url
             
             raise Exception(f"Could not detect sitemap URL for {main_url}. Please provide the sitemap URL directly.")
             
@@ -1276,13 +2198,81 @@ class SitemapDetector:
             logger.error(f"Error detecting sitemap: {e}")
             raise
     
-    def _check_robots_txt(self, main_url):
+    def _probe_sitemap_locations(self, main_url):
+        """Probe common sitemap locations, robots.txt and the homepage HTML concurrently.
+        
+        Probes are listed in preference order. A successful probe wins as soon as
+        every probe preferred over it has failed; the remaining probes are then
+        cancelled and their results discarded.
+        """
+        # Common sitemap locations to try
+        sitemap_candidates = [
+            f"{main_url}/sitemap.xml",
+            f"{main_url}/sitemap_index.xml",
+            f"{main_url}/sitemap/sitemap.xml",
+            f"{main_url}/sitemap/sitemap_index.xml",
+            f"{main_url}/sitemaps/sitemap.xml",
+            f"{main_url}/sitemaps/sitemap_index.xml",
+            f"{main_url}/wp-sitemap.xml",
+            f"{main_url}/sitemap1.xml"
+        ]
+        
+        # Direct candidates first, then robots.txt, then links in the homepage HTML
+        probes = [(self._check_candidate, sitemap_url, "Found sitemap at") for sitemap_url in sitemap_candidates]
+        probes.append((self._check_robots_txt, main_url, "Found sitemap in robots.txt:"))
+        probes.append((self._discover_from_html, main_url, "Found sitemap link in HTML:"))
+        
+        cancelled = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=len(probes))
+        try:
+            futures = [(executor.submit(probe, target, cancelled), message) for probe, target, message in probes]
+            for future, message in futures:
+                sitemap_url = future.result()
+                if sitemap_url:
+                    logger.info(f"{message} {sitemap_url}")
+                    return sitemap_url
+            return None
+        finally:
+            cancelled.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    def _check_candidate(self, sitemap_url, cancelled=None):
+        """Check whether a candidate sitemap location exists."""
+        if cancelled is not None and cancelled.is_set():
+            return None
+        try:
+            logger.info(f"Trying sitemap candidate: {sitemap_url}")
+            response = self.transport.head(sitemap_url)
+            if response.status_code == 200:
+                return sitemap_url
+        except Exception as e:
+            logger.debug(f"Failed to access {sitemap_url}: {e}")
+        return None
+    
+    def _read_body(self, url, cancelled=None, html=False):
+        """GET a URL and return its body bytes (text with ``html``), or None if not found or cancelled mid-download."""
+        if cancelled is not None and cancelled.is_set():
+            return None
+        response = self.transport.get(url, stream=True)
+        with response:
+            if response.status_code != 200:
+                return None
+            chunks = []
+            for chunk in response.iter_content(chunk_size=16384):
+                if cancelled is not None and cancelled.is_set():
+                    return None
+                chunks.append(chunk)
+            if html:
+                return decode_html(b''.join(chunks), response.headers.get('Content-Type'))
+            return b''.join(chunks)
+    
+    def _check_robots_txt(self, main_url, cancelled=None):
         """Check robots.txt for sitemap location."""
         try:
             robots_url = f"{main_url}/robots.txt"
-            response = self.session.get(robots_url, timeout=10)
-            if response.status_code == 200:
-                for line in response.text.split('\n'):
+            body = self._read_body(robots_url, cancelled)
+            if body is not None:
+                for line in body.decode('utf-8', errors='replace').split('\n'):
                     line = line.strip()
                     if line.lower().startswith('sitemap:'):
                         sitemap_url = line.split(':', 1)[1].strip()
@@ -1291,12 +2281,12 @@ class SitemapDetector:
             logger.debug(f"Error checking robots.txt: {e}")
         return None
     
-    def _discover_from_html(self, main_url):
+    def _discover_from_html(self, main_url, cancelled=None):
         """Try to discover sitemap from HTML head section."""
         try:
-            response = self.session.get(main_url, timeout=10)
-            if response.status_code == 200:
-                soup = BeautifulSoup(response.content, 'html.parser')
+            body = self._read_body(main_url, cancelled, html=True)
+            if body is not None:
+                soup = BeautifulSoup(body, 'html.parser')
                 
                 # Look for sitemap in link tags
                 for link in soup.find_all('link', rel='sitemap'):
@@ -1324,20 +2314,20 @@ class SitemapDetector:
 class SiteAnalyzer:
     """Analyzes a website to automatically detect site name, description, and optimal selectors."""
     
-    def __init__(self, config):
+    # Site analysis fetches the homepage as a browser would see it
+    USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+    
+    def __init__(self, config, transport=None):
         self.config = config
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        })
+        self.transport = transport or HttpTransport.from_config(config, user_agent=self.USER_AGENT)
     
     def analyze_site(self, url):
         """Analyze a website to detect site information and optimal selectors."""
         try:
             # Get the homepage
-            response = self.session.get(url, timeout=10)
+            response = self.transport.get(url)
             response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'html.parser')
+            soup = parse_html(response.content, response.headers.get('Content-Type'))
             
             # Detect site name
             site_name = self._detect_site_name(soup, url)
@@ -1498,30 +2488,56 @@ def main(sitemap_url=None, site_name=None, auto_detect=False):
         if site_name:
             config['site_name'] = site_name
         
+        # One HTTP layer for every fetch, so the response cache is shared by detection, sitemaps and pages
+        transport = HttpTransport.from_config(config)
+        
         # Auto-detect sitemap if requested or if main URL is provided
         if auto_detect or (sitemap_url and not sitemap_url.endswith(('.xml', 'sitemap'))):
-            detector = SitemapDetector()
+            detector = SitemapDetector(transport=transport)
             detected_sitemap = detector.detect_sitemap_url(config['sitemap_url'])
             config['sitemap_url'] = detected_sitemap
             logger.info(f"Auto-detected sitemap: {detected_sitemap}")
         
         # Initialize components
-        sitemap_parser = SitemapParser(config)
-        content_scraper = ContentScraper(config)
+        # Validators from the previous run allow conditional requests for unchanged sitemaps and pages
+        validator_store = ValidatorStore(config.get('validator_cache_file', '.llms_validators.json'))
+        # One politeness scheduler for sitemaps and pages: request_delay applies per site, not globally
+        scheduler = HostScheduler(config.get('request_delay', 1.0), burst=config.get('politeness_burst', 1))
+        sitemap_parser = SitemapParser(config, validator_store=validator_store, scheduler=scheduler, transport=transport)
+        content_scraper = ContentScraper(config, validator_store=validator_store, scheduler=scheduler, transport=transport)
         llms_generator = LLMsTxtGenerator(config)
         
         # Set up robots.txt checker ONLY if explicitly enabled
         respect_robots = config.get('respect_robots_txt', False)  # Default to False
         if respect_robots:
             base_url = urlparse(config['sitemap_url']).scheme + '://' + urlparse(config['sitemap_url']).netloc
-            robots_checker = RobotsTxtChecker(base_url)
+            robots_checker = RobotsTxtChecker(base_url, transport=transport)
             content_scraper.set_robots_checker(robots_checker)
             logger.info("Robots.txt checking enabled")
         else:
             logger.info("Robots.txt checking disabled - will scrape all content")
         
-        # Parse sitemap
-        urls_data = sitemap_parser.parse_sitemap(config['sitemap_url'])
+        # Parse sitemap, dropping translations, excluded and duplicate URLs
+        collapser = HreflangCollapser.from_config(config)
+        rule_matcher = UrlRuleMatcher.from_config(config)
+        deduplicator = UrlDeduplicator.from_config(config)
+        url_filter = chain_filters(collapser, rule_matcher, deduplicator)
+        max_pages = config.get('max_pages_to_process', 10)
+        max_blogs = config.get('max_blogs', 10)
+        max_products = config.get('max_products', 10)
+        # Uncategorized URLs are processed as pages, so they share the page limit
+        limits = {'blog': max_blogs, 'page': max_pages, 'product': max_products}
+        share = {'uncategorized': 'page'}
+        urls_data, ranked = select_sitemap_urls(sitemap_parser, config['sitemap_url'], config, limits,
+                                                share=share, url_filter=url_filter)
+        if ranked is not None:
+            logger.info(f"Ranked {ranked} sitemap URLs by priority, lastmod and changefreq")
+        if collapser and collapser.collapsed:
+            logger.info(f"Skipped {collapser.collapsed} hreflang translations")
+        if rule_matcher and rule_matcher.excluded:
+            logger.info(f"Excluded {rule_matcher.excluded} URLs by URL rules")
+        if deduplicator and deduplicator.duplicates:
+            logger.info(f"Skipped {deduplicator.duplicates} duplicate URLs")
         
         # Separate blogs, pages, and products
         blog_urls = []
@@ -1549,107 +2565,116 @@ def main(sitemap_url=None, site_name=None, auto_detect=False):
         
         # Scrape content from URLs - process blogs, pages, and products independently
         scraped_content = {}
-        max_pages = config.get('max_pages_to_process', 10)
-        max_blogs = config.get('max_blogs', 10)
-        max_products = config.get('max_products', 10)
-        request_delay = config.get('request_delay', 1.0)
         
         logger.info(f"DEBUG: max_pages={max_pages}, max_blogs={max_blogs}")
         
-        # Process blogs (up to max_blogs)
-        blogs_processed = 0
-        for url_data in blog_urls:
-            if blogs_processed >= max_blogs:
-                break
-            
-            # Extract content with lastmod date if available
-            if url_data.get('lastmod'):
-                content = content_scraper.scrape_content_with_lastmod(url_data['loc'], url_data['lastmod'], config)
-            else:
-                content = content_scraper.scrape_content(url_data['loc'], config)
+        # Only pages headed for Detailed Content need their body; the listings are filled from <head>
+        head_only_urls = llms_generator.head_only_urls(blog_urls[:max_blogs] + page_urls[:max_pages] + product_urls[:max_products])
+        if head_only_urls:
+            logger.info(f"Fetching only the <head> of {len(head_only_urls)} listing pages")
+        
+        use_async = config.get('scraper_backend') == 'async'
+        if use_async:
+            # async_scraper builds on this module, so it is only imported when wanted
+            from async_scraper import AsyncContentScraper, AIOHTTP_AVAILABLE
+            if not AIOHTTP_AVAILABLE:
+                logger.warning("aiohttp is not installed, scraping pages one at a time instead")
+                use_async = False
+        
+        if use_async:
+            # Every selected page fetched concurrently on one event loop, capped per host
+            async_scraper = AsyncContentScraper(config, validator_store=validator_store, scheduler=scheduler)
+            if respect_robots:
+                async_scraper.set_robots_checker(robots_checker)
+            selected = blog_urls[:max_blogs] + page_urls[:max_pages] + product_urls[:max_products]
+            scraped_content = async_scraper.scrape_urls(selected, config, head_only_urls=head_only_urls)
+            blogs_processed = sum(url_data['loc'] in scraped_content for url_data in blog_urls[:max_blogs])
+            pages_processed = sum(url_data['loc'] in scraped_content for url_data in page_urls[:max_pages])
+            products_processed = sum(url_data['loc'] in scraped_content for url_data in product_urls[:max_products])
+        else:
+            # Process blogs (up to max_blogs)
+            blogs_processed = 0
+            for url_data in blog_urls:
+                if blogs_processed >= max_blogs:
+                    break
                 
-            if content:
-                # Preserve source_type if present
-                if url_data.get('source_type'):
-                    content['source_type'] = url_data['source_type']
-                scraped_content[url_data['loc']] = content
-                blogs_processed += 1
+                # Extract content with lastmod date if available
+                if url_data.get('lastmod'):
+                    content = content_scraper.scrape_content_with_lastmod(url_data['loc'], url_data['lastmod'], config, head_only=url_data['loc'] in head_only_urls)
+                else:
+                    content = content_scraper.scrape_content(url_data['loc'], config, head_only=url_data['loc'] in head_only_urls)
+                    
+                if content:
+                    # Preserve source_type if present
+                    if url_data.get('source_type'):
+                        content['source_type'] = url_data['source_type']
+                    scraped_content[url_data['loc']] = content
+                    blogs_processed += 1
             
-            # Respect request delay
-            if request_delay > 0:
-                time.sleep(request_delay)
-        
-        logger.info(f"DEBUG: Finished processing blogs. blogs_processed={blogs_processed}")
-        
-        # Process pages (up to max_pages) - independent of blogs
-        pages_processed = 0
-        logger.info(f"DEBUG: Starting page processing loop. page_urls count: {len(page_urls)}")
-        
-        for url_data in page_urls:
-            if pages_processed >= max_pages:
-                logger.info(f"DEBUG: Reached max_pages limit ({max_pages}), stopping page processing")
-                break
+            logger.info(f"DEBUG: Finished processing blogs. blogs_processed={blogs_processed}")
             
-            logger.info(f"DEBUG: Processing page {pages_processed + 1}/{min(max_pages, len(page_urls))}: {url_data['loc']}")
+            # Process pages (up to max_pages) - independent of blogs
+            pages_processed = 0
+            logger.info(f"DEBUG: Starting page processing loop. page_urls count: {len(page_urls)}")
             
-            # Extract content with lastmod date if available
-            if url_data.get('lastmod'):
-                content = content_scraper.scrape_content_with_lastmod(url_data['loc'], url_data['lastmod'], config)
-            else:
-                content = content_scraper.scrape_content(url_data['loc'], config)
+            for url_data in page_urls:
+                if pages_processed >= max_pages:
+                    logger.info(f"DEBUG: Reached max_pages limit ({max_pages}), stopping page processing")
+                    break
                 
-            if content:
-                # Preserve source_type if present
-                if url_data.get('source_type'):
-                    content['source_type'] = url_data['source_type']
-                scraped_content[url_data['loc']] = content
-                pages_processed += 1
-                logger.info(f"DEBUG: Successfully processed page {pages_processed}: {url_data['loc']}")
-            else:
-                logger.warning(f"DEBUG: Failed to extract content from page: {url_data['loc']}")
+                logger.info(f"DEBUG: Processing page {pages_processed + 1}/{min(max_pages, len(page_urls))}: {url_data['loc']}")
+                
+                # Extract content with lastmod date if available
+                if url_data.get('lastmod'):
+                    content = content_scraper.scrape_content_with_lastmod(url_data['loc'], url_data['lastmod'], config, head_only=url_data['loc'] in head_only_urls)
+                else:
+                    content = content_scraper.scrape_content(url_data['loc'], config, head_only=url_data['loc'] in head_only_urls)
+                    
+                if content:
+                    # Preserve source_type if present
+                    if url_data.get('source_type'):
+                        content['source_type'] = url_data['source_type']
+                    scraped_content[url_data['loc']] = content
+                    pages_processed += 1
+                    logger.info(f"DEBUG: Successfully processed page {pages_processed}: {url_data['loc']}")
+                else:
+                    logger.warning(f"DEBUG: Failed to extract content from page: {url_data['loc']}")
             
-            # Respect request delay
-            if request_delay > 0:
-                time.sleep(request_delay)
-        
-        logger.info(f"DEBUG: Finished processing pages. pages_processed={pages_processed}")
-        
-        # Process products (up to max_products limit)
-        products_processed = 0
-        logger.info(f"DEBUG: Starting product processing loop. product_urls count: {len(product_urls)}")
-        
-        for url_data in product_urls:
-            if products_processed >= max_products:  # Use max_products limit
-                logger.info(f"DEBUG: Reached max_products limit ({max_products}), stopping product processing")
-                break
+            logger.info(f"DEBUG: Finished processing pages. pages_processed={pages_processed}")
             
-            logger.info(f"DEBUG: Processing product {products_processed + 1}/{min(max_blogs, len(product_urls))}: {url_data['loc']}")
+            # Process products (up to max_products limit)
+            products_processed = 0
+            logger.info(f"DEBUG: Starting product processing loop. product_urls count: {len(product_urls)}")
             
-            # Extract content with lastmod date if available
-            if url_data.get('lastmod'):
-                content = content_scraper.scrape_content_with_lastmod(url_data['loc'], url_data['lastmod'], config)
-            else:
-                content = content_scraper.scrape_content(url_data['loc'], config)
+            for url_data in product_urls:
+                if products_processed >= max_products:  # Use max_products limit
+                    logger.info(f"DEBUG: Reached max_products limit ({max_products}), stopping product processing")
+                    break
                 
-            if content:
-                # Preserve source_type if present
-                if url_data.get('source_type'):
-                    content['source_type'] = url_data['source_type']
-                scraped_content[url_data['loc']] = content
-                products_processed += 1
-                logger.info(f"DEBUG: Successfully processed product {products_processed}: {url_data['loc']}")
-            else:
-                logger.warning(f"DEBUG: Failed to extract content from product: {url_data['loc']}")
+                logger.info(f"DEBUG: Processing product {products_processed + 1}/{min(max_blogs, len(product_urls))}: {url_data['loc']}")
+                
+                # Extract content with lastmod date if available
+                if url_data.get('lastmod'):
+                    content = content_scraper.scrape_content_with_lastmod(url_data['loc'], url_data['lastmod'], config, head_only=url_data['loc'] in head_only_urls)
+                else:
+                    content = content_scraper.scrape_content(url_data['loc'], config, head_only=url_data['loc'] in head_only_urls)
+                    
+                if content:
+                    # Preserve source_type if present
+                    if url_data.get('source_type'):
+                        content['source_type'] = url_data['source_type']
+                    scraped_content[url_data['loc']] = content
+                    products_processed += 1
+                    logger.info(f"DEBUG: Successfully processed product {products_processed}: {url_data['loc']}")
+                else:
+                    logger.warning(f"DEBUG: Failed to extract content from product: {url_data['loc']}")
             
-            # Respect request delay
-            if request_delay > 0:
-                time.sleep(request_delay)
-        
-        logger.info(f"DEBUG: Finished processing products. products_processed={products_processed}")
+            logger.info(f"DEBUG: Finished processing products. products_processed={products_processed}")
         logger.info(f"Processed {blogs_processed} blogs, {pages_processed} pages, and {products_processed} products")
         
         # Generate llms.txt
         output_path = llms_generator.generate_llms_txt(urls_data, scraped_content)
+        validator_store.save()
         
         logger.info(f"Successfully generated llms.txt with {len(scraped_content)} pages")
         
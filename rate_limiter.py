@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Redis-backed rate limiter shared by every batch worker.
+
+Keeps the aggregate request rate against one target host under a configured
+ceiling, however many worker processes and threads are scraping that host.
+"""
+
+import time
+import logging
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# GCRA (generic cell rate algorithm): one key per host holding the theoretical
+# arrival time (TAT) of the next request in ms. A request may start once
+# now >= TAT - (burst - 1) * interval; booking it moves TAT one interval on.
+# Returns the ms to wait for the booked slot, or -wait if that exceeds max_wait
+# (in which case nothing is booked).
+GCRA_SCRIPT = """
+local interval = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local max_wait = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then
+    tat = now
+end
+local wait = tat - (burst - 1) * interval - now
+if wait < 0 then
+    wait = 0
+end
+if wait > max_wait then
+    return -wait
+end
+tat = tat + interval
+redis.call('SET', KEYS[1], tat, 'PX', math.ceil(tat - now) + interval)
+return wait
+"""
+
+
+class RedisRateLimiter:
+    """Distributed per-host rate limiter using GCRA in a Redis Lua script.
+
+    ``rate`` is the allowed requests per second per host and ``burst`` how many
+    may go out back to back. ``acquire`` books a slot and sleeps until it
+    starts; slots further out than ``max_wait`` seconds are retried in steps
+    rather than booked, so one host's queue can't pin a thread indefinitely.
+    If Redis is unreachable the limiter lets requests through (the in-process
+    HostScheduler still applies).
+    """
+
+    def __init__(self, redis_conn, rate=5.0, burst=5, max_wait=30.0, prefix='rate_limit'):
+        self.redis = redis_conn
+        self.rate = rate
+        self.burst = max(1, int(burst))
+        self.max_wait = max_wait
+        self.prefix = prefix
+        self._script = redis_conn.register_script(GCRA_SCRIPT) if redis_conn is not None else None
+
+    @property
+    def enabled(self):
+        return self._script is not None and bool(self.rate) and self.rate > 0
+
+    def _key(self, url):
+        return f'{self.prefix}:{urlparse(url).netloc.lower()}'
+
+    def reserve(self, url, max_wait=None):
+        """Book the next slot for this URL's host; returns the seconds to wait, or None if too far out."""
+        if not self.enabled:
+            return 0.0
+        max_wait = self.max_wait if max_wait is None else max_wait
+        try:
+            interval_ms = int(1000 / self.rate)
+            wait_ms = int(self._script(keys=[self._key(url)], args=[interval_ms, self.burst, int(max_wait * 1000)]))
+        except Exception as e:
+            logger.warning(f"Rate limiter unavailable, not limiting {url}: {e}")
+            return 0.0
+        if wait_ms < 0:
+            return None
+        return wait_ms / 1000.0
+
+    def acquire(self, url, timeout=None):
+        """Block until a request to this URL's host may start; returns False if ``timeout`` ran out first."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            wait = self.reserve(url, self.max_wait if remaining is None else min(self.max_wait, remaining))
+            if wait is not None:
+                if wait > 0:
+                    time.sleep(wait)
+                return True
+            if remaining is not None and remaining <= 0:
+                return False
+            # The host is booked solid further out than we may wait; back off and retry
+            time.sleep(min(1.0, self.max_wait) if remaining is None else max(0.0, min(1.0, remaining)))
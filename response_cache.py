@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+On-disk HTTP response cache shared by every fetcher and worker process.
+
+Re-running a generation for the same site (or only changing the extraction
+settings) serves pages and sitemaps from here instead of downloading them
+again. Bodies are stored gzip-compressed and content-addressed, next to a
+small JSON entry per request holding the status, headers and validators.
+"""
+
+import os
+import gzip
+import json
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Request headers that select a different representation of the same URL
+VARY_HEADERS = ('Accept', 'Accept-Language')
+
+# Response headers that describe the transfer rather than the (decoded) body we store
+HOP_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection', 'keep-alive'}
+
+
+class ResponseCache:
+    """Content-addressed cache of GET responses with a TTL and an LRU size cap.
+
+    Layout under ``directory``::
+
+        entries/ab/<sha256 of method, URL and vary headers>.json
+        objects/cd/<sha256 of the decoded body>.gz
+
+    Within ``ttl`` seconds an entry is served without a request; after that its
+    ETag/Last-Modified are used to revalidate it. Identical bodies (mirrors,
+    redirects, translated URLs serving the same page) are stored once. Every
+    file is written to a temporary name and renamed into place, so concurrent
+    worker processes never see a partial entry or body. Entry mtimes record the
+    last use; once the cache grows past ``max_bytes`` the least recently used
+    entries and the bodies no longer referenced are removed.
+    """
+
+    def __init__(self, directory, ttl=86400, max_bytes=512 * 1024 * 1024):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._size = None
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(directory, 'entries'), exist_ok=True)
+        os.makedirs(os.path.join(directory, 'objects'), exist_ok=True)
+
+    @classmethod
+    def from_config(cls, config):
+        """Build a cache from the ``response_cache`` config section, or None if it is disabled."""
+        settings = config.get('response_cache') or {}
+        if not settings.get('enabled', False):
+            return None
+        return cls(settings.get('directory', '.http_cache'),
+                   ttl=settings.get('ttl', 86400),
+                   max_bytes=int(settings.get('max_size_mb', 512) * 1024 * 1024))
+
+    @staticmethod
+    def key(url, headers=None, method='GET'):
+        """Cache key for a request: its method, URL and the headers that change the representation."""
+        headers = headers or {}
+        parts = [method, url] + [f"{name}:{headers.get(name, '')}" for name in VARY_HEADERS]
+        return hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.directory, 'entries', key[:2], key + '.json')
+
+    def _object_path(self, digest):
+        return os.path.join(self.directory, 'objects', digest[:2], digest + '.gz')
+
+    def _write_atomic(self, path, data):
+        """Write a file under a temporary name in the same directory and rename it into place."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            _unlink(tmp_path)
+            raise
+
+    def get(self, key):
+        """Get the entry for a cache key, fresh or not, or None if it (or its body) is missing."""
+        path = self._entry_path(key)
+        try:
+            with open(path, 'rb') as f:
+                entry = json.load(f)
+            if not os.path.exists(self._object_path(entry['body'])):
+                return None
+            # The entry's mtime is its last use, for LRU eviction
+            os.utime(path)
+            return entry
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def is_fresh(self, entry):
+        """Check whether an entry may be served without revalidating it."""
+        return bool(entry) and time.time() - entry.get('stored_at', 0) < self.ttl
+
+    def open_body(self, entry):
+        """Open an entry's decoded body as a binary file, or None if it has been evicted."""
+        try:
+            return gzip.open(self._object_path(entry['body']), 'rb')
+        except OSError:
+            return None
+
+    def refresh(self, key, entry, headers=None):
+        """Mark an entry as revalidated now, taking over updated validators from a 304 response."""
+        entry = dict(entry, stored_at=time.time())
+        for name in ('ETag', 'Last-Modified'):
+            if headers and headers.get(name):
+                entry['headers'][name] = headers[name]
+                entry['etag' if name == 'ETag' else 'last_modified'] = headers[name]
+        try:
+            self._write_atomic(self._entry_path(key), json.dumps(entry).encode('utf-8'))
+        except OSError as e:
+            logger.warning(f"Could not update response cache entry for {entry.get('url')}: {e}")
+        return entry
+
+    def writer(self, key, url, status, headers):
+        """Start storing a response; feed it the decoded body and commit it at EOF."""
+        return CacheWriter(self, key, url, status, headers)
+
+    def _commit(self, key, entry, tmp_path, digest):
+        """Move a finished body into place and publish its entry."""
+        object_path = self._object_path(digest)
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        added = 0
+        if os.path.exists(object_path):
+            # Same body already stored under another URL (or an earlier fetch)
+            _unlink(tmp_path)
+            os.utime(object_path)
+        else:
+            os.replace(tmp_path, object_path)
+            added += os.path.getsize(object_path)
+        data = json.dumps(entry).encode('utf-8')
+        self._write_atomic(self._entry_path(key), data)
+        added += len(data)
+
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += added
+            over = self._size > self.max_bytes
+        if over:
+            self.evict()
+
+    def _scan_size(self):
+        total = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    pass
+        return total
+
+    def evict(self, target=None):
+        """Remove least recently used entries, and the bodies they alone used, until under ``target`` bytes.
+
+        Defaults to 90% of ``max_bytes`` so a full cache isn't scanned on every store.
+        Safe to run from several processes at once: files that vanish underneath
+        are skipped.
+        """
+        target = int(self.max_bytes * 0.9) if target is None else target
+        entries = []
+        refs = {}
+        total = 0
+        for root, _, files in os.walk(os.path.join(self.directory, 'entries')):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                    with open(path, 'rb') as f:
+                        digest = json.load(f)['body']
+                except (OSError, ValueError, KeyError):
+                    continue
+                entries.append((stat.st_mtime, path, stat.st_size, digest))
+                refs[digest] = refs.get(digest, 0) + 1
+                total += stat.st_size
+
+        object_sizes = {}
+        for root, _, files in os.walk(os.path.join(self.directory, 'objects')):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    size = os.path.getsize(path)
+                except OSError:
+                    continue
+                total += size
+                digest = name[:-len('.gz')]
+                if name.startswith('.tmp-'):
+                    continue
+                if digest not in refs:
+                    # Orphaned by an earlier eviction or an interrupted store
+                    _unlink(path)
+                    total -= size
+                    continue
+                object_sizes[digest] = size
+
+        removed = 0
+        entries.sort()
+        for _, path, size, digest in entries:
+            if total <= target:
+                break
+            _unlink(path)
+            total -= size
+            removed += 1
+            refs[digest] -= 1
+            if refs[digest] == 0:
+                _unlink(self._object_path(digest))
+                total -= object_sizes.get(digest, 0)
+
+        with self._lock:
+            self._size = total
+        if removed:
+            logger.info(f"Evicted {removed} responses from the response cache ({total // 1024} KB left)")
+        return removed
+
+
+class CacheWriter:
+    """Receives a response body as it is read and stores it once it is complete."""
+
+    def __init__(self, cache, key, url, status, headers):
+        self.cache = cache
+        self.key = key
+        self.entry = {
+            'url': url,
+            'status': status,
+            'headers': {name: value for name, value in headers.items() if name.lower() not in HOP_HEADERS},
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+        }
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.done = False
+        objects_dir = os.path.join(cache.directory, 'objects')
+        fd, self.tmp_path = tempfile.mkstemp(dir=objects_dir, prefix='.tmp-')
+        self._file = os.fdopen(fd, 'wb')
+        self._gzip = gzip.GzipFile(fileobj=self._file, mode='wb', compresslevel=6, mtime=0)
+
+    def write(self, data):
+        if self.done:
+            return
+        self.digest.update(data)
+        self.size += len(data)
+        if self.size > self.cache.max_bytes:
+            # Never worth evicting the whole cache for one body
+            self.abort()
+            return
+        self._gzip.write(data)
+
+    def commit(self):
+        """Publish the stored body and its entry."""
+        if self.done:
+            return
+        self.done = True
+        try:
+            self._gzip.close()
+            self._file.close()
+            self.entry['size'] = self.size
+            self.entry['body'] = self.digest.hexdigest()
+            self.entry['stored_at'] = time.time()
+            self.cache._commit(self.key, self.entry, self.tmp_path, self.entry['body'])
+        except OSError as e:
+            logger.warning(f"Could not store {self.entry['url']} in the response cache: {e}")
+            _unlink(self.tmp_path)
+
+    def abort(self):
+        """Discard a body that was not read to the end."""
+        if self.done:
+            return
+        self.done = True
+        try:
+            self._gzip.close()
+            self._file.close()
+        except OSError:
+            pass
+        _unlink(self.tmp_path)
+
+
+def _unlink(path):
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Deferred retry queue for URLs whose scrape failed with a transient error.
+
+Failed URLs go into a Redis sorted set per job, scored by the time they may be
+retried, so the batch workers can pick them up after the main batches or
+whenever they have idle capacity, without a retry ever holding up the first
+pass over the site.
+"""
+
+import json
+import time
+import random
+
+
+class RetryQueue:
+    """Low-priority queue of failed URLs with exponential backoff, per job.
+
+    Attempt ``n`` (1-based) becomes due after about ``base_delay * 2**(n-1)``
+    seconds (half of it jittered), capped at ``max_delay``. A URL is retried
+    at most ``max_attempts`` times.
+    """
+
+    def __init__(self, redis_conn, max_attempts=3, base_delay=10.0, max_delay=300.0, ttl=3600, prefix='retry'):
+        self.redis = redis_conn
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def _key(self, task_id):
+        return f'{self.prefix}:{task_id}'
+
+    def backoff(self, attempt):
+        """Seconds to wait before retry number ``attempt`` (1-based)."""
+        delay = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def push(self, task_id, url_data, reason, attempt, head_only=False):
+        """Schedule retry number ``attempt`` of a URL; False if it has had all its attempts."""
+        if attempt > self.max_attempts:
+            return False
+        entry = json.dumps({'url_data': dict(url_data), 'attempt': attempt, 'reason': reason, 'head_only': head_only},
+                           sort_keys=True)
+        key = self._key(task_id)
+        pipe = self.redis.pipeline()
+        pipe.zadd(key, {entry: time.time() + self.backoff(attempt)})
+        pipe.expire(key, self.ttl)
+        pipe.execute()
+        return True
+
+    def pop_due(self, task_id, limit):
+        """Take up to ``limit`` entries whose backoff has passed, oldest first."""
+        key = self._key(task_id)
+        entries = []
+        for member in self.redis.zrangebyscore(key, '-inf', time.time(), start=0, num=limit):
+            # Only the caller that removes an entry gets to retry it
+            if self.redis.zrem(key, member):
+                entries.append(json.loads(member))
+        return entries
+
+    def next_due_in(self, task_id):
+        """Seconds until the next entry is due (0 if one already is), or None if the queue is empty."""
+        first = self.redis.zrange(self._key(task_id), 0, 0, withscores=True)
+        if not first:
+            return None
+        return max(0.0, first[0][1] - time.time())
+
+    def size(self, task_id):
+        """Entries waiting for a retry."""
+        return self.redis.zcard(self._key(task_id))
+
+    def clear(self, task_id):
+        self.redis.delete(self._key(task_id))
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+robots.txt rules engine and its Redis cache.
+
+RobotsRules parses a robots.txt file once and compiles the rules that apply to
+us: plain prefix rules into a dict probed once per distinct rule length, and
+wildcard rules into regexes only tried on paths that contain their literal
+text, so checking a URL costs a few dict lookups rather than a scan of every
+rule. Matching follows RFC 9309: ``*`` matches any
+run of characters, a trailing ``$`` anchors the end of the URL, and the most
+specific (longest) matching rule wins, with Allow winning ties.
+"""
+
+import re
+import json
+import time
+import logging
+from urllib.parse import quote
+
+logger = logging.getLogger(__name__)
+
+NON_ASCII = re.compile(r'[^\x00-\x7f]+')
+
+# A user agent's product token: the name before any version, comment or other text (RFC 9309)
+PRODUCT_TOKEN = re.compile(r'[a-zA-Z_-]*')
+
+
+def product_token(user_agent):
+    """Lowercased product token of a user agent ('Mozilla/5.0 (...)' -> 'mozilla'), '*' kept as is."""
+    user_agent = user_agent.strip()
+    if user_agent == '*':
+        return '*'
+    return PRODUCT_TOKEN.match(user_agent).group().lower()
+
+
+def url_path(url):
+    """Path plus query of a URL, as robots.txt rules see it ('/' if empty)."""
+    _, scheme_separator, rest = url.partition('://')
+    if scheme_separator:
+        # The authority ends at the first '/', or at a '?' or '#' coming before it
+        end = rest.find('/')
+        authority = rest if end < 0 else rest[:end]
+        if '?' in authority or '#' in authority:
+            end = min(index for index in (rest.find('?'), rest.find('#')) if index >= 0)
+        url = rest[end:] if end >= 0 else ''
+    if '#' in url:
+        url = url.split('#', 1)[0]
+    return url if url.startswith('/') else '/' + url
+
+
+def _normalize_pattern(pattern):
+    """Percent-encode non-ASCII characters, the way they appear in crawled URLs."""
+    return NON_ASCII.sub(lambda match: quote(match.group()), pattern)
+
+
+def _pattern_regex(pattern):
+    """Translate a robots.txt path pattern with * or $ into a regex matched at the start of the path."""
+    anchored = pattern.endswith('$')
+    if anchored:
+        pattern = pattern[:-1]
+    regex = '.*?'.join(re.escape(part) for part in pattern.split('*'))
+    return re.compile(regex + (r'\Z' if anchored else ''), re.DOTALL)
+
+
+class RobotsRules:
+    """Compiled Allow/Disallow rules, Crawl-delay and Sitemap lines of one robots.txt.
+
+    ``rules`` is a list of (allowed, pattern) pairs for the group that applies
+    to ``user_agent``: groups are matched on product tokens, case-insensitively,
+    and a group naming ours wins over the ``*`` group (RFC 9309). Groups naming
+    the same token are merged.
+    """
+
+    def __init__(self, rules=(), crawl_delay=None, sitemaps=()):
+        self.rules = [(bool(allowed), pattern) for allowed, pattern in rules if pattern]
+        self.crawl_delay = crawl_delay
+        self.sitemaps = list(sitemaps)
+        self._compile()
+
+    @classmethod
+    def parse(cls, text, user_agent='*'):
+        """Parse robots.txt text, keeping the rules of the group that applies to ``user_agent``."""
+        agent = product_token(user_agent)
+        groups = {}
+        sitemaps = []
+        current = []
+        in_agent_lines = False
+        for raw_line in text.splitlines():
+            line = raw_line.split('#', 1)[0].strip()
+            if ':' not in line:
+                continue
+            field, value = line.split(':', 1)
+            field = field.strip().lower()
+            value = value.strip()
+            if field == 'user-agent':
+                # Consecutive User-agent lines share one group
+                if not in_agent_lines:
+                    current = []
+                name = product_token(value)
+                current.append(name)
+                groups.setdefault(name, {'rules': [], 'crawl_delay': None})
+                in_agent_lines = True
+                continue
+            in_agent_lines = False
+            if field == 'sitemap':
+                sitemaps.append(value)
+            elif field in ('allow', 'disallow'):
+                for name in current or ['*']:
+                    groups.setdefault(name, {'rules': [], 'crawl_delay': None})['rules'].append((field == 'allow', value))
+            elif field == 'crawl-delay':
+                try:
+                    delay = float(value)
+                except ValueError:
+                    continue
+                for name in current or ['*']:
+                    groups.setdefault(name, {'rules': [], 'crawl_delay': None})['crawl_delay'] = delay
+
+        group = groups.get(agent) if agent not in ('*', '') else None
+        if group is None:
+            group = groups.get('*', {'rules': [], 'crawl_delay': None})
+        return cls(group['rules'], group['crawl_delay'], sitemaps)
+
+    def _compile(self):
+        # Plain rules (no * or $) are prefixes: a path's longest matching one is found by looking up
+        # its own prefixes of each rule length, longest first, in a dict. Allow wins ties. Rules are
+        # bucketed by their first two characters, so a path only probes the lengths of its bucket.
+        self._prefixes = {}
+        for allowed, pattern in self.rules:
+            if '*' not in pattern and '$' not in pattern:
+                pattern = _normalize_pattern(pattern)
+                self._prefixes[pattern] = self._prefixes.get(pattern, False) or allowed
+        lengths = {}
+        for pattern in self._prefixes:
+            lengths.setdefault(pattern[:2], set()).add(len(pattern))
+        # A one-character rule ('/') is a prefix of every path, whatever its bucket
+        short = lengths.pop('/', set()) | lengths.pop('', set())
+        self._default_lengths = tuple(sorted(short, reverse=True))
+        self._buckets = {key: tuple(sorted(found | short, reverse=True)) for key, found in lengths.items()}
+
+        # Wildcard rules get a regex each, only tried on paths containing their longest literal part
+        self._wildcards = []
+        for allowed, pattern in self.rules:
+            if '*' in pattern or '$' in pattern:
+                pattern = _normalize_pattern(pattern)
+                literal = max(pattern.rstrip('$').split('*'), key=len)
+                self._wildcards.append((literal, _pattern_regex(pattern).match, len(pattern), allowed))
+        self._wildcards.sort(key=lambda rule: (-rule[2], not rule[3]))
+        self._all_allowed = all(allowed for allowed, _ in self.rules)
+
+    def is_allowed(self, url):
+        """Check a URL (or its path, starting with '/') against the rules."""
+        if self._all_allowed:
+            return True
+        path = url if url.startswith('/') and '#' not in url else url_path(url)
+
+        # A path shorter than a rule length slices to itself, which is still one of its prefixes
+        prefixes = self._prefixes
+        best_length, verdict = -1, True
+        for length in self._buckets.get(path[:2], self._default_lengths):
+            allowed = prefixes.get(path[:length])
+            if allowed is not None:
+                best_length, verdict = length, allowed
+                break
+        for literal, match, length, allowed in self._wildcards:
+            if length < best_length or (length == best_length and not allowed):
+                break
+            if literal in path and match(path):
+                return allowed
+        return verdict
+
+    def to_dict(self):
+        return {'rules': self.rules, 'crawl_delay': self.crawl_delay, 'sitemaps': self.sitemaps}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get('rules', ()), data.get('crawl_delay'), data.get('sitemaps', ()))
+
+
+class RobotsCache:
+    """Cache parsed robots.txt rules per origin in Redis, shared by the web app and workers."""
+
+    def __init__(self, redis_conn, ttl=86400, prefix='robots'):
+        self.redis = redis_conn
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, origin):
+        """Get the cached rules for an origin (scheme://host[:port]), or None."""
+        try:
+            value = self.redis.get(f'{self.prefix}:{origin}')
+            return RobotsRules.from_dict(json.loads(value)) if value else None
+        except Exception as e:
+            logger.warning(f"Robots cache unavailable: {e}")
+            return None
+
+    def set(self, origin, rules):
+        """Remember the rules for an origin for ``ttl`` seconds."""
+        try:
+            self.redis.setex(f'{self.prefix}:{origin}', self.ttl, json.dumps(dict(rules.to_dict(), fetched_at=time.time())))
+        except Exception as e:
+            logger.warning(f"Could not cache robots.txt rules for {origin}: {e}")
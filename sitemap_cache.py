@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Redis-backed sitemap cache shared by the web app and the batch workers.
+
+Stores detected sitemap URLs and the (gzip-compressed) bodies of sitemap
+documents so that an analyze -> validate -> generate flow only fetches each
+sitemap once. Page validators (ETag/Last-Modified and the content they
+produced) are kept alongside them so workers can revalidate pages too.
+"""
+
+import json
+import time
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _hash(value):
+    return hashlib.sha1(value.encode('utf-8')).hexdigest()
+
+
+class SitemapCache:
+    """Cache sitemap detection results and sitemap documents in Redis.
+
+    Documents are stored as their gzip-compressed body, which is replayed
+    through the streaming parser, rather than as parsed records. They are keyed by sitemap URL and validator (ETag, Last-Modified
+    or a hash of the body). A record per URL remembers the latest validator,
+    the raw ETag/Last-Modified headers and when the document was fetched. Within
+    ``ttl`` seconds the document is served without any request; after that the
+    headers are used for a conditional request and a 304 reuses the document.
+    """
+
+    def __init__(self, redis_conn, ttl=900, document_ttl=86400, prefix='sitemap_cache'):
+        self.redis = redis_conn
+        self.ttl = ttl
+        self.document_ttl = max(document_ttl, ttl)
+        self.prefix = prefix
+
+    @staticmethod
+    def validator_key(etag=None, last_modified=None, content_hash=None):
+        """Build the validator part of a document key, or None if nothing identifies the content."""
+        if etag:
+            return 'etag-' + _hash(etag)
+        if last_modified:
+            return 'lm-' + _hash(last_modified)
+        if content_hash:
+            return 'sha-' + content_hash
+        return None
+
+    def get_detected(self, main_url):
+        """Get a previously detected sitemap URL for a website."""
+        try:
+            value = self.redis.get(f'{self.prefix}:detect:{_hash(main_url)}')
+            return value.decode('utf-8') if value else None
+        except Exception as e:
+            logger.warning(f"Sitemap cache unavailable: {e}")
+            return None
+
+    def set_detected(self, main_url, sitemap_url):
+        """Remember the detected sitemap URL for a website."""
+        try:
+            self.redis.setex(f'{self.prefix}:detect:{_hash(main_url)}', self.ttl, sitemap_url)
+        except Exception as e:
+            logger.warning(f"Could not cache detected sitemap: {e}")
+
+    def get_record(self, sitemap_url):
+        """Get the stored validators for a sitemap URL, fresh or not."""
+        try:
+            value = self.redis.get(f'{self.prefix}:validator:{_hash(sitemap_url)}')
+            return json.loads(value) if value else None
+        except Exception as e:
+            logger.warning(f"Sitemap cache unavailable: {e}")
+            return None
+
+    def is_fresh(self, record):
+        """Check whether a record may be used without revalidating it."""
+        return bool(record) and time.time() - record.get('fetched_at', 0) < self.ttl
+
+    def get_document(self, sitemap_url):
+        """Get the fresh compressed document for a sitemap URL, without revalidating it."""
+        record = self.get_record(sitemap_url)
+        if not self.is_fresh(record):
+            return None
+        return self.find_document(sitemap_url, record['validator'])
+
+    def find_document(self, sitemap_url, validator):
+        """Get the compressed document for a sitemap URL by its validator."""
+        if not validator:
+            return None
+        try:
+            return self.redis.get(f'{self.prefix}:body:{_hash(sitemap_url)}:{validator}') or None
+        except Exception as e:
+            logger.warning(f"Sitemap cache unavailable: {e}")
+            return None
+
+    def set_document(self, sitemap_url, validator, document, etag=None, last_modified=None):
+        """Store a sitemap document's compressed body under its validator and mark it fresh."""
+        if not validator:
+            return
+        try:
+            url_hash = _hash(sitemap_url)
+            pipe = self.redis.pipeline()
+            pipe.setex(f'{self.prefix}:body:{url_hash}:{validator}', self.document_ttl, document)
+            pipe.setex(f'{self.prefix}:validator:{url_hash}', self.document_ttl, json.dumps({
+                'validator': validator,
+                'etag': etag,
+                'last_modified': last_modified,
+                'fetched_at': time.time()
+            }))
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Could not cache sitemap {sitemap_url}: {e}")
+
+    def touch_document(self, sitemap_url, record):
+        """Mark an already stored document as fresh again after revalidating it."""
+        try:
+            record = dict(record, fetched_at=time.time())
+            url_hash = _hash(sitemap_url)
+            pipe = self.redis.pipeline()
+            pipe.setex(f'{self.prefix}:validator:{url_hash}', self.document_ttl, json.dumps(record))
+            pipe.expire(f'{self.prefix}:body:{url_hash}:{record["validator"]}', self.document_ttl)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Could not refresh cached sitemap {sitemap_url}: {e}")
+
+
+class RedisValidatorStore:
+    """ValidatorStore kept in Redis, so every batch worker revalidates pages the others fetched.
+
+    Has the same ``get``/``set``/``save`` interface as ``utils.ValidatorStore``;
+    entries expire after ``ttl`` seconds and ``save`` is a no-op.
+    """
+
+    def __init__(self, redis_conn, ttl=604800, prefix='validators'):
+        self.redis = redis_conn
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, url):
+        """Get the stored validators and payload for a URL."""
+        try:
+            value = self.redis.get(f'{self.prefix}:{_hash(url)}')
+            return json.loads(value) if value else None
+        except Exception as e:
+            logger.warning(f"Validator store unavailable: {e}")
+            return None
+
+    def set(self, url, etag, last_modified, payload):
+        """Store validators and the payload they validate."""
+        if not etag and not last_modified:
+            return
+        try:
+            self.redis.setex(f'{self.prefix}:{_hash(url)}', self.ttl, json.dumps({
+                'etag': etag,
+                'last_modified': last_modified,
+                'payload': payload,
+                'stored_at': time.time()
+            }))
+        except Exception as e:
+            logger.warning(f"Could not store validators for {url}: {e}")
+
+    def save(self):
+        """Entries are written as they are set."""
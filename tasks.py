@@ -3,15 +3,27 @@ import redis
 import json
 import gc
 import time
-from rq import get_current_job, Queue
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from main import SitemapParser, LLMsTxtGenerator
+from rq import Queue
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from main import SitemapParser, LLMsTxtGenerator, select_sitemap_urls, ContentScraper, HostScheduler, RobotsTxtChecker
+from async_scraper import AsyncContentScraper, AIOHTTP_AVAILABLE
 from firecrawl_working import WorkingFirecrawlScraper
-from utils import validate_config, format_file_size
+from sitemap_cache import SitemapCache, RedisValidatorStore
+from robots import RobotsCache
+from rate_limiter import RedisRateLimiter
+from response_cache import ResponseCache
+from http_transport import HttpTransport, classify_failure
+from concurrency import AdaptiveConcurrency
+from latency import LatencyTracker, HedgeBudget
+from circuit_breaker import CircuitBreaker
+from retry_queue import RetryQueue
+from url_pipeline import HreflangCollapser, UrlDeduplicator, UrlRuleMatcher, chain_filters
+from utils import validate_config
 from datetime import datetime
 import multiprocessing
 import threading
-from collections import defaultdict
+from collections import Counter
+from urllib.parse import urlparse
 
 multiprocessing.set_start_method('spawn', force=True)
 
@@ -22,6 +34,82 @@ os.makedirs('uploads', exist_ok=True)
 REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
 redis_conn = redis.Redis.from_url(REDIS_URL)
 
+# Sitemap cache shared with the web app, so sitemaps parsed during analysis are reused
+sitemap_cache = SitemapCache(redis_conn, ttl=int(os.environ.get('SITEMAP_CACHE_TTL', 900)))
+
+# Parsed robots.txt rules per site, so each batch doesn't fetch and parse robots.txt again
+robots_cache = RobotsCache(redis_conn, ttl=int(os.environ.get('ROBOTS_CACHE_TTL', 86400)))
+
+# Page ETag/Last-Modified validators and extracted content, so the next job for a site
+# sends conditional requests and reuses the content of pages answered with 304
+validator_store = RedisValidatorStore(redis_conn, ttl=int(os.environ.get('VALIDATOR_CACHE_TTL', 604800)))
+
+# Politeness scheduler shared by every batch in this worker process, so request_delay
+# and robots Crawl-delay hold per target site no matter how many threads fetch from it
+host_scheduler = HostScheduler(burst=int(os.environ.get('POLITENESS_BURST', 1)))
+
+# Ceiling on the request rate against one target host across all batch workers
+rate_limiter = RedisRateLimiter(
+    redis_conn,
+    rate=float(os.environ.get('DOMAIN_RATE_LIMIT', 5)),
+    burst=int(os.environ.get('DOMAIN_RATE_BURST', 5))
+)
+
+# On-disk response cache for sitemaps and pages, enabled by pointing RESPONSE_CACHE_DIR at a
+# directory (shared by every worker process on the host, so re-runs for a site skip the downloads)
+response_cache = None
+if os.environ.get('RESPONSE_CACHE_DIR'):
+    response_cache = ResponseCache(
+        os.environ['RESPONSE_CACHE_DIR'],
+        ttl=int(os.environ.get('RESPONSE_CACHE_TTL', 86400)),
+        max_bytes=int(os.environ.get('RESPONSE_CACHE_MAX_MB', 512)) * 1024 * 1024
+    )
+# Requests in flight per target host, widened while the host answers quickly and halved
+# on 429/503, Retry-After, timeouts or latency spikes (shared by every batch of the process)
+host_concurrency = AdaptiveConcurrency(
+    initial=int(os.environ.get('HOST_CONCURRENCY_INITIAL', 4)),
+    min_window=int(os.environ.get('HOST_CONCURRENCY_MIN', 1)),
+    max_window=int(os.environ.get('HOST_CONCURRENCY_MAX', 40))
+)
+
+# Per-host latency percentiles: timeouts follow each host's p99 (ADAPTIVE_TIMEOUTS=0 keeps
+# REQUEST_TIMEOUT), and with HEDGE_REQUESTS=1 a request slower than the host's p95 is sent
+# a second time, for at most HEDGE_BUDGET extra requests
+latency_tracker = LatencyTracker(timeout_multiplier=4.0 if os.environ.get('ADAPTIVE_TIMEOUTS', '1') == '1' else None)
+hedge_budget = None
+if os.environ.get('HEDGE_REQUESTS', '0') == '1':
+    hedge_budget = HedgeBudget(float(os.environ.get('HEDGE_BUDGET', 0.05)))
+
+# Per-host circuit breaker: after CIRCUIT_FAILURE_THRESHOLD consecutive timeouts, connection
+# errors or 403/429/5xx answers, requests to the host fail at once for CIRCUIT_RECOVERY_TIMEOUT
+# seconds (shared with the other workers through Redis) instead of each waiting out its timeout
+circuit_breaker = CircuitBreaker(
+    redis_conn,
+    failure_threshold=int(os.environ.get('CIRCUIT_FAILURE_THRESHOLD', 5)),
+    recovery_timeout=float(os.environ.get('CIRCUIT_RECOVERY_TIMEOUT', 30))
+)
+
+# One pooled, retrying HTTP layer per worker process, shared by every batch and thread
+http_transport = HttpTransport(
+    cache=response_cache,
+    timeout=int(os.environ.get('REQUEST_TIMEOUT', 30)),
+    pool_size=int(os.environ.get('CONNECTION_POOL_SIZE', 20)),
+    max_retries=int(os.environ.get('MAX_RETRIES', 3)),
+    retry_delay=float(os.environ.get('RETRY_DELAY', 1)),
+    concurrency=host_concurrency,
+    latency=latency_tracker,
+    hedge_budget=hedge_budget,
+    breaker=circuit_breaker
+)
+
+# URLs that failed with a timeout, connection error, 429 or 5xx, retried with backoff once
+# the main batches leave capacity idle
+retry_queue = RetryQueue(
+    redis_conn,
+    max_attempts=int(os.environ.get('URL_RETRY_ATTEMPTS', 3)),
+    base_delay=float(os.environ.get('URL_RETRY_DELAY', 10))
+)
+
 # Configure queues for different job types
 batch_queue = Queue('batch_processing', connection=redis_conn)
 merge_queue = Queue('merge_processing', connection=redis_conn)
@@ -29,7 +117,17 @@ merge_queue = Queue('merge_processing', connection=redis_conn)
 # Batch processing configuration
 BATCH_SIZE = 50  # URLs per batch
 MAX_CONCURRENT_BATCHES = 10  # Maximum concurrent batches per job
-MAX_WORKERS_PER_BATCH = 4  # Threads per batch
+# Threads per batch: enough for the largest host window; host_concurrency decides how many fetch at once
+MAX_WORKERS_PER_BATCH = -(-host_concurrency.max_window // MAX_CONCURRENT_BATCHES)
+ASYNC_BATCH_SIZE = 500  # URLs per batch with the async backend (one event loop per batch)
+
+def get_scraper_backend(config):
+    """Scraper backend for the batch workers: 'firecrawl' (default), 'requests' or 'async'."""
+    backend = config.get('scraper_backend', 'firecrawl')
+    if backend == 'async' and not AIOHTTP_AVAILABLE:
+        print("⚠️ aiohttp is not installed, using the requests scraper backend instead of async")
+        return 'requests'
+    return backend
 
 def log_progress(task_id, message, progress_data=None):
     """Log progress with optional progress data for frontend."""
@@ -45,6 +143,22 @@ def log_progress(task_id, message, progress_data=None):
     redis_conn.rpush(f'logs:{task_id}', json.dumps(log_entry))
     redis_conn.expire(f'logs:{task_id}', 3600)
 
+def record_job_stats(task_id, counts):
+    """Add a batch's counters (e.g. pages skipped or capped) to the job's totals in Redis."""
+    counts = {key: value for key, value in counts.items() if value}
+    if not counts:
+        return
+    stats_key = f'stats:{task_id}'
+    pipe = redis_conn.pipeline()
+    for key, value in counts.items():
+        pipe.hincrby(stats_key, key, value)
+    pipe.expire(stats_key, 3600)
+    pipe.execute()
+
+def get_job_stats(task_id):
+    """Counters recorded for a job so far."""
+    return {key.decode('utf-8'): int(value) for key, value in redis_conn.hgetall(f'stats:{task_id}').items()}
+
 def process_url_batch(batch_data, task_id, batch_id):
     """Process a single batch of URLs with memory management."""
     print("DEBUG: process_url_batch called, scraped_content will be initialized")
@@ -53,6 +167,10 @@ def process_url_batch(batch_data, task_id, batch_id):
         config = batch_data['config']
         urls = batch_data['urls']
         batch_start = batch_data.get('batch_start', 0)
+        head_only_urls = set(batch_data.get('head_only_urls', ()))
+        # Attempt number per URL in retry batches
+        retry_attempts = batch_data.get('retry_attempts', {})
+        failures = {}
         
         # DEBUG: Check config for firecrawl_api_key
         firecrawl_api_key = config.get('firecrawl_api_key')
@@ -66,35 +184,69 @@ def process_url_batch(batch_data, task_id, batch_id):
         
         log_progress(task_id, f'Starting batch {batch_id} with {len(urls)} URLs')
         
-        content_scraper = WorkingFirecrawlScraper(config)
-        
-        # Process URLs in parallel within the batch
-        with ThreadPoolExecutor(max_workers=MAX_WORKERS_PER_BATCH) as executor:
-            future_to_url = {}
+        backend = get_scraper_backend(config)
+        if backend == 'async':
+            # One event loop fetches the whole batch concurrently, with per-host caps
+            completed = 0
             
-            for i, url_data in enumerate(urls):
-                future = executor.submit(
-                    scrape_single_url, 
-                    content_scraper, 
-                    url_data, 
-                    config
-                )
-                future_to_url[future] = (url_data, i)
+            def on_result(url_data, content):
+                nonlocal completed
+                completed += 1
+                if completed % 10 == 0:
+                    log_progress(task_id, f'Batch {batch_id}: Processed {completed}/{len(urls)} URLs')
             
-            # Collect results as they complete
-            for future in as_completed(future_to_url):
-                url_data, index = future_to_url[future]
-                try:
-                    content = future.result()
-                    if content:
-                        scraped_content[url_data['loc']] = content
-                        
-                        # Log progress every 10 URLs
-                        if (batch_start + index + 1) % 10 == 0:
-                            log_progress(task_id, f'Batch {batch_id}: Processed {index + 1}/{len(urls)} URLs')
+            content_scraper = AsyncContentScraper(config, validator_store=validator_store,
+                                                  scheduler=host_scheduler, rate_limiter=rate_limiter,
+                                                  concurrency=host_concurrency, latency=latency_tracker,
+                                                  breaker=circuit_breaker)
+            set_robots_checker(content_scraper, urls, config)
+            scraped_content = content_scraper.scrape_urls(urls, config, on_result=on_result, head_only_urls=head_only_urls)
+            failures = {url: failure for url, failure in content_scraper.failures.items() if url not in scraped_content}
+        else:
+            if backend == 'requests':
+                content_scraper = ContentScraper(config, validator_store=validator_store, scheduler=host_scheduler,
+                                                 transport=http_transport, rate_limiter=rate_limiter)
+                set_robots_checker(content_scraper, urls, config)
+            else:
+                # Firecrawl fetches pages on its own infrastructure, so request_delay and Crawl-delay
+                # don't apply; its requests still take rate limiter tokens (see scrape_single_url)
+                content_scraper = WorkingFirecrawlScraper(config)
+            
+            # Process URLs in parallel within the batch
+            with ThreadPoolExecutor(max_workers=MAX_WORKERS_PER_BATCH) as executor:
+                future_to_url = {}
+                
+                for i, url_data in enumerate(urls):
+                    future = executor.submit(
+                        scrape_single_url, 
+                        content_scraper, 
+                        url_data, 
+                        config,
+                        url_data['loc'] in head_only_urls
+                    )
+                    future_to_url[future] = (url_data, i)
+                
+                # Collect results as they complete
+                for future in as_completed(future_to_url):
+                    url_data, index = future_to_url[future]
+                    try:
+                        content, failure = future.result()
+                        if failure:
+                            failures[url_data['loc']] = failure
+                        if content:
+                            scraped_content[url_data['loc']] = content
                             
-                except Exception as e:
-                    log_progress(task_id, f'Error processing {url_data["loc"]}: {str(e)}')
+                            # Log progress every 10 URLs
+                            if (batch_start + index + 1) % 10 == 0:
+                                log_progress(task_id, f'Batch {batch_id}: Processed {index + 1}/{len(urls)} URLs')
+                                
+                    except Exception as e:
+                        log_progress(task_id, f'Error processing {url_data["loc"]}: {str(e)}')
+        
+        # Non-HTML pages skipped unread and pages cut off at max_page_bytes
+        download_stats = getattr(content_scraper, 'download_stats', {})
+        record_job_stats(task_id, {f'pages_{kind}': count for kind, count in download_stats.items()})
+        record_job_stats(task_id, queue_retries(task_id, urls, scraped_content, failures, retry_attempts, head_only_urls))
         
         # Save batch results to Redis
         batch_key = f'batch:{task_id}:{batch_id}'
@@ -110,20 +262,105 @@ def process_url_batch(batch_data, task_id, batch_id):
         log_progress(task_id, f'Batch {batch_id} failed: {str(e)}')
         raise
 
-def scrape_single_url(content_scraper, url_data, config):
-    """Scrape a single URL with error handling."""
+def set_robots_checker(content_scraper, urls, config):
+    """Load robots.txt for the batch's site if enabled, which also applies its Crawl-delay."""
+    if not config.get('respect_robots_txt') or not urls:
+        return
+    parsed = urlparse(urls[0]['loc'])
+    content_scraper.set_robots_checker(RobotsTxtChecker(f"{parsed.scheme}://{parsed.netloc}",
+                                                        transport=http_transport, cache=robots_cache))
+
+def queue_retries(task_id, urls, scraped_content, failures, retry_attempts, head_only_urls):
+    """Push a batch's retryable failures to the retry queue; returns per-reason counters for the job stats."""
+    counts = Counter()
+    for url_data in urls:
+        url = url_data['loc']
+        attempt = retry_attempts.get(url, 0)
+        if url in scraped_content:
+            if attempt:
+                counts['retries_recovered'] += 1
+            continue
+        if url not in failures:
+            continue
+        reason, retryable = failures[url]
+        counts[f'failed_{reason}'] += 1
+        if not retryable:
+            continue
+        if retry_queue.push(task_id, url_data, reason, attempt + 1, head_only=url in head_only_urls):
+            counts['retries_queued'] += 1
+        else:
+            counts['retries_exhausted'] += 1
+    return counts
+
+def next_retry_batch(task_id, config, batch_size):
+    """Batch of failed URLs whose backoff has passed, or None if none is due."""
+    entries = retry_queue.pop_due(task_id, batch_size)
+    if not entries:
+        return None
+    return {
+        'config': config,
+        'urls': [entry['url_data'] for entry in entries],
+        'batch_start': 0,
+        'head_only_urls': [entry['url_data']['loc'] for entry in entries if entry['head_only']],
+        'retry_attempts': {entry['url_data']['loc']: entry['attempt'] for entry in entries}
+    }
+
+def scrape_single_url(content_scraper, url_data, config, head_only=False):
+    """Scrape a single URL with error handling, returning (content, failure).
+    
+    ``failure`` is (reason, retryable) from classify_failure when the page
+    could not be scraped. ``head_only`` fetches just the listing fields.
+    """
+    # Don't queue for the rate limiter behind a host that is failing anyway
+    if circuit_breaker.is_open(url_data['loc']):
+        return None, ('circuit_open', True)
+    # The local scrapers go through http_transport, which checks and feeds the breaker itself,
+    # and take a rate limiter token for each request they send (refetches and nested pages too)
+    external = not isinstance(content_scraper, ContentScraper)
     try:
+        if external:
+            # Every scrape still reaches the target host, so it counts against the shared ceiling
+            rate_limiter.acquire(url_data['loc'])
+            if not circuit_breaker.allow(url_data['loc']):
+                return None, ('circuit_open', True)
+        
+        # Only the local scrapers can stop reading at </head>
+        kwargs = {'head_only': True} if head_only and isinstance(content_scraper, ContentScraper) else {}
         if url_data.get('lastmod'):
-            content = content_scraper.scrape_content_with_lastmod(url_data['loc'], url_data['lastmod'], config)
+            content = content_scraper.scrape_content_with_lastmod(url_data['loc'], url_data['lastmod'], config, **kwargs)
         else:
-            content = content_scraper.scrape_content(url_data['loc'], config)
+            content = content_scraper.scrape_content(url_data['loc'], config, **kwargs)
             
         if content and url_data.get('source_type'):
             content['source_type'] = url_data['source_type']
-            
-        return content
+        
+        # The scrapers log and record their own errors instead of raising them
+        failure = None
+        if not content:
+            failures = getattr(content_scraper, 'failures', None)
+            if failures is None:
+                # A scraper that can't say why is assumed to have hit something passing
+                failure = ('unknown', True)
+            else:
+                failure = failures.pop(url_data['loc'], None)
+        if external:
+            circuit_breaker.record(url_data['loc'], breaker_status(failure))
+        return content, failure
     except Exception as e:
-        return None
+        failure = classify_failure(e)
+        if external:
+            circuit_breaker.record(url_data['loc'], breaker_status(failure))
+        return None, failure
+
+def breaker_status(failure):
+    """Status to report to the circuit breaker for a scrape outcome (None: the host didn't answer)."""
+    if failure is None:
+        return 200
+    reason, retryable = failure
+    if reason.startswith('http_'):
+        return int(reason[len('http_'):])
+    # Timeouts, connection errors and unexplained failures count against the host
+    return None if retryable else 200
 
 def merge_batches(task_id, total_urls, config):
     """Merge all batch results into final llms.txt file."""
@@ -187,7 +424,8 @@ def merge_batches(task_id, total_urls, config):
                 'stats': {
                     'total_scraped': len(all_scraped_content),
                     'total_urls': total_urls,
-                    'batches_processed': batch_count
+                    'batches_processed': batch_count,
+                    **get_job_stats(task_id)
                 }
             }
         }
@@ -218,59 +456,94 @@ def generate_llms_background(config, task_id):
     try:
         validate_config(config)
         log_progress(task_id, 'Configuration validated.')
+        # One job at a time per worker process, so the latency report covers just this job
+        latency_tracker.reset_report()
         
-        sitemap_parser = SitemapParser(config)
+        sitemap_parser = SitemapParser(config, cache=sitemap_cache, scheduler=host_scheduler, transport=http_transport)
         
         log_progress(task_id, 'Parsing sitemap...')
-        urls_data = sitemap_parser.parse_sitemap(config['sitemap_url'])
-        total_urls = len(urls_data)
         
-        log_progress(task_id, f'Found {total_urls} URLs.', {
-            'scraped': 0,
-            'total': total_urls,
-            'percentage': 0
-        })
+        # Tier limits
+        max_blogs = config.get('max_blogs', 10)
+        max_pages = config.get('max_pages_to_process', 10)
+        max_products = config.get('max_products', 10)
+        
+        # Uncategorized URLs are processed as pages, so they share the page limit
+        limits = {
+            'blog': max_blogs,
+            'page': max_pages,
+            'product': max_products
+        }
+        share = {'uncategorized': 'page'}
+        
+        # Drop translations, excluded and duplicate URLs before they count against the limits
+        collapser = HreflangCollapser.from_config(config)
+        rule_matcher = UrlRuleMatcher.from_config(config)
+        deduplicator = UrlDeduplicator.from_config(config)
+        url_filter = chain_filters(collapser, rule_matcher, deduplicator)
+        
+        # Ranked by priority, lastmod and changefreq among a bounded number of candidates, or in sitemap order
+        selected_urls, ranked = select_sitemap_urls(sitemap_parser, config['sitemap_url'], config, limits,
+                                                    share=share, url_filter=url_filter)
+        if ranked is not None:
+            log_progress(task_id, f'Ranked {ranked} sitemap URLs by priority, lastmod and changefreq')
         
-        # Separate URLs by type
         blog_urls = []
         page_urls = []
         product_urls = []
         
-        for url_data in urls_data:
-            if url_data.get('source_type') == 'blog':
+        for url_data in selected_urls:
+            source_type = url_data.get('source_type')
+            if source_type == 'blog':
                 blog_urls.append(url_data)
-            elif url_data.get('source_type') == 'page':
-                page_urls.append(url_data)
-            elif url_data.get('source_type') == 'product':
+            elif source_type == 'product':
                 product_urls.append(url_data)
             else:
                 page_urls.append(url_data)
         
+        total_urls = len(blog_urls) + len(page_urls) + len(product_urls)
+        
+        log_progress(task_id, f'Found {total_urls} URLs within tier limits.', {
+            'scraped': 0,
+            'total': total_urls,
+            'percentage': 0
+        })
+        
         log_progress(task_id, f'Categorized URLs: {len(blog_urls)} blogs, {len(page_urls)} pages, {len(product_urls)} products')
         
-        # Apply tier limits
-        max_blogs = config.get('max_blogs', 10)
-        max_pages = config.get('max_pages_to_process', 10)
-        max_products = config.get('max_products', 10)
+        if collapser and collapser.collapsed:
+            log_progress(task_id, f'Skipped {collapser.collapsed} hreflang translations of already selected pages')
         
-        blog_urls = blog_urls[:max_blogs]
-        page_urls = page_urls[:max_pages]
-        product_urls = product_urls[:max_products]
+        if rule_matcher and rule_matcher.excluded:
+            log_progress(task_id, f'Excluded {rule_matcher.excluded} URLs by URL rules')
+        
+        if deduplicator and deduplicator.duplicates:
+            log_progress(task_id, f'Skipped {deduplicator.duplicates} duplicate URLs (saved {deduplicator.duplicates} fetches)')
         
         # Combine all URLs for batch processing
         all_urls = blog_urls + page_urls + product_urls
         total_to_process = len(all_urls)
         
-        log_progress(task_id, f'Will process {total_to_process} URLs in batches of {BATCH_SIZE}')
+        batch_size = ASYNC_BATCH_SIZE if get_scraper_backend(config) == 'async' else BATCH_SIZE
+        log_progress(task_id, f'Will process {total_to_process} URLs in batches of {batch_size}')
+        
+        # Only pages headed for Detailed Content need their body; the listings are filled from <head>
+        head_only_urls = set()
+        if get_scraper_backend(config) != 'firecrawl':
+            head_only_urls = LLMsTxtGenerator(config).head_only_urls(all_urls)
+            if head_only_urls:
+                log_progress(task_id, f'Fetching only the <head> of {len(head_only_urls)} listing pages, '
+                                      f'full pages for {total_to_process - len(head_only_urls)}')
         
         # Create batches
         batches = []
-        for i in range(0, len(all_urls), BATCH_SIZE):
-            batch_urls = all_urls[i:i + BATCH_SIZE]
+        for i in range(0, len(all_urls), batch_size):
+            batch_urls = all_urls[i:i + batch_size]
             batches.append({
                 'config': config,
                 'urls': batch_urls,
-                'batch_start': i
+                'batch_start': i,
+                'head_only_urls': [url_data['loc'] for url_data in batch_urls if url_data['loc'] in head_only_urls]
             })
         
         log_progress(task_id, f'Created {len(batches)} batches')
@@ -287,26 +560,69 @@ def generate_llms_background(config, task_id):
                 future = executor.submit(process_url_batch, batch_data, task_id, i)
                 future_to_batch[future] = i
             
-            # Process completed batches and submit new ones
-            for future in as_completed(future_to_batch):
-                batch_id = future_to_batch[future]
-                try:
-                    batch_scraped = future.result()
-                    completed_batches += 1
-                    total_scraped += batch_scraped
-                    
-                    # Update progress
-                    percentage = int((completed_batches / len(batches)) * 100)
-                    log_progress(task_id, f'Completed {completed_batches}/{len(batches)} batches ({percentage}%)', {
-                        'scraped': total_scraped,
-                        'total': total_to_process,
-                        'percentage': percentage
-                    })
-                    
-                except Exception as e:
-                    log_progress(task_id, f'Batch {batch_id} failed: {str(e)}')
+            # Process completed batches; failed URLs due for a retry only get the capacity
+            # the main batches leave idle, then whatever is left is drained at the end
+            next_batch_id = len(batches)
+            while future_to_batch:
+                done, _ = wait(future_to_batch, timeout=1.0, return_when=FIRST_COMPLETED)
+                for future in done:
+                    batch_id = future_to_batch.pop(future)
+                    try:
+                        batch_scraped = future.result()
+                        total_scraped += batch_scraped
+                        if batch_id < len(batches):
+                            completed_batches += 1
+                        
+                        # Update progress
+                        percentage = int((completed_batches / len(batches)) * 100)
+                        if batch_id >= len(batches):
+                            log_progress(task_id, f'Retry batch {batch_id}: recovered {batch_scraped} URLs', {
+                                'scraped': total_scraped,
+                                'total': total_to_process,
+                                'percentage': percentage
+                            })
+                            continue
+                        log_progress(task_id, f'Completed {completed_batches}/{len(batches)} batches ({percentage}%)', {
+                            'scraped': total_scraped,
+                            'total': total_to_process,
+                            'percentage': percentage,
+                            'concurrency': host_concurrency.windows(),
+                            'open_circuits': circuit_breaker.open_hosts()
+                        })
+                        
+                    except Exception as e:
+                        log_progress(task_id, f'Batch {batch_id} failed: {str(e)}')
+                
+                while len(future_to_batch) < MAX_CONCURRENT_BATCHES:
+                    retry_batch = next_retry_batch(task_id, config, batch_size)
+                    if retry_batch is None:
+                        delay = retry_queue.next_due_in(task_id)
+                        if future_to_batch or delay is None:
+                            break
+                        # Only retries left: wait for the next one to come due
+                        time.sleep(min(delay, 5.0))
+                        continue
+                    log_progress(task_id, f'Retrying {len(retry_batch["urls"])} failed URLs in batch {next_batch_id}')
+                    future = executor.submit(process_url_batch, retry_batch, task_id, next_batch_id)
+                    future_to_batch[future] = next_batch_id
+                    next_batch_id += 1
         
         log_progress(task_id, f'All batches completed! Total scraped: {total_scraped}/{total_to_process}')
+        latency_report = latency_tracker.report()
+        record_job_stats(task_id, latency_report)
+        if latency_report.get('hedged_requests'):
+            log_progress(task_id, f"Hedged {latency_report['hedged_requests']} slow requests "
+                                  f"({latency_report['hedges_won']} answered first): p50 "
+                                  f"{latency_report['unhedged_latency_p50_ms']} -> {latency_report['latency_p50_ms']} ms, p99 "
+                                  f"{latency_report['unhedged_latency_p99_ms']} -> {latency_report['latency_p99_ms']} ms")
+        job_stats = get_job_stats(task_id)
+        if job_stats.get('retries_queued'):
+            log_progress(task_id, f"Retried failed URLs {job_stats['retries_queued']} times: "
+                                  f"{job_stats.get('retries_recovered', 0)} recovered, "
+                                  f"{job_stats.get('retries_exhausted', 0)} gave up after {retry_queue.max_attempts} attempts")
+        if job_stats.get('pages_skipped') or job_stats.get('pages_capped'):
+            log_progress(task_id, f"Skipped {job_stats.get('pages_skipped', 0)} non-HTML pages, "
+                                  f"truncated {job_stats.get('pages_capped', 0)} pages at max_page_bytes")
         
         # Merge batches into final file
         return merge_batches(task_id, total_to_process, config)
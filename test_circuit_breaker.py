@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Test script for the per-host circuit breaker (runs offline against a local fixture server)
+"""
+
+import sys
+import os
+import time
+import uuid
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import requests
+
+from circuit_breaker import CircuitBreaker, CircuitOpenError, CLOSED, OPEN, HALF_OPEN
+from main import ContentScraper
+from async_scraper import AsyncContentScraper, AIOHTTP_AVAILABLE
+from http_transport import HttpTransport, classify_failure
+from concurrency import AdaptiveConcurrency
+from fixture_server import FixtureServer, connect_test_redis
+
+CONFIG = {'max_content_length': 500, 'request_delay': 0}
+
+
+def test_breaker_states():
+    """Consecutive failures open the circuit; after the timeout one probe decides."""
+    breaker = CircuitBreaker(failure_threshold=3, recovery_timeout=0.2)
+    url = 'https://example.com/page'
+    breaker.record(url, 500)
+    breaker.record(url, 404)
+    breaker.record(url)
+    breaker.record(url, 403)
+    assert breaker.state(url) == CLOSED and breaker.allow(url)
+    breaker.record(url, 503)
+    assert breaker.state(url) == OPEN and not breaker.allow(url) and breaker.is_open(url)
+    assert breaker.open_hosts() == ['example.com']
+    assert breaker.allow('https://other.example.com/')
+
+    time.sleep(0.25)
+    assert not breaker.is_open(url)
+    assert breaker.allow(url) and breaker.state(url) == HALF_OPEN
+    assert not breaker.allow(url) and breaker.is_open(url)
+    breaker.record(url)
+    assert breaker.state(url) == OPEN
+
+    time.sleep(0.25)
+    assert breaker.allow(url)
+    breaker.record(url, 200)
+    assert breaker.state(url) == CLOSED and breaker.allow(url) and breaker.open_hosts() == []
+    print("✅ Circuit opens, half-opens for one probe and closes again")
+
+
+def test_breaker_shared_through_redis():
+    """A circuit opened by one worker is respected by another."""
+    conn = connect_test_redis()
+    if conn is None:
+        print("⚠️ No Redis or fakeredis available, skipping")
+        return
+    prefix = f'circuit-test-{uuid.uuid4().hex}'
+    first = CircuitBreaker(conn, failure_threshold=1, recovery_timeout=30, prefix=prefix)
+    second = CircuitBreaker(conn, failure_threshold=1, recovery_timeout=30, prefix=prefix)
+    url = 'https://example.com/'
+    assert second.allow(url)
+    first.record(url)
+    time.sleep(1.1)
+    assert not second.allow(url) and second.state(url) == OPEN
+    print("✅ Open circuit shared between workers")
+
+
+def test_open_circuit_fails_fast():
+    """Once a site keeps failing, the remaining pages fail at once as retryable."""
+    routes = {f'/down{i}': {'status': 503} for i in range(5)}
+    with FixtureServer(routes) as server:
+        breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=30)
+        transport = HttpTransport(max_retries=3, retry_delay=0.01, breaker=breaker)
+        scraper = ContentScraper(CONFIG, transport=transport)
+        assert scraper.scrape_content(server.url('/down0')) is None
+        # A page's retries count once, so they can't open the circuit on their own
+        assert breaker.state(server.url('/')) == CLOSED
+        for path in list(routes)[1:]:
+            assert scraper.scrape_content(server.url(path)) is None
+        # Two pages, each tried 1 + 3 times, opened the circuit; nothing else reached the site
+        assert sum(server.hits(path) for path in routes) == 8
+        assert scraper.failures[server.url('/down1')] == ('http_503', True)
+        assert scraper.failures[server.url('/down4')] == ('circuit_open', True)
+        assert classify_failure(CircuitOpenError('example.com')) == ('circuit_open', True)
+
+        if not AIOHTTP_AVAILABLE:
+            print("⚠️ aiohttp not installed, skipping the async backend")
+            return
+        async_breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=30)
+        one_at_a_time = AdaptiveConcurrency(initial=1, max_window=1)
+        async_scraper = AsyncContentScraper(CONFIG, concurrency=one_at_a_time, breaker=async_breaker)
+        assert async_scraper.scrape_urls([{'loc': server.url(path)} for path in routes]) == {}
+        assert sum(server.hits(path) for path in routes) == 10
+        assert list(async_scraper.failures.values()).count(('circuit_open', True)) == 3
+    print("✅ Pages of a failing site fail fast once its circuit is open")
+
+
+class DownFirecrawlApp:
+    """Stands in for FirecrawlApp against a site that keeps answering 503."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def scrape_url(self, url, **kwargs):
+        self.calls += 1
+        response = requests.Response()
+        response.status_code = 503
+        raise requests.HTTPError(response=response)
+
+
+def test_firecrawl_outcomes_recorded():
+    """The Firecrawl backend bypasses HttpTransport, so the worker records its outcomes itself."""
+    try:
+        import tasks
+        from firecrawl_working import WorkingFirecrawlScraper
+    except ImportError as e:
+        print(f"⚠️ Worker dependencies not installed ({e}), skipping")
+        return
+    scraper = WorkingFirecrawlScraper.__new__(WorkingFirecrawlScraper)
+    scraper.config, scraper.app, scraper.failures = CONFIG, DownFirecrawlApp(), {}
+    shared = tasks.circuit_breaker
+    tasks.circuit_breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=30)
+    try:
+        outcomes = [tasks.scrape_single_url(scraper, {'loc': f'https://example.com/p{i}'}, CONFIG) for i in range(4)]
+        assert tasks.circuit_breaker.state('https://example.com/') == OPEN
+    finally:
+        tasks.circuit_breaker = shared
+    assert [failure for _, failure in outcomes] == [('http_503', True)] * 2 + [('circuit_open', True)] * 2
+    assert scraper.app.calls == 2
+    assert tasks.breaker_status(None) == 200 and tasks.breaker_status(('http_404', False)) == 404
+    assert tasks.breaker_status(('timeout', True)) is None and tasks.breaker_status(('error', False)) == 200
+    print("✅ Firecrawl failures open the circuit")
+
+
+if __name__ == "__main__":
+    test_breaker_states()
+    test_breaker_shared_through_redis()
+    test_open_circuit_fails_fast()
+    test_firecrawl_outcomes_recorded()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Test script for the adaptive (AIMD) per-host concurrency controller (runs offline against a local fixture server)
+"""
+
+import sys
+import os
+import time
+import asyncio
+import threading
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from concurrency import AdaptiveConcurrency
+from http_transport import HttpTransport
+from async_scraper import AsyncContentScraper, AIOHTTP_AVAILABLE
+from fixture_server import FixtureServer
+
+URL = 'https://example.com/page'
+
+
+def answer(controller, url=URL, **outcome):
+    controller.acquire(url)
+    controller.release(url, **outcome)
+
+
+def test_additive_increase_multiplicative_decrease():
+    """Fast successes widen the window by about one per window; overload signals halve it."""
+    controller = AdaptiveConcurrency(initial=4, max_window=10, cooldown=0)
+    for _ in range(4):
+        answer(controller, latency=0.1, status=200)
+    assert 4.9 < controller.window(URL) < 5.1
+
+    for _ in range(500):
+        answer(controller, latency=0.1, status=200)
+    assert controller.window(URL) == 10
+
+    answer(controller, latency=0.1, status=429)
+    assert controller.window(URL) == 5
+    answer(controller, latency=0.1, status=200, retry_after=2.0)
+    assert controller.window(URL) == 2.5
+    answer(controller, latency=0.1, status=503)
+    answer(controller)
+    assert controller.window(URL) == 1
+    # Other hosts are unaffected; a quick 404 is a healthy answer, a 500 is neither
+    assert controller.window('https://cdn.example.com/') == 4
+    answer(controller, latency=0.1, status=500)
+    assert controller.window(URL) == 1
+    answer(controller, latency=0.1, status=404)
+    assert controller.windows() == {'example.com': 2}
+    print("✅ Window grows additively and shrinks multiplicatively")
+
+
+def test_latency_spike_and_cooldown():
+    """A latency spike counts as congestion; a burst of failures only cuts the window once."""
+    controller = AdaptiveConcurrency(initial=8, max_window=8, cooldown=60)
+    for _ in range(10):
+        answer(controller, latency=0.2, status=200)
+    answer(controller, latency=0.25, status=200)
+    assert controller.window(URL) == 8
+    answer(controller, latency=2.0, status=200)
+    assert controller.window(URL) == 4
+    for _ in range(5):
+        answer(controller, latency=0.2, status=503)
+    assert controller.window(URL) == 4
+    print("✅ Latency spikes back off, once per cooldown")
+
+
+def test_window_limits_threads():
+    """Threads beyond the host's window wait for a slot."""
+    controller = AdaptiveConcurrency(initial=2, max_window=2)
+    in_flight = []
+    peak = []
+    lock = threading.Lock()
+
+    def fetch():
+        controller.acquire(URL)
+        with lock:
+            in_flight.append(1)
+            peak.append(len(in_flight))
+        time.sleep(0.05)
+        with lock:
+            in_flight.pop()
+        controller.release(URL, latency=0.05, status=200)
+
+    threads = [threading.Thread(target=fetch) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert max(peak) == 2
+    # Every slot was given back
+    assert controller.try_acquire(URL) and controller.try_acquire(URL)
+    assert not controller.try_acquire(URL)
+    print(f"✅ At most {max(peak)} requests in flight")
+
+
+def test_acquire_async_waits_for_release():
+    """Coroutines wait for a slot without polling and wake when another thread gives one back."""
+    controller = AdaptiveConcurrency(initial=1, max_window=1)
+    controller.acquire(URL)
+    order = []
+
+    async def fetch(n):
+        await controller.acquire_async(URL)
+        order.append(n)
+        await asyncio.sleep(0.01)
+        controller.release(URL, latency=0.01, status=200)
+
+    async def run():
+        waiting = asyncio.gather(*(fetch(n) for n in range(3)))
+        await asyncio.sleep(0.05)
+        # Nothing runs until the slot held by the other thread comes back
+        assert order == []
+        threading.Timer(0.01, controller.release, args=(URL,), kwargs={'latency': 0.01, 'status': 200}).start()
+        await asyncio.wait_for(waiting, timeout=2)
+
+    asyncio.run(run())
+    assert sorted(order) == [0, 1, 2]
+    assert controller.try_acquire(URL) and not controller.try_acquire(URL)
+    print("✅ Waiting coroutines woken when a slot is released")
+
+
+def test_transport_reports_to_controller():
+    """The transport's attempts feed the controller, so a 429 narrows the host's window."""
+    state = {'calls': 0}
+
+    def limited(headers):
+        state['calls'] += 1
+        if state['calls'] == 1:
+            return {'status': 429, 'headers': {'Retry-After': '0'}}
+        return {'body': 'ok', 'headers': {'Content-Type': 'text/plain'}}
+
+    with FixtureServer({'/limited': {'handler': limited}, '/ok': {'body': 'ok'}}) as server:
+        controller = AdaptiveConcurrency(initial=4, cooldown=0)
+        transport = HttpTransport(max_retries=1, retry_delay=0.01, concurrency=controller)
+        assert transport.get(server.url('/limited')).text == 'ok'
+        window = controller.window(server.url('/'))
+        assert 2 < window < 2.6
+        transport.get(server.url('/ok'))
+        assert controller.window(server.url('/')) > window
+    print("✅ Transport feeds status and latency to the controller")
+
+
+def test_streamed_body_holds_the_slot():
+    """A streamed response keeps its slot until the body is read or the response closed."""
+    with FixtureServer({'/page': {'body': 'x' * 100000}}) as server:
+        controller = AdaptiveConcurrency(initial=1, max_window=1)
+        transport = HttpTransport(concurrency=controller)
+        url = server.url('/page')
+
+        response = transport.get(url, stream=True)
+        assert not controller.try_acquire(url)
+        assert len(b''.join(response.iter_content(8192))) == 100000
+        assert controller.try_acquire(url)
+        controller.cancel(url)
+
+        response = transport.get(url, stream=True)
+        next(response.iter_content(1024))
+        assert not controller.try_acquire(url)
+        response.close()
+        assert controller.try_acquire(url)
+        controller.cancel(url)
+
+        # Non-streamed bodies are read before the request returns
+        assert len(transport.get(url).content) == 100000
+        assert controller.try_acquire(url)
+    print("✅ Slot held while the body downloads")
+
+
+def test_async_backend_uses_the_window():
+    """The async backend keeps its requests to a host within the window."""
+    if not AIOHTTP_AVAILABLE:
+        print("⚠️ aiohttp not installed, skipping")
+        return
+    in_flight = []
+    peak = []
+    lock = threading.Lock()
+
+    def slow(headers):
+        with lock:
+            in_flight.append(1)
+            peak.append(len(in_flight))
+        time.sleep(0.05)
+        with lock:
+            in_flight.pop()
+        return {'body': '<html><head><title>Page</title></head><body><article>Some page text.</article></body></html>',
+                'headers': {'Content-Type': 'text/html'}}
+
+    routes = {f'/p{i}': {'handler': slow} for i in range(12)}
+    with FixtureServer(routes) as server:
+        controller = AdaptiveConcurrency(initial=3, max_window=3)
+        scraper = AsyncContentScraper({'request_delay': 0}, concurrency=controller)
+        results = scraper.scrape_urls([{'loc': server.url(path)} for path in routes])
+    assert len(results) == 12
+    assert max(peak) <= 3
+    print(f"✅ Async backend kept at most {max(peak)} requests in flight")
+
+
+if __name__ == "__main__":
+    test_additive_increase_multiplicative_decrease()
+    test_latency_spike_and_cooldown()
+    test_window_limits_threads()
+    test_acquire_async_waits_for_release()
+    test_transport_reports_to_controller()
+    test_streamed_body_holds_the_slot()
+    test_async_backend_uses_the_window()
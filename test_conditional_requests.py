@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Test script for conditional GET revalidation of sitemaps and pages (runs offline)
+"""
+
+import sys
+import os
+import uuid
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from main import SitemapParser, ContentScraper
+from sitemap_cache import SitemapCache, RedisValidatorStore
+from utils import ValidatorStore
+from fixture_server import FixtureServer, urlset, connect_test_redis
+
+PAGE_HTML = """<html><head><title>About us</title>
+<meta name="description" content="Who we are"></head>
+<body><article>We build tools for generating llms.txt files from sitemaps and page content.</article></body></html>"""
+
+
+def conditional(body, etag, content_type='application/xml'):
+    """Route that answers 304 when the client already has the current ETag."""
+    def handler(headers):
+        if headers.get('If-None-Match') == etag:
+            return {'status': 304, 'headers': {'ETag': etag}}
+        return {'body': body, 'headers': {'ETag': etag, 'Content-Type': content_type}}
+    return {'handler': handler}
+
+
+def conditional_requests(server, path):
+    return [h for m, p, h in server.requests if p == path and 'If-None-Match' in h]
+
+
+def test_sitemap_and_page_revalidation_with_file_store():
+    """A second run sends conditional requests and reuses the stored results on 304."""
+    routes = {
+        '/sitemap.xml': conditional(urlset(['https://example.com/about']), '"s1"'),
+        '/about': conditional(PAGE_HTML, '"p1"', 'text/html'),
+    }
+    config = {'max_content_length': 500}
+    with tempfile.TemporaryDirectory() as tmp, FixtureServer(routes) as server:
+        cache_file = os.path.join(tmp, 'validators.json')
+
+        for run in range(2):
+            store = ValidatorStore(cache_file)
+            urls_data = SitemapParser(config, validator_store=store).parse_sitemap(server.url('/sitemap.xml'))
+            content = ContentScraper(config, validator_store=store).scrape_content(server.url('/about'), config)
+            store.save()
+
+            assert [u['loc'] for u in urls_data] == ['https://example.com/about'], run
+            assert content['title'] == 'About us', run
+            assert content['description'] == 'Who we are', run
+
+        assert len(conditional_requests(server, '/sitemap.xml')) == 1
+        assert len(conditional_requests(server, '/about')) == 1
+
+    print("✅ Second run revalidated sitemap and page with 304 responses")
+
+
+def test_changed_settings_skip_stored_content():
+    """Stored page content is not reused when extraction settings change."""
+    routes = {'/about': conditional(PAGE_HTML, '"p1"', 'text/html')}
+    with tempfile.TemporaryDirectory() as tmp, FixtureServer(routes) as server:
+        store = ValidatorStore(os.path.join(tmp, 'validators.json'))
+        ContentScraper({}, validator_store=store).scrape_content(server.url('/about'), {'max_content_length': 500})
+        content = ContentScraper({}, validator_store=store).scrape_content(server.url('/about'), {'max_content_length': 10})
+
+        assert conditional_requests(server, '/about') == []
+
+    assert len(content['content']) == 10
+    print("✅ Changed extraction settings trigger a full fetch")
+
+
+def test_unexpected_304_fetched_again():
+    """A 304 to a request without validators leaves nothing to reuse, so the page is fetched again."""
+    answers = iter([{'status': 304}])
+
+    def handler(headers):
+        return next(answers, {'body': PAGE_HTML, 'headers': {'Content-Type': 'text/html'}})
+
+    with FixtureServer({'/about': {'handler': handler}}) as server:
+        content = ContentScraper({'max_content_length': 500, 'request_delay': 0}).scrape_content(server.url('/about'))
+        assert server.hits('/about') == 2
+    assert content['title'] == 'About us'
+    print("✅ Unexpected 304 followed by an unconditional fetch")
+
+
+def test_stale_redis_cache_revalidates():
+    """A stale sitemap cache entry is revalidated with a conditional request."""
+    conn = connect_test_redis()
+    if conn is None:
+        print("⚠️ Redis not available, skipping")
+        return
+    cache = SitemapCache(conn, ttl=0, prefix=f'test_sitemap_cache:{uuid.uuid4().hex}')
+    routes = {'/sitemap.xml': conditional(urlset(['https://example.com/a', 'https://example.com/b']), '"v1"')}
+    with FixtureServer(routes) as server:
+        first = SitemapParser({}, cache=cache).parse_sitemap(server.url('/sitemap.xml'))
+        second = SitemapParser({}, cache=cache).parse_sitemap(server.url('/sitemap.xml'))
+
+        assert len(conditional_requests(server, '/sitemap.xml')) == 1
+
+    assert first == second
+    print("✅ Stale cached sitemap revalidated with a 304")
+
+
+def test_second_job_revalidates_pages_with_redis_store():
+    """Worker jobs share page validators through Redis, so the next job sends If-None-Match."""
+    conn = connect_test_redis()
+    if conn is None:
+        print("⚠️ Redis not available, skipping")
+        return
+    prefix = f'test_validators:{uuid.uuid4().hex}'
+    config = {'max_content_length': 500}
+    with FixtureServer({'/about': conditional(PAGE_HTML, '"p1"', 'text/html')}) as server:
+        for job in range(2):
+            store = RedisValidatorStore(conn, prefix=prefix)
+            content = ContentScraper(config, validator_store=store).scrape_content(server.url('/about'), config)
+
+            assert content['title'] == 'About us', job
+            assert content['description'] == 'Who we are', job
+
+        assert server.hits('/about') == 2
+        assert len(conditional_requests(server, '/about')) == 1
+
+    print("✅ Second job revalidated the page through the Redis validator store")
+
+
+if __name__ == "__main__":
+    test_sitemap_and_page_revalidation_with_file_store()
+    test_changed_settings_skip_stored_content()
+    test_unexpected_304_fetched_again()
+    test_stale_redis_cache_revalidates()
+    test_second_job_revalidates_pages_with_redis_store()
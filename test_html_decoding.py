@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Test script for decoding pages once before parsing (runs offline against a local fixture server)
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from main import ContentScraper, SiteAnalyzer, decode_html, declared_charset
+from async_scraper import AsyncContentScraper, AIOHTTP_AVAILABLE
+from fixture_server import FixtureServer
+
+CONFIG = {'max_content_length': 500, 'request_delay': 0}
+
+
+def page(title, meta=''):
+    return (f"<html><head>{meta}<title>{title}</title><meta name='description' content='{title}'></head>"
+            f"<body><h1>{title}</h1><article>{title}: {'Text of the page. ' * 20}</article></body></html>")
+
+
+ROUTES = {
+    # Charset only in the header
+    '/header': {'body': page('Größenänderung').encode('cp1252'),
+                'headers': {'Content-Type': 'text/html; charset=windows-1252'}},
+    # Charset only in a <meta> tag, in an encoding detection tends to get wrong
+    '/meta': {'body': page('日本語のページ', "<meta charset='shift_jis'>").encode('shift_jis'),
+              'headers': {'Content-Type': 'text/html'}},
+    '/http-equiv': {'body': page('Русская страница', "<meta http-equiv='Content-Type' content='text/html; charset=koi8-r'>").encode('koi8-r'),
+                    'headers': {'Content-Type': 'text/html'}},
+    # Nothing declared
+    '/undeclared': {'body': page('Überschrift ✓').encode('utf-8'), 'headers': {'Content-Type': 'text/html'}},
+}
+
+
+def test_declared_charset():
+    """The header wins over the <meta> tag, which is only looked for in the first KB."""
+    body = b"<html><head><meta charset='utf-8'>"
+    assert declared_charset(body, 'text/html; charset="Shift_JIS"') == 'shift_jis'
+    assert declared_charset(body, 'text/html') == 'utf-8'
+    assert declared_charset(b"<meta http-equiv='Content-Type' content='text/html; charset=koi8-r'>") == 'koi8-r'
+    assert declared_charset(b' ' * 2000 + body) is None
+    assert declared_charset(body, 'text/html; charset=bogus') == 'utf-8'
+    # Labels browsers read as windows-1252
+    assert declared_charset(b'', 'text/html; charset=iso-8859-1') == 'cp1252'
+    print("✅ Charset taken from the header, else from <meta>")
+
+
+def test_decode_html():
+    """Declared, undeclared, mislabelled and cut-off bodies all decode to the right text."""
+    assert decode_html('Größe'.encode('cp1252'), 'text/html; charset=iso-8859-1') == 'Größe'
+    assert decode_html('Größe'.encode('utf-8')) == 'Größe'
+    # Mislabelled: not valid in the declared charset, so it's detected instead
+    text = '<p>Die Größe der Straße wurde für die Übersicht geändert, schöne Grüße aus München.</p>'
+    assert decode_html(text.encode('cp1252'), 'text/html; charset=utf-8') == text
+    # A body capped in the middle of a character loses just that character
+    assert decode_html('Größe ✓'.encode('utf-8')[:-1], 'text/html; charset=utf-8') == 'Größe '
+    assert decode_html('<p>ok</p>'.encode('utf-16')) == '<p>ok</p>'
+    print("✅ Bodies decoded once, before parsing")
+
+
+def test_scrapers_decode_pages():
+    """Both scraper backends and the site analyzer read every page in its own encoding."""
+    titles = {'/header': 'Größenänderung', '/meta': '日本語のページ', '/http-equiv': 'Русская страница',
+              '/undeclared': 'Überschrift ✓'}
+    with FixtureServer(ROUTES) as server:
+        scraper = ContentScraper(CONFIG)
+        for path, title in titles.items():
+            content = scraper.scrape_content(server.url(path))
+            assert content['title'] == title, (path, content['title'])
+            assert scraper.scrape_content(server.url(path), head_only=True)['description'] == title
+        analysis = SiteAnalyzer(CONFIG).analyze_site(server.url('/meta'))
+        assert '日本語のページ' in analysis['site_name'], analysis['site_name']
+
+        if not AIOHTTP_AVAILABLE:
+            print("⚠️ aiohttp not installed, skipping the async backend")
+            return
+        results = AsyncContentScraper(CONFIG).scrape_urls([{'loc': server.url(path)} for path in titles])
+        assert {url.rsplit('/', 1)[1]: content['title'] for url, content in results.items()} == \
+            {path[1:]: title for path, title in titles.items()}
+    print("✅ Pages in windows-1252, Shift_JIS, KOI8-R and undeclared UTF-8 scraped correctly")
+
+
+if __name__ == "__main__":
+    test_declared_charset()
+    test_decode_html()
+    test_scrapers_decode_pages()
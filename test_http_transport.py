@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Test script for the shared HTTP transport: pooling, retries and timeouts (runs offline)
+"""
+
+import sys
+import os
+import time
+import threading
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import requests
+
+from main import RobotsTxtChecker, SiteAnalyzer, SitemapParser
+from http_transport import HttpTransport, performance_settings
+from fixture_server import FixtureServer, urlset
+
+
+def flaky(failures, status=503, headers=None, body='ok'):
+    """Route that fails ``failures`` times before answering 200."""
+    state = {'calls': 0}
+
+    def handler(request_headers):
+        state['calls'] += 1
+        if state['calls'] <= failures:
+            return {'status': status, 'headers': headers or {}}
+        return {'body': body, 'headers': {'Content-Type': 'text/plain'}}
+    return {'handler': handler}
+
+
+def test_config_driven_settings():
+    """performance.* from config.yaml sizes the pools, retries and timeouts."""
+    config = {'performance': {'request_timeout': 7, 'connection_pool_size': 5, 'max_retries': 1, 'retry_delay': 0.5}}
+    transport = HttpTransport.from_config(config)
+    assert (transport.timeout, transport.pool_size, transport.max_retries, transport.retry_delay) == (7, 5, 1, 0.5)
+    assert performance_settings({})['request_timeout'] == 30
+
+    adapter = transport.session.get_adapter('https://example.com/')
+    assert adapter._pool_connections == 5
+    # The user agent is per transport, e.g. a browser one for site analysis
+    analyzer = SiteAnalyzer(config)
+    assert 'Mozilla' in analyzer.transport.session.headers['User-Agent']
+    print("✅ Transport configured from the performance section")
+
+
+def test_sessions_are_thread_local_and_shared_by_classes():
+    """Each thread reuses one session for every class; other threads get their own."""
+    routes = {'/robots.txt': {'body': 'User-agent: *\nDisallow: /private\n', 'headers': {'Content-Type': 'text/plain'}},
+              '/sitemap.xml': urlset(['https://example.com/a'])}
+    with FixtureServer(routes) as server:
+        transport = HttpTransport()
+        robots = RobotsTxtChecker(server.base_url, transport=transport)
+        parser = SitemapParser({'sitemap_host_delay': 0}, transport=transport)
+        assert not robots.is_allowed(server.url('/private/x'))
+        assert len(parser.parse_sitemap(server.url('/sitemap.xml'))) == 1
+        assert robots.transport.session is parser.transport.session
+
+        sessions = []
+        thread = threading.Thread(target=lambda: sessions.append(transport.session))
+        thread.start()
+        thread.join()
+        assert sessions[0] is not transport.session
+    print("✅ One keep-alive session per thread, shared across classes")
+
+
+def test_retries_with_backoff():
+    """503s and 429s are retried with backoff; Retry-After is honored."""
+    routes = {'/flaky': flaky(2), '/limited': flaky(1, status=429, headers={'Retry-After': '0.3'}), '/down': flaky(10)}
+    with FixtureServer(routes) as server:
+        transport = HttpTransport(max_retries=3, retry_delay=0.01)
+        assert transport.get(server.url('/flaky')).text == 'ok'
+        assert server.hits('/flaky') == 3
+
+        start = time.monotonic()
+        assert transport.get(server.url('/limited')).status_code == 200
+        assert time.monotonic() - start >= 0.3
+
+        # Out of retries: the last answer is returned to the caller
+        assert transport.get(server.url('/down')).status_code == 503
+        assert server.hits('/down') == 4
+
+        # Non-transient errors are not retried
+        assert transport.get(server.url('/missing')).status_code == 404
+        assert server.hits('/missing') == 1
+    print("✅ Transient failures retried with backoff")
+
+
+def test_timeouts_retried_then_raised():
+    """A host that never answers in time fails after max_retries timeouts."""
+    def slow(headers):
+        time.sleep(0.5)
+        return {'body': 'late'}
+
+    with FixtureServer({'/slow': {'handler': slow}}) as server:
+        transport = HttpTransport(timeout=0.1, max_retries=1, retry_delay=0.01)
+        try:
+            transport.get(server.url('/slow'))
+            assert False, "expected a timeout"
+        except requests.Timeout:
+            pass
+        assert server.hits('/slow') == 2
+    print("✅ Timeouts retried, then raised")
+
+
+if __name__ == "__main__":
+    test_config_driven_settings()
+    test_sessions_are_thread_local_and_shared_by_classes()
+    test_retries_with_backoff()
+    test_timeouts_retried_then_raised()
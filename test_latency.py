@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Test script for per-host latency percentiles, adaptive timeouts and hedged requests (runs offline)
+"""
+
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import requests
+
+from latency import LatencyTracker, HedgeBudget, percentile
+from http_transport import HttpTransport
+from fixture_server import FixtureServer
+
+
+def slow_once(seconds):
+    """Route whose first request hangs for ``seconds``; later ones answer at once."""
+    state = {'calls': 0}
+
+    def handler(headers):
+        state['calls'] += 1
+        if state['calls'] == 1:
+            time.sleep(seconds)
+        return {'body': 'ok', 'headers': {'Content-Type': 'text/plain'}}
+    return {'handler': handler}
+
+
+def test_percentiles_and_timeouts():
+    """Timeouts follow the host's p99 once there are enough samples, within bounds."""
+    assert percentile([5, 1, 3, 2, 4], 50) == 3 and percentile([], 99) is None
+    tracker = LatencyTracker(min_samples=10, timeout_multiplier=4, min_timeout=0.5)
+    assert tracker.timeout('example.com', 30) == 30
+    for i in range(100):
+        tracker.record('example.com', 0.2 if i else 1.0)
+    assert tracker.percentile('example.com', 99) == 0.2
+    assert tracker.timeout('example.com', 30) == 0.8
+    assert tracker.timeout('example.com', 0.6) == 0.6
+    tracker.record('fast.example.com', 0.01)
+    assert tracker.timeout('fast.example.com', 30) == 30
+    assert LatencyTracker(timeout_multiplier=None).timeout('example.com', 30) == 30
+    print("✅ Adaptive timeout is 4x the host's p99")
+
+
+def test_hedge_budget():
+    """Hedges are limited to a share of requests."""
+    budget = HedgeBudget(ratio=0.25, burst=1)
+    assert budget.spend() and not budget.spend()
+    for _ in range(3):
+        budget.earn()
+    assert not budget.spend()
+    budget.earn()
+    assert budget.spend()
+    print("✅ Hedge budget earned per request")
+
+
+def test_adaptive_timeout_cuts_hangs_short():
+    """A page hanging far beyond the host's usual latency times out early."""
+    routes = {'/fast': {'body': 'ok'}, '/hang': slow_once(1.5)}
+    with FixtureServer(routes) as server:
+        tracker = LatencyTracker(min_samples=10, min_timeout=0.2)
+        transport = HttpTransport(timeout=30, max_retries=0, latency=tracker)
+        for _ in range(10):
+            transport.get(server.url('/fast'))
+        start = time.monotonic()
+        try:
+            transport.get(server.url('/hang'))
+            assert False, "expected a timeout"
+        except requests.Timeout:
+            pass
+        assert time.monotonic() - start < 1.0
+    print("✅ Hanging page timed out after the adaptive timeout, not 30 s")
+
+
+def test_hedged_request_wins():
+    """A request slower than the host's p95 is duplicated and the faster answer used.
+
+    The original stays on the calling thread and is cut off when the duplicate wins.
+    """
+    routes = {'/fast': {'body': 'ok'}, '/slow': slow_once(1.0)}
+    with FixtureServer(routes) as server:
+        tracker = LatencyTracker(min_samples=10)
+        transport = HttpTransport(max_retries=0, latency=tracker, hedge_budget=HedgeBudget(ratio=0.05, burst=1))
+        for _ in range(10):
+            transport.get(server.url('/fast'))
+        start = time.monotonic()
+        assert transport.get(server.url('/slow')).text == 'ok'
+        assert time.monotonic() - start < 0.5
+        assert server.hits('/slow') == 2
+
+        # The budget is spent, so the next slow request is not hedged
+        server.routes['/slow'] = slow_once(0.3)
+        assert transport.get(server.url('/slow')).text == 'ok'
+        assert server.hits('/slow') == 3
+        report = tracker.report()
+    assert report['hedged_requests'] == 1 and report['hedges_won'] == 1
+    # The original was cut off once the duplicate answered, so it only counts for the time it ran
+    assert report['latency_p99_ms'] < 500
+    assert report['unhedged_latency_p99_ms'] >= report['latency_p99_ms']
+    print(f"✅ Hedge answered first: p99 {report['unhedged_latency_p99_ms']} -> {report['latency_p99_ms']} ms")
+
+
+if __name__ == "__main__":
+    test_percentiles_and_timeouts()
+    test_hedge_budget()
+    test_adaptive_timeout_cuts_hangs_short()
+    test_hedged_request_wins()
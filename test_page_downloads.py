@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Test script for capped, content-type checked and head-only page downloads (runs offline against a local fixture server)
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from main import ContentScraper, CappedBody, LLMsTxtGenerator
+from async_scraper import AsyncContentScraper, AIOHTTP_AVAILABLE
+from fixture_server import FixtureServer
+
+CONFIG = {'max_content_length': 500, 'request_delay': 0, 'max_page_bytes': 64 * 1024}
+
+HUGE_PAGE = ("<html><head><title>Huge</title><meta name='description' content='A very long page'></head>"
+             "<body><h1>Huge</h1><article><p>" + "Lots of text. " * 400000 + "</p></article></body></html>")
+
+ROUTES = {
+    '/huge': {'body': HUGE_PAGE, 'headers': {'Content-Type': 'text/html; charset=utf-8'}},
+    '/report.pdf': {'body': b'%PDF-1.4 ' + b'\x00' * 100000, 'headers': {'Content-Type': 'application/pdf'}},
+    '/small': {'body': "<html><head><title>Small</title></head><body><article>Short page body.</article></body></html>",
+               'headers': {'Content-Type': 'text/html'}},
+}
+
+
+def test_capped_body():
+    """CappedBody keeps exactly max_bytes and reports the cut."""
+    body = CappedBody(10)
+    assert body.feed(b'12345')
+    assert not body.feed(b'67890abc')
+    assert body.getvalue() == b'1234567890' and body.capped
+    body = CappedBody(10)
+    assert body.feed(b'12345') and not body.capped
+    print("✅ Body capped at max_bytes")
+
+
+def test_non_html_skipped_and_huge_pages_capped():
+    """PDFs are skipped before their body is read; huge pages are cut off but still extracted."""
+    with FixtureServer(ROUTES) as server:
+        scraper = ContentScraper(CONFIG)
+        assert scraper.scrape_content(server.url('/report.pdf')) is None
+        huge = scraper.scrape_content(server.url('/huge'))
+        small = scraper.scrape_content(server.url('/small'))
+
+    assert huge['title'] == 'Huge' and huge['description'] == 'A very long page'
+    assert huge['content'].startswith('Lots of text.')
+    assert small['title'] == 'Small'
+    assert scraper.download_stats == {'skipped': 1, 'capped': 1}
+    print(f"✅ Download stats: {dict(scraper.download_stats)}")
+
+
+def test_async_backend_counts_the_same():
+    """The async backend applies the same checks and cap."""
+    if not AIOHTTP_AVAILABLE:
+        print("⚠️ aiohttp not installed, skipping")
+        return
+    with FixtureServer(ROUTES) as server:
+        scraper = AsyncContentScraper(CONFIG)
+        results = scraper.scrape_urls([{'loc': server.url(path)} for path in ROUTES])
+
+    assert sorted(url.rsplit('/', 1)[1] for url in results) == ['huge', 'small']
+    assert results[server.url('/huge')]['title'] == 'Huge'
+    assert scraper.download_stats == {'skipped': 1, 'capped': 1}
+    print("✅ Async backend skipped the PDF and capped the huge page")
+
+
+HEAD_PAGES = {
+    '/listed': {'body': "<html><head><title>Listed - Site</title><meta property='og:title' content='Listed'>"
+                        "<meta name='description' content='Listed page'></head><body><h1>Listed</h1><article>"
+                        + "Body text. " * 50000 + "</article></body></html>",
+                'headers': {'Content-Type': 'text/html'}},
+    '/no-description': {'body': "<html><head><title>Bare</title></head><body><h1>Bare</h1>"
+                                "<article>Bare page body text, long enough to be used as the page content.</article></body></html>",
+                        'headers': {'Content-Type': 'text/html'}},
+}
+
+
+def test_head_only_fetch():
+    """Listing pages are read up to </head>; pages without a description there are read in full."""
+    with FixtureServer(HEAD_PAGES) as server:
+        scraper = ContentScraper(CONFIG)
+        listed = scraper.scrape_content(server.url('/listed'), CONFIG, head_only=True)
+        bare = scraper.scrape_content(server.url('/no-description'), CONFIG, head_only=True)
+
+    assert listed['title'] == 'Listed' and listed['description'] == 'Listed page'
+    assert listed['content'] == '' and listed['fetch'] == 'head'
+    assert bare['title'] == 'Bare' and bare['content'].startswith('Bare page body') and 'fetch' not in bare
+    # The 550 KB listed page was neither read in full nor capped
+    assert scraper.download_stats == {'head_only': 1}
+
+    # A title_selector that matches inside <head> is used, as on full pages
+    with FixtureServer(HEAD_PAGES) as server:
+        titled = ContentScraper(CONFIG).scrape_content(server.url('/listed'), dict(CONFIG, title_selector='h1, title'),
+                                                       head_only=True)
+    assert titled['title'] == 'Listed - Site' and titled['fetch'] == 'head'
+    print("✅ Listing fields read from <head>, full page only when the head lacks a description")
+
+
+def test_two_tier_plan():
+    """Only the pages that make it into Detailed Content are fetched in full."""
+    urls_data = [{'loc': f'https://example.com/p{i}', 'lastmod': f'2024-01-{i + 1:02d}'} for i in range(6)]
+    generator = LLMsTxtGenerator({'max_detailed_content': 2})
+    assert generator.head_only_urls(urls_data) == {f'https://example.com/p{i}' for i in range(4)}
+    assert LLMsTxtGenerator({'max_detailed_content': 2, 'fetch_plan': 'full'}).head_only_urls(urls_data) == set()
+
+    # Fully fetched pages win ties, so head-only entries don't displace them
+    scraped = {
+        'https://example.com/a': {'title': 'A', 'description': 'a', 'content': '', 'lastmod': '2024-01-01', 'fetch': 'head'},
+        'https://example.com/b': {'title': 'B', 'description': 'b', 'content': 'Body of B', 'lastmod': '2024-01-01'},
+    }
+    detailed = LLMsTxtGenerator({'max_detailed_content': 1})._prepare_detailed_content(scraped)
+    assert 'Body of B' in detailed and 'example.com/a' not in detailed
+    # Head-only pages contribute their title and description to topics, but not the body
+    scraped['https://example.com/a']['content'] = 'Virtual fitting rooms'
+    topics = LLMsTxtGenerator({'default_topics': []})._extract_topics(scraped)
+    assert 'Virtual Fitting' not in topics
+    scraped['https://example.com/a']['fetch'] = 'full'
+    assert 'Virtual Fitting' in LLMsTxtGenerator({'default_topics': []})._extract_topics(scraped)
+    scraped['https://example.com/a'].update({'fetch': 'head', 'content': '', 'title': 'Virtual fitting rooms'})
+    assert 'Virtual Fitting' in LLMsTxtGenerator({'default_topics': []})._extract_topics(scraped)
+    print("✅ Detailed Content pages fetched in full, the rest head-only")
+
+
+def test_async_head_only():
+    """The async backend reads listing pages only up to </head> as well."""
+    if not AIOHTTP_AVAILABLE:
+        print("⚠️ aiohttp not installed, skipping")
+        return
+    with FixtureServer(HEAD_PAGES) as server:
+        scraper = AsyncContentScraper(CONFIG)
+        urls = [server.url(path) for path in HEAD_PAGES]
+        results = scraper.scrape_urls([{'loc': url} for url in urls], head_only_urls=urls)
+
+    assert results[server.url('/listed')]['fetch'] == 'head'
+    assert results[server.url('/no-description')]['content'].startswith('Bare page body')
+    assert scraper.download_stats == {'head_only': 1}
+    print("✅ Async backend fetched the listing page head-only")
+
+
+if __name__ == "__main__":
+    test_capped_body()
+    test_non_html_skipped_and_huge_pages_capped()
+    test_async_backend_counts_the_same()
+    test_head_only_fetch()
+    test_two_tier_plan()
+    test_async_head_only()
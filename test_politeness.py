@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Test script for the per-host politeness scheduler (runs offline against a local fixture server)
+"""
+
+import sys
+import os
+import time
+import threading
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from main import HostScheduler, ContentScraper, RobotsTxtChecker
+from fixture_server import FixtureServer
+
+
+def test_delay_applies_per_origin():
+    """Requests to one origin are spaced out; other origins are not held up."""
+    scheduler = HostScheduler(0.2)
+    waits = [scheduler.reserve('https://example.com/a') for _ in range(3)]
+    assert waits[0] == 0
+    assert abs(waits[1] - 0.2) < 0.02 and abs(waits[2] - 0.4) < 0.02
+    # Another host, a subdomain and another scheme are separate origins
+    assert scheduler.reserve('https://cdn.example.com/logo.png') == 0
+    assert scheduler.reserve('https://other.org/') == 0
+    assert scheduler.reserve('http://example.com/a') == 0
+    # A per-call delay overrides the default
+    assert HostScheduler(5).reserve('https://x.org/', delay=0) == 0
+    print("✅ request_delay enforced per origin")
+
+
+def test_burst_and_crawl_delay():
+    """Burst tokens go out back to back; a larger robots Crawl-delay wins."""
+    scheduler = HostScheduler(0.5, burst=3)
+    waits = [scheduler.reserve('https://example.com/') for _ in range(4)]
+    assert waits[:3] == [0, 0, 0] and waits[3] > 0.4
+
+    scheduler = HostScheduler(0.1)
+    scheduler.set_crawl_delay('https://slow.example.com', 2)
+    scheduler.reserve('https://slow.example.com/a')
+    assert scheduler.reserve('https://slow.example.com/b') > 1.9
+    scheduler.set_crawl_delay('https://slow.example.com', None)
+    assert scheduler.interval('https://slow.example.com/c') == 0.1
+    print("✅ Burst and Crawl-delay handled")
+
+
+def test_threads_share_the_budget():
+    """Concurrent threads fetching the same site still respect the spacing."""
+    scheduler = HostScheduler(0.1)
+    starts = []
+    lock = threading.Lock()
+
+    def fetch():
+        scheduler.wait('https://example.com/page')
+        with lock:
+            starts.append(time.monotonic())
+
+    threads = [threading.Thread(target=fetch) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    starts.sort()
+    gaps = [b - a for a, b in zip(starts, starts[1:])]
+    assert min(gaps) > 0.08
+    print(f"✅ 5 threads spaced out by at least {min(gaps):.2f}s")
+
+
+def test_content_scraper_uses_crawl_delay():
+    """ContentScraper waits per site, using robots.txt Crawl-delay when it is larger."""
+    page = {'body': '<html><head><title>T</title></head><body><h1>T</h1><article>Some text here.</article></body></html>',
+            'headers': {'Content-Type': 'text/html'}}
+    routes = {'/robots.txt': {'body': 'User-agent: *\nCrawl-delay: 0.3\n', 'headers': {'Content-Type': 'text/plain'}},
+              '/a': page, '/b': page, '/c': page}
+    with FixtureServer(routes) as server:
+        robots = RobotsTxtChecker(server.base_url)
+        assert robots.crawl_delay == 0.3
+
+        scraper = ContentScraper({'request_delay': 0.05, 'respect_robots_txt': True})
+        scraper.set_robots_checker(robots)
+        start = time.monotonic()
+        for path in ['/a', '/b', '/c']:
+            assert scraper.scrape_content(server.url(path))
+        elapsed = time.monotonic() - start
+
+    assert elapsed >= 0.55
+    print(f"✅ Scraped 3 pages in {elapsed:.2f}s honoring Crawl-delay")
+
+
+if __name__ == "__main__":
+    test_delay_applies_per_origin()
+    test_burst_and_crawl_delay()
+    test_threads_share_the_budget()
+    test_content_scraper_uses_crawl_delay()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Test script for the Redis distributed rate limiter (runs offline; needs Redis or fakeredis with Lua support)
+"""
+
+import sys
+import os
+import time
+import uuid
+import threading
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from rate_limiter import RedisRateLimiter
+from main import ContentScraper
+from fixture_server import FixtureServer, connect_test_redis
+
+
+def make_connection():
+    conn = connect_test_redis()
+    try:
+        conn.eval('return 1', 0)
+    except Exception:
+        print("⚠️ Redis with Lua scripting not available, skipping")
+        return None
+    return conn
+
+
+def test_ceiling_holds_across_workers():
+    """Several limiter instances (one per worker) share one per-host budget."""
+    conn = make_connection()
+    if conn is None:
+        return
+    prefix = f'test_rate_limit:{uuid.uuid4().hex}'
+    workers = [RedisRateLimiter(conn, rate=20, burst=2, prefix=prefix) for _ in range(4)]
+    starts = []
+    lock = threading.Lock()
+
+    def scrape(limiter):
+        for _ in range(5):
+            limiter.acquire('https://example.com/page')
+            with lock:
+                starts.append(time.monotonic())
+
+    threads = [threading.Thread(target=scrape, args=(limiter,)) for limiter in workers]
+    begin = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - begin
+
+    # 20 requests at 20/s with a burst of 2: at least (20 - 2) / 20 = 0.9s
+    assert len(starts) == 20
+    assert elapsed >= 0.85
+    # Another host has its own budget
+    assert workers[0].reserve('https://other.example.org/') == 0
+    print(f"✅ 20 requests from 4 workers took {elapsed:.2f}s at a 20 req/s ceiling")
+
+
+def test_max_wait_and_timeout():
+    """Slots too far out are not booked, and acquire gives up after its timeout."""
+    conn = make_connection()
+    if conn is None:
+        return
+    limiter = RedisRateLimiter(conn, rate=1, burst=1, max_wait=0.5, prefix=f'test_rate_limit:{uuid.uuid4().hex}')
+    assert limiter.reserve('https://example.com/') == 0
+    assert limiter.reserve('https://example.com/') is None
+    assert limiter.acquire('https://example.com/', timeout=0.2) is False
+    assert limiter.acquire('https://example.com/', timeout=2) is True
+
+    # Without Redis the limiter lets everything through
+    assert RedisRateLimiter(None).acquire('https://example.com/') is True
+    print("✅ max_wait and timeout respected")
+
+
+class CountingLimiter:
+    """Stands in for RedisRateLimiter and records which URLs took a token."""
+
+    def __init__(self):
+        self.tokens = []
+
+    def acquire(self, url, timeout=None):
+        self.tokens.append(url)
+        return True
+
+
+def test_every_page_request_takes_a_token():
+    """Refetches after a 304 and nested pagination pages take tokens like the first request."""
+    import tasks
+
+    answers = iter([{'status': 304}])
+
+    def about(headers):
+        return next(answers, {'body': '<title>About</title>', 'headers': {'Content-Type': 'text/html'}})
+
+    links = ''.join(f'<a href="/post/{i}">Post {i}</a>' for i in range(3))
+    routes = {
+        '/about': {'handler': about},
+        '/sitemap/category/news': {'body': f'<html><body>{links}</body></html>', 'headers': {'Content-Type': 'text/html'}},
+    }
+    for i in range(3):
+        routes[f'/post/{i}'] = {'body': f'<title>Post {i}</title><article>Post {i} body</article>',
+                                'headers': {'Content-Type': 'text/html'}}
+    limiter = CountingLimiter()
+    config = {'request_delay': 0, 'max_nested_links': 5}
+    with FixtureServer(routes) as server:
+        scraper = ContentScraper(config, rate_limiter=limiter)
+        for path in ('/about', '/sitemap/category/news'):
+            content, failure = tasks.scrape_single_url(scraper, {'loc': server.url(path)}, config)
+            assert content and failure is None, path
+        hits = sum(server.hits(path) for path in server.routes)
+
+    assert server.hits('/about') == 2
+    assert len(limiter.tokens) == hits == 6
+    assert limiter.tokens.count(server.url('/about')) == 2
+    print(f"✅ {hits} requests, {len(limiter.tokens)} rate limiter tokens")
+
+
+if __name__ == "__main__":
+    test_ceiling_holds_across_workers()
+    test_max_wait_and_timeout()
+    test_every_page_request_takes_a_token()
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Test script for the on-disk HTTP response cache (runs offline against a local fixture server)
+"""
+
+import sys
+import os
+import time
+import tempfile
+import threading
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from main import SitemapParser, ContentScraper, SitemapDetector
+from response_cache import ResponseCache
+from http_transport import HttpTransport
+from fixture_server import FixtureServer, urlset
+
+PAGE_HTML = """<html><head><title>Pricing</title>
+<meta name="description" content="Plans and prices"></head>
+<body><h1>Pricing</h1><article>Three plans for teams of every size, billed monthly or yearly.</article></body></html>"""
+
+
+def conditional(body, etag, content_type='text/html'):
+    """Route that answers 304 when the client already has the current ETag."""
+    def handler(headers):
+        if headers.get('If-None-Match') == etag:
+            return {'status': 304, 'headers': {'ETag': etag}}
+        return {'body': body, 'headers': {'ETag': etag, 'Content-Type': content_type}}
+    return {'handler': handler}
+
+
+def cache_files(directory, kind):
+    found = []
+    for root, _, files in os.walk(os.path.join(directory, kind)):
+        found.extend(os.path.join(root, name) for name in files)
+    return found
+
+
+def test_rerun_served_from_cache():
+    """A second run, even with different extraction settings, downloads nothing."""
+    routes = {
+        '/sitemap.xml': urlset(['https://example.com/pricing']),
+        '/pricing': {'body': PAGE_HTML, 'headers': {'Content-Type': 'text/html'}},
+    }
+    with tempfile.TemporaryDirectory() as tmp, FixtureServer(routes) as server:
+        config = {'max_content_length': 500, 'request_delay': 0,
+                  'response_cache': {'enabled': True, 'directory': tmp}}
+        for run, selector in enumerate(['article', 'h1']):
+            run_config = dict(config, content_selector=selector)
+            transport = HttpTransport.from_config(run_config)
+            urls_data = SitemapParser(run_config, transport=transport).parse_sitemap(server.url('/sitemap.xml'))
+            content = ContentScraper(run_config, transport=transport).scrape_content(server.url('/pricing'))
+            assert [u['loc'] for u in urls_data] == ['https://example.com/pricing'], run
+            assert content['title'] == 'Pricing', run
+
+        assert server.hits('/sitemap.xml') == 1
+        assert server.hits('/pricing') == 1
+    print("✅ Re-run with a new content_selector served sitemap and page from the cache")
+
+
+def test_stale_entries_revalidated():
+    """Past the TTL an entry is revalidated; a 304 serves the cached body and refreshes it."""
+    routes = {'/pricing': conditional(PAGE_HTML, '"v1"')}
+    with tempfile.TemporaryDirectory() as tmp, FixtureServer(routes) as server:
+        transport = HttpTransport(cache=ResponseCache(tmp, ttl=0))
+        first = transport.get(server.url('/pricing'))
+        second = transport.get(server.url('/pricing'))
+        assert first.status_code == second.status_code == 200
+        assert second.text == first.text == PAGE_HTML
+        assert second.headers['ETag'] == '"v1"'
+
+        revalidations = [h for m, p, h in server.requests if 'If-None-Match' in h]
+        assert len(revalidations) == 1 and server.hits('/pricing') == 2
+
+        # A caller's own validators are answered from the cache
+        transport.cache.ttl = 3600
+        not_modified = transport.get(server.url('/pricing'), headers={'If-None-Match': '"v1"'})
+        assert not_modified.status_code == 304
+        assert server.hits('/pricing') == 2
+    print("✅ Stale entry revalidated with a 304 and served from disk")
+
+
+def test_streamed_bodies_cached_only_when_complete():
+    """Streamed responses are stored once read to EOF, and dropped when abandoned."""
+    routes = {'/robots.txt': {'body': 'Sitemap: http://example.com/sitemap.xml\n', 'headers': {'Content-Type': 'text/plain'}},
+              '/big.xml': urlset([f'https://example.com/p{i}' for i in range(2000)])}
+    with tempfile.TemporaryDirectory() as tmp, FixtureServer(routes) as server:
+        transport = HttpTransport(cache=ResponseCache(tmp))
+        # Abandon a streamed body after the first chunk
+        response = transport.get(server.url('/big.xml'), stream=True)
+        next(response.iter_content(1024))
+        response.close()
+        assert cache_files(tmp, 'entries') == []
+        assert not [path for path in cache_files(tmp, 'objects') if '.tmp-' in path]
+
+        detector = SitemapDetector(transport=transport)
+        assert detector._check_robots_txt(server.base_url) == 'http://example.com/sitemap.xml'
+        assert detector._check_robots_txt(server.base_url) == 'http://example.com/sitemap.xml'
+        assert server.hits('/robots.txt') == 1
+    print("✅ Only fully read streamed bodies are cached")
+
+
+def test_which_page_fetches_are_cached():
+    """Pages read in full are cached; head-only and capped reads stop before EOF, so they are not."""
+    long_page = PAGE_HTML.replace('</article>', ' More about plans.' * 300 + '</article>')
+    routes = {path: {'body': body, 'headers': {'Content-Type': 'text/html'}}
+              for path, body in [('/full', PAGE_HTML), ('/head', PAGE_HTML), ('/capped', long_page)]}
+    with tempfile.TemporaryDirectory() as tmp, FixtureServer(routes) as server:
+        transport = HttpTransport(cache=ResponseCache(tmp))
+        scraper = ContentScraper({'max_content_length': 500, 'request_delay': 0, 'max_page_bytes': 1024},
+                                 transport=transport)
+        for _ in range(2):
+            assert scraper.scrape_content(server.url('/full'))['title'] == 'Pricing'
+            assert scraper.scrape_content(server.url('/head'), head_only=True)['description'] == 'Plans and prices'
+            scraper.scrape_content(server.url('/capped'))
+        assert server.hits('/full') == 1
+        assert server.hits('/head') == 2
+        assert server.hits('/capped') == 2
+        # A page already cached in full also serves head-only reads
+        assert scraper.scrape_content(server.url('/full'), head_only=True)['description'] == 'Plans and prices'
+        assert server.hits('/full') == 1
+    print("✅ Full page reads cached, head-only and capped reads fetched again")
+
+
+def test_content_addressed_lru_eviction():
+    """Identical bodies are stored once; the least recently used entries go first."""
+    body = 'x' * 4000
+    routes = {f'/p{i}': {'body': body + str(i), 'headers': {'Content-Type': 'text/plain'}} for i in range(6)}
+    routes['/mirror'] = {'body': body + '0', 'headers': {'Content-Type': 'text/plain'}}
+    with tempfile.TemporaryDirectory() as tmp, FixtureServer(routes) as server:
+        cache = ResponseCache(tmp, max_bytes=10 ** 6)
+        transport = HttpTransport(cache=cache)
+        transport.get(server.url('/p0'))
+        transport.get(server.url('/mirror'))
+        assert len(cache_files(tmp, 'entries')) == 2
+        assert len(cache_files(tmp, 'objects')) == 1
+
+        for i in range(1, 6):
+            transport.get(server.url(f'/p{i}'))
+        # Age every entry, then use /p0 and /mirror so they become the most recently used
+        past = time.time() - 100
+        for i, path in enumerate(sorted(cache_files(tmp, 'entries'))):
+            os.utime(path, (past + i, past + i))
+        transport.get(server.url('/p0'))
+        transport.get(server.url('/mirror'))
+
+        cache.evict(target=cache._scan_size() // 2)
+        transport.get(server.url('/p0'))
+        transport.get(server.url('/mirror'))
+        assert server.hits('/p0') == 1 and server.hits('/mirror') == 1
+        assert len(cache_files(tmp, 'entries')) < 7
+        assert len(cache_files(tmp, 'objects')) == len(cache_files(tmp, 'entries')) - 1
+    print("✅ Shared bodies stored once and least recently used entries evicted")
+
+
+def test_concurrent_writers():
+    """Many writers storing the same responses never leave partial files behind."""
+    routes = {f'/p{i}': {'body': f'page {i} ' * 500, 'headers': {'Content-Type': 'text/plain'}} for i in range(5)}
+    with tempfile.TemporaryDirectory() as tmp, FixtureServer(routes) as server:
+        errors = []
+
+        def worker():
+            # A separate cache instance per thread, as with separate worker processes
+            transport = HttpTransport(cache=ResponseCache(tmp))
+            try:
+                for i in range(5):
+                    assert transport.get(server.url(f'/p{i}')).text == f'page {i} ' * 500
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert not errors
+        assert len(cache_files(tmp, 'entries')) == 5
+        assert not [path for path in cache_files(tmp, 'objects') if '.tmp-' in path]
+        transport = HttpTransport(cache=ResponseCache(tmp))
+        assert all(transport.get(server.url(f'/p{i}')).from_cache for i in range(5))
+    print("✅ Concurrent writers left 5 complete entries")
+
+
+if __name__ == "__main__":
+    test_rerun_served_from_cache()
+    test_stale_entries_revalidated()
+    test_streamed_bodies_cached_only_when_complete()
+    test_which_page_fetches_are_cached()
+    test_content_addressed_lru_eviction()
+    test_concurrent_writers()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Test script for failure classification and the deferred retry queue (runs offline against a local fixture server)
+"""
+
+import sys
+import os
+import time
+import uuid
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import requests
+
+from main import ContentScraper
+from async_scraper import AsyncContentScraper, AIOHTTP_AVAILABLE
+from http_transport import HttpTransport, classify_failure
+from retry_queue import RetryQueue
+from fixture_server import FixtureServer, connect_test_redis
+
+CONFIG = {'max_content_length': 500, 'request_delay': 0}
+
+ROUTES = {
+    '/ok': {'body': "<html><head><title>Ok</title></head><body><article>A page that works fine.</article></body></html>",
+            'headers': {'Content-Type': 'text/html'}},
+    '/busy': {'status': 503},
+    '/gone': {'status': 404},
+}
+
+
+def http_error(status):
+    response = requests.Response()
+    response.status_code = status
+    return requests.HTTPError(response=response)
+
+
+def test_classify_failure():
+    """Timeouts, resets, 429 and 5xx are retryable; 4xx and other errors are permanent."""
+    assert classify_failure(requests.Timeout()) == ('timeout', True)
+    assert classify_failure(requests.ConnectionError()) == ('connection', True)
+    assert classify_failure(ConnectionResetError()) == ('connection', True)
+    assert classify_failure(http_error(503)) == ('http_503', True)
+    assert classify_failure(http_error(429)) == ('http_429', True)
+    assert classify_failure(http_error(404)) == ('http_404', False)
+    assert classify_failure(ValueError('bad markup')) == ('error', False)
+    print("✅ Failures classified as retryable or permanent")
+
+
+def test_scrapers_record_failures():
+    """Both scraper backends remember why a page failed instead of just returning None."""
+    with FixtureServer(ROUTES) as server:
+        scraper = ContentScraper(CONFIG, transport=HttpTransport(max_retries=0))
+        for path in ROUTES:
+            scraper.scrape_content(server.url(path))
+        assert scraper.failures == {server.url('/busy'): ('http_503', True), server.url('/gone'): ('http_404', False)}
+
+        if not AIOHTTP_AVAILABLE:
+            print("⚠️ aiohttp not installed, skipping the async backend")
+            return
+        async_scraper = AsyncContentScraper(CONFIG)
+        results = async_scraper.scrape_urls([{'loc': server.url(path)} for path in ROUTES])
+        assert list(results) == [server.url('/ok')]
+        assert async_scraper.failures == scraper.failures
+    print("✅ Failure reasons recorded per URL")
+
+
+class FakeFirecrawlApp:
+    """Stands in for FirecrawlApp: every URL fails in its own way."""
+
+    def scrape_url(self, url, **kwargs):
+        if url.endswith('/busy'):
+            raise http_error(503)
+        if url.endswith('/broken'):
+            raise ValueError('bad markup')
+        return type('Result', (), {'success': False})()
+
+
+class SilentScraper:
+    """A scraper with no ``failures`` record, returning None for everything."""
+
+    def scrape_content(self, url, config=None):
+        return None
+
+
+def test_firecrawl_failures_classified():
+    """Pages the Firecrawl backend (or any scraper that doesn't say why) fails on are queued for retry."""
+    try:
+        import tasks
+        from firecrawl_working import WorkingFirecrawlScraper
+    except ImportError as e:
+        print(f"⚠️ Worker dependencies not installed ({e}), skipping")
+        return
+    # No API key or firecrawl package needed: the scraper is built around a fake app
+    scraper = WorkingFirecrawlScraper.__new__(WorkingFirecrawlScraper)
+    scraper.config, scraper.app, scraper.failures = CONFIG, FakeFirecrawlApp(), {}
+    outcomes = {path: tasks.scrape_single_url(scraper, {'loc': f'https://example.com{path}'}, CONFIG)
+                for path in ('/busy', '/broken', '/empty')}
+    assert outcomes == {'/busy': (None, ('http_503', True)), '/broken': (None, ('error', False)),
+                        '/empty': (None, ('unknown', True))}
+    assert scraper.failures == {}
+    assert tasks.scrape_single_url(SilentScraper(), {'loc': 'https://example.com/x'}, CONFIG) == (None, ('unknown', True))
+    print("✅ Firecrawl failures classified, unexplained ones retryable")
+
+
+def test_retry_queue_backoff_and_attempts():
+    """Entries come due after their backoff, each is handed out once, and attempts are capped."""
+    conn = connect_test_redis()
+    if conn is None:
+        print("⚠️ No Redis or fakeredis available, skipping")
+        return
+    queue = RetryQueue(conn, max_attempts=2, base_delay=0.2, prefix=f'retry-test-{uuid.uuid4().hex}')
+    task_id = 'job'
+    assert 0.1 <= queue.backoff(1) <= 0.2 and 0.2 <= queue.backoff(2) <= 0.4
+
+    assert queue.push(task_id, {'loc': 'https://example.com/a', 'lastmod': '2024-01-01'}, 'timeout', 1)
+    assert queue.push(task_id, {'loc': 'https://example.com/b'}, 'http_503', 2, head_only=True)
+    assert not queue.push(task_id, {'loc': 'https://example.com/c'}, 'timeout', 3)
+    assert queue.size(task_id) == 2
+
+    # Nothing is due before its backoff
+    assert queue.pop_due(task_id, 10) == []
+    assert 0 < queue.next_due_in(task_id) <= 0.2
+
+    time.sleep(0.45)
+    entries = queue.pop_due(task_id, 10)
+    assert [entry['url_data']['loc'] for entry in entries] == ['https://example.com/a', 'https://example.com/b']
+    assert entries[0]['url_data']['lastmod'] == '2024-01-01' and entries[1]['head_only']
+    assert entries[1]['attempt'] == 2 and entries[1]['reason'] == 'http_503'
+    assert queue.pop_due(task_id, 10) == [] and queue.next_due_in(task_id) is None
+    print("✅ Retries come due after their backoff, at most max_attempts times")
+
+
+if __name__ == "__main__":
+    test_classify_failure()
+    test_scrapers_record_failures()
+    test_firecrawl_failures_classified()
+    test_retry_queue_backoff_and_attempts()
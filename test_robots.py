@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Test script for the robots.txt rules engine and its Redis cache (runs offline against a local fixture server)
+"""
+
+import sys
+import os
+import uuid
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from main import RobotsTxtChecker, ContentScraper
+from robots import RobotsRules, RobotsCache, url_path
+from http_transport import HttpTransport
+from fixture_server import FixtureServer, connect_test_redis
+
+ROBOTS_TXT = """# Example robots.txt
+User-agent: *
+Disallow: /wp-admin/
+Allow: /wp-admin/admin-ajax.php
+Disallow: /*?replytocom=
+Disallow: /*.pdf$
+Disallow: /search
+Disallow: /tag/*/feed/
+Allow: /tag/*/feed/public
+Crawl-delay: 0.5
+
+User-agent: GPTBot
+User-agent: LLMsTxtBot
+Disallow: /
+Allow: /blog/
+
+Sitemap: https://example.com/sitemap.xml
+"""
+
+
+def test_wildcards_and_longest_match():
+    """``*`` and ``$`` follow RFC 9309 and the most specific rule wins, Allow on ties."""
+    rules = RobotsRules.parse(ROBOTS_TXT)
+    assert not rules.is_allowed('/wp-admin/options.php')
+    assert rules.is_allowed('/wp-admin/admin-ajax.php?action=x')
+    assert not rules.is_allowed('/2024/post/?replytocom=12')
+    assert not rules.is_allowed('/files/report.pdf')
+    assert rules.is_allowed('/files/report.pdf?download=1')
+    assert not rules.is_allowed('/search-results')
+    assert not rules.is_allowed('/tag/python/feed/') and rules.is_allowed('/tag/python/feed/public')
+    assert rules.is_allowed('/blog/post/') and rules.is_allowed('/')
+
+    # Full URLs are reduced to path and query; fragments are ignored
+    assert not rules.is_allowed('https://example.com/search?q=robots#top')
+    assert rules.is_allowed('https://example.com?search')
+    assert url_path('https://example.com') == '/' and url_path('https://example.com/a?b#c') == '/a?b'
+
+    tie = RobotsRules([(False, '/page'), (True, '/page')])
+    assert tie.is_allowed('/page/1')
+    assert RobotsRules([(False, '')]).is_allowed('/anything')
+    # Non-ASCII rules match percent-encoded URLs
+    assert not RobotsRules([(False, '/café/')]).is_allowed('/caf%C3%A9/menu')
+    print("✅ Wildcards, $ anchors and longest-match precedence")
+
+
+def test_user_agent_groups():
+    """Our own group applies when named, the * group otherwise; Crawl-delay and Sitemaps are kept."""
+    default = RobotsRules.parse(ROBOTS_TXT)
+    assert default.crawl_delay == 0.5
+    assert default.sitemaps == ['https://example.com/sitemap.xml']
+
+    named = RobotsRules.parse(ROBOTS_TXT, user_agent='LLMsTxtBot')
+    assert not named.is_allowed('/pricing') and named.is_allowed('/blog/hello')
+    assert named.crawl_delay is None
+
+    assert RobotsRules.from_dict(named.to_dict()).is_allowed('/blog/hello')
+
+    # Groups are matched on the product token, case-insensitively; no substring matches
+    full_agent = RobotsRules.parse(ROBOTS_TXT, user_agent='llmstxtbot/2.1 (+https://example.com/bot)')
+    assert not full_agent.is_allowed('/pricing') and full_agent.is_allowed('/blog/hello')
+    for other in ('LLMsTxtBot-News', 'TxtBot', 'GPTBotX/1.0'):
+        assert RobotsRules.parse(ROBOTS_TXT, user_agent=other).crawl_delay == 0.5, other
+    versioned = RobotsRules.parse("User-agent: *\nDisallow: /\n\nUser-agent: LLMsTxtBot/1.0\nAllow: /\n", 'LLMsTxtBot')
+    assert versioned.is_allowed('/pricing')
+    print("✅ User-agent groups, Crawl-delay and Sitemap lines parsed")
+
+
+def test_checker_cached_per_origin():
+    """Parsed rules are shared through Redis, so a second checker doesn't fetch robots.txt."""
+    conn = connect_test_redis()
+    if conn is None:
+        print("⚠️ No Redis or fakeredis available, skipping")
+        return
+    routes = {'/robots.txt': {'body': ROBOTS_TXT, 'headers': {'Content-Type': 'text/plain'}}}
+    with FixtureServer(routes) as server:
+        cache = RobotsCache(conn, ttl=60, prefix=f'robots-test-{uuid.uuid4().hex}')
+        first = RobotsTxtChecker(server.base_url, cache=cache)
+        second = RobotsTxtChecker(server.base_url + '/some/page', cache=cache)
+        assert server.hits('/robots.txt') == 1
+
+        for checker in (first, second):
+            assert not checker.is_allowed(server.url('/wp-admin/'))
+            assert checker.is_allowed(server.url('/wp-admin/admin-ajax.php'))
+            assert checker.crawl_delay == 0.5
+
+        # Crawl-delay from the cached rules still reaches the scheduler
+        scraper = ContentScraper({'request_delay': 0})
+        scraper.set_robots_checker(second)
+        assert scraper.scheduler.interval(server.url('/a')) == 0.5
+    print("✅ Rules cached per origin and Crawl-delay handed to the scheduler")
+
+
+def test_missing_robots_allows_everything():
+    """A 404 robots.txt allows everything and is cached; an unreachable host is not cached."""
+    conn = connect_test_redis()
+    if conn is None:
+        print("⚠️ No Redis or fakeredis available, skipping")
+        return
+    cache = RobotsCache(conn, ttl=60, prefix=f'robots-test-{uuid.uuid4().hex}')
+    with FixtureServer({}) as server:
+        checker = RobotsTxtChecker(server.base_url, cache=cache)
+        assert checker.is_allowed(server.url('/anything')) and checker.crawl_delay is None
+        assert cache.get(checker.origin) is not None
+
+    unreachable = RobotsTxtChecker('http://127.0.0.1:9', transport=HttpTransport(max_retries=0), cache=cache)
+    assert unreachable.is_allowed('http://127.0.0.1:9/page')
+    assert cache.get(unreachable.origin) is None
+    print("✅ Missing robots.txt allows all URLs")
+
+
+if __name__ == "__main__":
+    test_wildcards_and_longest_match()
+    test_user_agent_groups()
+    test_checker_cached_per_origin()
+    test_missing_robots_allows_everything()
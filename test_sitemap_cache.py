@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Test script for the shared Redis sitemap cache (runs offline against a local fixture server)
+"""
+
+import sys
+import os
+import uuid
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from main import SitemapParser, SitemapDetector, SitemapQuota
+from sitemap_cache import SitemapCache
+from fixture_server import FixtureServer, urlset, sitemapindex, connect_test_redis
+
+
+def make_cache(**kwargs):
+    conn = connect_test_redis()
+    if conn is None:
+        print("⚠️ Redis not available, skipping")
+        return None
+    return SitemapCache(conn, prefix=f'test_sitemap_cache:{uuid.uuid4().hex}', **kwargs)
+
+
+def test_analyze_then_generate_fetches_once():
+    """A full parse followed by a quota-limited parse only downloads each sitemap once."""
+    cache = make_cache()
+    if cache is None:
+        return
+    routes = {
+        '/post-sitemap.xml': urlset([f'https://example.com/blog/{i}' for i in range(20)]),
+        '/page-sitemap.xml': urlset(['https://example.com/about']),
+    }
+    with FixtureServer(routes) as server:
+        routes['/sitemap_index.xml'] = sitemapindex([server.url('/post-sitemap.xml'), server.url('/page-sitemap.xml')])
+        config = {'max_sitemaps_to_process': 5, 'sitemap_host_delay': 0}
+
+        # /api/analyze-site
+        analyzed = SitemapParser(config, cache=cache).parse_sitemap(server.url('/sitemap_index.xml'))
+        # generate_llms_background
+        quota = SitemapQuota({'blog': 3, 'page': 1, 'product': 0})
+        generated = list(SitemapParser(config, cache=cache).iter_sitemap(server.url('/sitemap_index.xml'), quota=quota))
+
+        for path in routes:
+            assert server.hits(path) == 1, path
+
+    assert len(analyzed) == 21
+    assert [u['loc'] for u in generated] == ['https://example.com/blog/0', 'https://example.com/blog/1',
+                                             'https://example.com/blog/2', 'https://example.com/about']
+    assert generated[0]['source_type'] == 'blog'
+    print("✅ Sitemap fetched once across analyze and generate")
+
+
+def test_unchanged_etag_reuses_document():
+    """After the freshness pointer expires, an unchanged ETag skips re-parsing."""
+    cache = make_cache()
+    if cache is None:
+        return
+    routes = {'/sitemap.xml': {'body': urlset(['https://example.com/a']), 'headers': {'ETag': '"v1"'}}}
+    with FixtureServer(routes) as server:
+        sitemap_url = server.url('/sitemap.xml')
+        first = SitemapParser({}, cache=cache).parse_sitemap(sitemap_url)
+
+        # Expire the pointer and change the body while keeping the same ETag
+        cache.redis.delete(*cache.redis.keys(f'{cache.prefix}:validator:*'))
+        routes['/sitemap.xml'] = {'body': urlset(['https://example.com/changed']), 'headers': {'ETag': '"v1"'}}
+        second = SitemapParser({}, cache=cache).parse_sitemap(sitemap_url)
+
+        assert server.hits('/sitemap.xml') == 2
+
+    assert [u['loc'] for u in first] == [u['loc'] for u in second] == ['https://example.com/a']
+    print("✅ Unchanged sitemap reused from its validator")
+
+
+def test_documents_cached_compressed_and_capped():
+    """Sitemaps are cached as their compressed body; ones over sitemap_cache_max_kb aren't cached."""
+    cache = make_cache()
+    if cache is None:
+        return
+    locs = [f'https://example.com/page-{i}' for i in range(2000)]
+    routes = {'/small.xml': urlset(locs[:10]), '/large.xml': urlset(locs)}
+    with FixtureServer(routes) as server:
+        config = {'sitemap_cache_max_kb': 4}
+        for _ in range(2):
+            small = SitemapParser(config, cache=cache).parse_sitemap(server.url('/small.xml'))
+            large = SitemapParser(config, cache=cache).parse_sitemap(server.url('/large.xml'))
+        assert server.hits('/small.xml') == 1 and server.hits('/large.xml') == 2
+
+    assert [u['loc'] for u in small] == locs[:10] and [u['loc'] for u in large] == locs
+    document = cache.get_document(server.url('/small.xml'))
+    assert document[:2] == b'\x1f\x8b' and len(document) < len(urlset(locs[:10]))
+    assert cache.get_document(server.url('/large.xml')) is None
+    print("✅ Sitemaps cached as compressed bodies, large ones skipped")
+
+
+def test_detection_is_cached():
+    """Sitemap detection results are reused instead of re-probing candidates."""
+    cache = make_cache()
+    if cache is None:
+        return
+    with FixtureServer({'/sitemap_index.xml': sitemapindex([])}) as server:
+        first = SitemapDetector(cache=cache).detect_sitemap_url(server.base_url)
+        probes = len(server.requests)
+        second = SitemapDetector(cache=cache).detect_sitemap_url(server.base_url + '/')
+
+        assert len(server.requests) == probes
+
+    assert first == second == server.url('/sitemap_index.xml')
+    print("✅ Sitemap detection cached")
+
+
+if __name__ == "__main__":
+    test_analyze_then_generate_fetches_once()
+    test_unchanged_etag_reuses_document()
+    test_documents_cached_compressed_and_capped()
+    test_detection_is_cached()
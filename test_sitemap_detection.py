@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Test script for sitemap auto-detection (runs offline against a local fixture server)
+"""
+
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from main import SitemapDetector
+from fixture_server import FixtureServer, sitemapindex
+
+
+def slow(status, delay, body=b''):
+    """Route handler that answers after a delay."""
+    def handler(headers):
+        time.sleep(delay)
+        return {'status': status, 'body': body}
+    return {'handler': handler}
+
+
+def test_preference_order_is_kept():
+    """A preferred candidate wins over faster, less preferred ones."""
+    routes = {
+        '/sitemap.xml': slow(200, 0.3, sitemapindex([])),
+        '/wp-sitemap.xml': sitemapindex([]),
+        '/robots.txt': {'body': 'Sitemap: https://example.com/from-robots.xml', 'headers': {'Content-Type': 'text/plain'}},
+    }
+    with FixtureServer(routes) as server:
+        detected = SitemapDetector().detect_sitemap_url(server.base_url)
+
+    assert detected == server.url('/sitemap.xml')
+    print(f"✅ Preferred candidate detected: {detected}")
+
+
+def test_probes_run_concurrently():
+    """Slow failing candidates are probed in parallel rather than one after another."""
+    routes = {f'/{path}': slow(404, 0.5) for path in [
+        'sitemap.xml', 'sitemap_index.xml', 'sitemap/sitemap.xml', 'sitemap/sitemap_index.xml',
+        'sitemaps/sitemap.xml', 'sitemaps/sitemap_index.xml', 'wp-sitemap.xml', 'sitemap1.xml',
+    ]}
+    routes['/robots.txt'] = {'body': 'User-agent: *\nSitemap: https://example.com/robots-sitemap.xml',
+                             'headers': {'Content-Type': 'text/plain'}}
+    with FixtureServer(routes) as server:
+        start = time.time()
+        detected = SitemapDetector().detect_sitemap_url(server.base_url)
+        elapsed = time.time() - start
+
+    assert detected == 'https://example.com/robots-sitemap.xml'
+    assert elapsed < 2.0, elapsed
+    print(f"✅ Detected via robots.txt in {elapsed:.2f}s with 8 slow candidates")
+
+
+if __name__ == "__main__":
+    test_preference_order_is_kept()
+    test_probes_run_concurrently()
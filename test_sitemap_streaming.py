@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Test script for streaming sitemap parsing (runs offline against a local fixture server)
+"""
+
+import sys
+import os
+import types
+import gzip
+import time
+import tracemalloc
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from main import SitemapParser, SitemapQuota, UrlRecord
+from fixture_server import FixtureServer, urlset, sitemapindex
+
+
+def test_streaming_regular_sitemap():
+    """iter_sitemap yields records lazily from a plain urlset."""
+    locs = [f"https://example.com/page-{i}" for i in range(5000)]
+    with FixtureServer({'/sitemap.xml': urlset(locs)}) as server:
+        parser = SitemapParser({'max_sitemaps_to_process': 5})
+        stream = parser.iter_sitemap(server.url('/sitemap.xml'))
+        assert isinstance(stream, types.GeneratorType)
+
+        first = next(stream)
+        assert first['loc'] == locs[0]
+        rest = [record['loc'] for record in stream]
+
+    assert [first['loc']] + rest == locs
+    print(f"✅ Streamed {len(locs)} URLs from a regular sitemap")
+
+
+def test_streaming_sitemap_index():
+    """Sitemap indexes are followed and children get their source_type."""
+    routes = {
+        '/post-sitemap.xml': urlset(['https://example.com/blog/a', 'https://example.com/blog/b']),
+        '/page-sitemap.xml': urlset(['https://example.com/about']),
+    }
+    with FixtureServer(routes) as server:
+        routes['/sitemap_index.xml'] = sitemapindex([server.url('/post-sitemap.xml'), server.url('/page-sitemap.xml')])
+        parser = SitemapParser({'max_sitemaps_to_process': 5})
+        urls_data = parser.parse_sitemap(server.url('/sitemap_index.xml'))
+
+        # The index itself is only downloaded once
+        assert server.hits('/sitemap_index.xml') == 1
+
+    assert [u['loc'] for u in urls_data] == [
+        'https://example.com/blog/a', 'https://example.com/blog/b', 'https://example.com/about'
+    ]
+    assert [u['source_type'] for u in urls_data] == ['blog', 'blog', 'page']
+    print(f"✅ Streamed {len(urls_data)} URLs from a sitemap index")
+
+
+def test_concurrent_index_order_and_cycles():
+    """Children are fetched concurrently, yielded in index order, and cycles terminate."""
+    routes = {}
+    with FixtureServer(routes) as server:
+        routes['/sitemap_index.xml'] = sitemapindex([server.url('/nested_index.xml'), server.url('/c.xml')])
+        # The nested index points back at the root index and at itself
+        routes['/nested_index.xml'] = sitemapindex([
+            server.url('/a.xml'), server.url('/b.xml'),
+            server.url('/sitemap_index.xml'), server.url('/nested_index.xml'),
+        ])
+        routes['/a.xml'] = urlset(['https://example.com/a'])
+        routes['/b.xml'] = urlset(['https://example.com/b'])
+        routes['/c.xml'] = urlset(['https://example.com/c'])
+
+        parser = SitemapParser({'max_sitemaps_to_process': 10, 'sitemap_fetch_workers': 4, 'sitemap_host_delay': 0})
+        urls_data = parser.parse_sitemap(server.url('/sitemap_index.xml'))
+
+        assert server.hits('/sitemap_index.xml') == 1
+        assert server.hits('/nested_index.xml') == 1
+
+    assert [u['loc'] for u in urls_data] == ['https://example.com/a', 'https://example.com/b', 'https://example.com/c']
+    print("✅ Nested sitemap index processed in deterministic order without revisiting sitemaps")
+
+
+def test_prefetched_children_are_not_parsed_ahead():
+    """Children fetched ahead are kept as raw bytes, so memory doesn't grow with the worker count."""
+    routes = {f'/s{i}.xml': urlset([f'https://example.com/s{i}/page-{n}' for n in range(20000)]) for i in range(4)}
+    with FixtureServer(routes) as server:
+        routes['/sitemap_index.xml'] = sitemapindex([server.url(f'/s{i}.xml') for i in range(4)])
+        parser = SitemapParser({'max_sitemaps_to_process': 10, 'sitemap_fetch_workers': 4, 'sitemap_host_delay': 0})
+        tracemalloc.start()
+        try:
+            count = 0
+            for _ in parser.iter_sitemap(server.url('/sitemap_index.xml')):
+                count += 1
+                if count % 5000 == 0:
+                    # Give the prefetches time to finish while the first child is still being read
+                    time.sleep(0.05)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    assert count == 80000
+    # Parsing the prefetched children into records up front took about 14 MB here
+    assert peak < 8 * 1024 * 1024, peak
+    print(f"✅ Streamed {count} URLs from 4 children with a peak of {peak / 1e6:.1f} MB")
+
+
+def test_max_sitemaps_limit():
+    """max_sitemaps_to_process caps the number of child sitemaps collected."""
+    routes = {f'/s{i}.xml': urlset([f'https://example.com/{i}']) for i in range(6)}
+    with FixtureServer(routes) as server:
+        routes['/sitemap_index.xml'] = sitemapindex([server.url(f'/s{i}.xml') for i in range(6)])
+        parser = SitemapParser({'max_sitemaps_to_process': 3, 'sitemap_host_delay': 0})
+        urls_data = parser.parse_sitemap(server.url('/sitemap_index.xml'))
+
+    assert [u['loc'] for u in urls_data] == ['https://example.com/0', 'https://example.com/1', 'https://example.com/2']
+    print("✅ max_sitemaps_to_process respected")
+
+
+def test_gzipped_child_sitemaps():
+    """sitemap.xml.gz children are decompressed on the fly."""
+    locs = [f"https://example.com/post-{i}" for i in range(1000)]
+    routes = {
+        '/post-sitemap.xml.gz': {
+            'body': gzip.compress(urlset(locs).encode('utf-8')),
+            'headers': {'Content-Type': 'application/x-gzip'},
+        },
+        # Gzipped file that is additionally served with a gzip transfer encoding
+        '/page-sitemap.xml.gz': {
+            'body': gzip.compress(gzip.compress(urlset(['https://example.com/about']).encode('utf-8'))),
+            'headers': {'Content-Type': 'application/x-gzip', 'Content-Encoding': 'gzip'},
+        },
+    }
+    with FixtureServer(routes) as server:
+        routes['/sitemap_index.xml.gz'] = {
+            'body': gzip.compress(sitemapindex([server.url('/post-sitemap.xml.gz'), server.url('/page-sitemap.xml.gz')]).encode('utf-8')),
+        }
+        parser = SitemapParser({'max_sitemaps_to_process': 5, 'sitemap_host_delay': 0})
+        urls_data = parser.parse_sitemap(server.url('/sitemap_index.xml.gz'))
+        index = parser.sitemap_index_parser.parse_sitemap_index(server.url('/sitemap_index.xml.gz'))
+
+    assert [u['loc'] for u in urls_data] == locs + ['https://example.com/about']
+    assert len(index) == 2
+    print(f"✅ Parsed {len(urls_data)} URLs from gzipped sitemaps")
+
+
+def test_quota_stops_ingestion_early():
+    """Child sitemaps are not fetched once their quota (or every quota) is full."""
+    routes = {
+        '/post-sitemap.xml': urlset([f'https://example.com/blog/{i}' for i in range(50)]),
+        '/post-sitemap2.xml': urlset(['https://example.com/blog/more']),
+        '/product-sitemap.xml': urlset(['https://example.com/product/x']),
+        '/page-sitemap.xml': urlset(['https://example.com/about', 'https://example.com/team']),
+        '/misc-sitemap.xml': urlset(['https://example.com/misc']),
+    }
+    with FixtureServer(routes) as server:
+        routes['/sitemap_index.xml'] = sitemapindex([
+            server.url(path) for path in
+            ['/post-sitemap.xml', '/post-sitemap2.xml', '/product-sitemap.xml', '/page-sitemap.xml', '/misc-sitemap.xml']
+        ])
+        parser = SitemapParser({'max_sitemaps_to_process': 10, 'sitemap_fetch_workers': 1, 'sitemap_host_delay': 0})
+        quota = SitemapQuota({'blog': 5, 'page': 1, 'product': 0}, share={'uncategorized': 'page'})
+        urls_data = list(parser.iter_sitemap(server.url('/sitemap_index.xml'), quota=quota))
+
+        assert server.hits('/post-sitemap2.xml') == 0
+        assert server.hits('/product-sitemap.xml') == 0
+        assert server.hits('/misc-sitemap.xml') == 0
+
+    assert [u['loc'] for u in urls_data] == [f'https://example.com/blog/{i}' for i in range(5)] + ['https://example.com/about']
+    assert quota.all_full()
+    print(f"✅ Quota-limited ingestion stopped after {len(urls_data)} URLs")
+
+
+def test_quota_on_flat_sitemap():
+    """A flat sitemap stops streaming as soon as the shared page quota is full."""
+    locs = [f"https://example.com/p{i}" for i in range(1000)]
+    with FixtureServer({'/sitemap.xml': urlset(locs)}) as server:
+        parser = SitemapParser({})
+        quota = SitemapQuota({'blog': 0, 'page': 5, 'product': 0}, share={'uncategorized': 'page'})
+        urls_data = list(parser.iter_sitemap(server.url('/sitemap.xml'), quota=quota))
+
+    assert [u['loc'] for u in urls_data] == locs[:5]
+    print("✅ Flat sitemap respected the page quota")
+
+
+def test_compact_url_records():
+    """URL entries are slotted records that still read like the old dicts."""
+    document = ('<?xml version="1.0" encoding="UTF-8"?>'
+                '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+                '<url><loc>https://example.com/a</loc><lastmod>2024-03-01</lastmod>'
+                '<changefreq>Weekly</changefreq><priority>0.8</priority></url>'
+                '<url><loc>https://example.com/b</loc><lastmod>2024-03-01T12:30:00+02:00</lastmod></url>'
+                '<url><loc>https://example.com/c</loc><lastmod>last tuesday</lastmod></url>'
+                '</urlset>')
+    with FixtureServer({'/page-sitemap.xml': document}) as server:
+        server.routes['/sitemap.xml'] = sitemapindex([server.url('/page-sitemap.xml')])
+        a, b, c = SitemapParser({}).parse_sitemap(server.url('/sitemap.xml'))
+
+    assert isinstance(a, UrlRecord) and not hasattr(a, '__dict__')
+    assert dict(a) == {'loc': 'https://example.com/a', 'lastmod': '2024-03-01',
+                       'changefreq': 'Weekly', 'priority': 0.8, 'source_type': 'page'}
+    assert a.lastmod_ts == 1709251200
+    # Other timezones are kept as written, while lastmod_ts still compares across them
+    assert b['lastmod'] == '2024-03-01T12:30:00+02:00' and b.get('priority') is None
+    assert b.lastmod_ts == 1709289000
+    assert a._lastmod == 1709251200
+    assert c['lastmod'] == 'last tuesday' and c.lastmod_ts is None
+    # changefreq/source_type strings are shared between records
+    assert a['source_type'] is b['source_type']
+
+    record = UrlRecord('https://example.com/d')
+    assert 'source_type' not in record and record.get('source_type') is None
+    record['source_type'] = 'blog'
+    assert record == {'loc': 'https://example.com/d', 'lastmod': None, 'changefreq': None,
+                      'priority': None, 'source_type': 'blog'}
+    assert UrlRecord.from_dict(record.to_dict()) == record
+    print("✅ Sitemap URLs are compact records with a dict-compatible view")
+
+
+if __name__ == "__main__":
+    test_streaming_regular_sitemap()
+    test_streaming_sitemap_index()
+    test_concurrent_index_order_and_cycles()
+    test_prefetched_children_are_not_parsed_ahead()
+    test_max_sitemaps_limit()
+    test_gzipped_child_sitemaps()
+    test_quota_stops_ingestion_early()
+    test_quota_on_flat_sitemap()
+    test_compact_url_records()
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Test script for the URL pipeline stages (runs offline against a local fixture server)
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from main import SitemapParser, SitemapQuota, UrlRecord, select_sitemap_urls
+from url_pipeline import (UrlCanonicalizer, UrlDeduplicator, SeenSet, TopKSelector, UrlRuleMatcher,
+                          HreflangCollapser, chain_filters)
+from utils import load_job_settings
+from fixture_server import FixtureServer, urlset, sitemapindex
+
+
+def test_canonicalization_rules():
+    """Tracking params, fragments and cosmetic variants collapse to one key."""
+    canonicalizer = UrlCanonicalizer()
+    assert canonicalizer.canonicalize('HTTPS://Example.COM:443/About?utm_source=x&b=2&a=1#team') == 'https://example.com/About?a=1&b=2'
+    assert canonicalizer.canonicalize('https://example.com/search?q=a+b%20c&page') == 'https://example.com/search?page&q=a+b%20c'
+
+    variants = [
+        'https://example.com/about/',
+        'http://www.example.com/about',
+        'https://example.com/about?fbclid=123',
+        'https://EXAMPLE.com/about#contact',
+    ]
+    assert len({canonicalizer.key(url) for url in variants}) == 1
+
+    strict = UrlCanonicalizer({'ignore_scheme': False, 'ignore_trailing_slash': False, 'strip_query_params': []})
+    assert strict.key('http://example.com/a') != strict.key('https://example.com/a')
+    assert strict.key('https://example.com/a/') != strict.key('https://example.com/a')
+    assert strict.canonicalize('https://example.com/a?utm_source=x') == 'https://example.com/a?utm_source=x'
+    print("✅ Canonicalization rules applied")
+
+
+def test_seen_set():
+    """The seen-set stores digests, not strings."""
+    seen = SeenSet()
+    assert seen.add('https://example.com/a')
+    assert not seen.add('https://example.com/a')
+    assert 'https://example.com/a' in seen and 'https://example.com/b' not in seen
+    for i in range(10000):
+        assert seen.add(f'https://example.com/page-{i}')
+    # The table grew past its initial size and kept every entry
+    assert len(seen._slots) > SeenSet.MIN_SLOTS and len(seen) == 10001
+    assert len(seen._slots) * 2 > len(seen) * 3
+    assert all(not seen.add(f'https://example.com/page-{i}') for i in range(0, 10000, 7))
+    assert 'https://example.com/a' in seen and 'https://example.com/page-10000' not in seen
+    print("✅ Seen-set tracks URLs by digest")
+
+
+def test_duplicates_do_not_consume_quota():
+    """Duplicates across child sitemaps are dropped before the quota is applied."""
+    routes = {
+        '/page-sitemap.xml': urlset([
+            'https://example.com/a', 'https://example.com/b/', 'https://example.com/a?utm_campaign=x'
+        ]),
+        '/page-sitemap2.xml': urlset([
+            'http://www.example.com/b', 'https://example.com/a/', 'https://example.com/c', 'https://example.com/d'
+        ]),
+    }
+    with FixtureServer(routes) as server:
+        routes['/sitemap_index.xml'] = sitemapindex([server.url('/page-sitemap.xml'), server.url('/page-sitemap2.xml')])
+        deduplicator = UrlDeduplicator.from_config({})
+        quota = SitemapQuota({'page': 3})
+        urls_data = list(SitemapParser({}).iter_sitemap(
+            server.url('/sitemap_index.xml'), quota=quota, url_filter=deduplicator.accept))
+
+    assert [u['loc'] for u in urls_data] == ['https://example.com/a', 'https://example.com/b/', 'https://example.com/c']
+    assert deduplicator.duplicates == 3
+    assert UrlDeduplicator.from_config({'url_canonicalization': {'enabled': False}}) is None
+    print(f"✅ Dropped {deduplicator.duplicates} duplicate URLs before applying the quota")
+
+
+def test_top_k_selection():
+    """The most valuable URLs per category win, whatever their sitemap position."""
+    now = 1_700_000_000
+    records = [UrlRecord(f'https://example.com/filler-{i}', source_type='page') for i in range(1000)]
+    records.insert(500, UrlRecord('https://example.com/pricing', priority=1.0, source_type='page'))
+    records.append(UrlRecord('https://example.com/fresh', lastmod='2023-11-14', changefreq='daily'))
+    records.append(UrlRecord('https://example.com/blog/new', lastmod='2023-11-10', source_type='blog'))
+    records.append(UrlRecord('https://example.com/blog/old', lastmod='2015-01-01', source_type='blog'))
+    records.append(UrlRecord('https://example.com/blog/older', lastmod='2010-01-01', source_type='blog'))
+
+    selector = TopKSelector({'blog': 2, 'page': 3, 'product': 0}, share={'uncategorized': 'page'}, now=now)
+    for record in records:
+        selector.offer(record)
+
+    # Uncategorized URLs compete for the page limit; ties keep sitemap order
+    assert [u['loc'] for u in selector.selected('page')] == [
+        'https://example.com/fresh', 'https://example.com/pricing', 'https://example.com/filler-0'
+    ]
+    assert [u['loc'] for u in selector.selected('blog')] == ['https://example.com/blog/new', 'https://example.com/blog/old']
+    assert len(list(selector.results())) == 5 and selector.offered == len(records)
+    assert all(len(heap) <= 3 for heap in selector.heaps.values())
+    print("✅ Top-k selection kept the most valuable URLs")
+
+
+def test_priority_selection_stops_early():
+    """Priority selection ranks a bounded set of candidates, so unneeded sitemaps are never read."""
+    routes = {
+        '/page-sitemap.xml': urlset([f'https://example.com/p{i}' for i in range(30)]),
+        '/page-sitemap2.xml': urlset(['https://example.com/late']),
+    }
+    limits = {'blog': 0, 'page': 2, 'product': 0}
+    share = {'uncategorized': 'page'}
+    with FixtureServer(routes) as server:
+        routes['/sitemap_index.xml'] = sitemapindex([server.url('/page-sitemap.xml'), server.url('/page-sitemap2.xml')])
+        config = {'sitemap_fetch_workers': 1, 'sitemap_host_delay': 0}
+        urls_data, ranked = select_sitemap_urls(SitemapParser(config), server.url('/sitemap_index.xml'), config,
+                                                limits, share=share)
+        assert ranked == 20 and len(urls_data) == 2
+        assert server.hits('/page-sitemap2.xml') == 0
+
+        # 0 candidates per URL ranks everything
+        config = dict(config, url_selection_candidates=0)
+        _, ranked = select_sitemap_urls(SitemapParser(config), server.url('/sitemap_index.xml'), config, limits, share=share)
+        assert ranked == 31 and server.hits('/page-sitemap2.xml') == 1
+
+        config = dict(config, url_selection='sitemap')
+        urls_data, ranked = select_sitemap_urls(SitemapParser(config), server.url('/sitemap_index.xml'), config,
+                                                limits, share=share)
+        assert ranked is None and [u['loc'] for u in urls_data] == ['https://example.com/p0', 'https://example.com/p1']
+    print("✅ Priority selection read 20 candidates for 2 pages")
+
+
+def test_url_rules():
+    """Include/exclude globs and regexes are applied while the sitemap streams in."""
+    matcher = UrlRuleMatcher.from_config({})
+    assert matcher.matches('https://example.com/blog/hello/')
+    assert matcher.matches('https://example.com/page/about')
+    for junk in ['https://example.com/tag/python/', 'https://example.com/category/news/page/3/',
+                 'https://example.com/author/jo/', 'https://example.com/wp-content/uploads/a.jpg',
+                 'https://example.com/files/Report.PDF', 'https://example.com/feed']:
+        assert not matcher.matches(junk), junk
+
+    custom = UrlRuleMatcher(include=['https://example.com/docs/*', 're:/blog/\\d+'], exclude=['*/draft-*'])
+    assert custom.matches('https://example.com/docs/setup')
+    assert custom.matches('https://example.com/blog/2024/x')
+    assert not custom.matches('https://example.com/about')
+    assert not custom.matches('https://example.com/docs/draft-setup')
+    assert UrlRuleMatcher.from_config({'url_rules': {'include': [], 'exclude': []}}) is None
+
+    locs = ['https://example.com/a', 'https://example.com/tag/x/', 'https://example.com/a/',
+            'https://example.com/logo.png', 'https://example.com/b']
+    with FixtureServer({'/sitemap.xml': urlset(locs)}) as server:
+        deduplicator = UrlDeduplicator()
+        url_filter = chain_filters(matcher, None, deduplicator)
+        urls_data = list(SitemapParser({}).iter_sitemap(server.url('/sitemap.xml'), url_filter=url_filter))
+
+    assert [u['loc'] for u in urls_data] == ['https://example.com/a', 'https://example.com/b']
+    assert matcher.excluded == 2 and deduplicator.duplicates == 1
+    print("✅ URL rules excluded junk URLs at the sitemap stage")
+
+
+def hreflang_sitemap(slugs, languages):
+    """Build a urlset listing every translation of every page with xhtml:link alternates."""
+    entries = []
+    for slug in slugs:
+        links = ''.join(f'<xhtml:link rel="alternate" hreflang="{lang}" href="https://example.com/{lang}/{slug}"/>'
+                        for lang in languages)
+        links += f'<xhtml:link rel="alternate" hreflang="x-default" href="https://example.com/{languages[0]}/{slug}"/>'
+        for lang in languages:
+            entries.append(f'<url><loc>https://example.com/{lang}/{slug}</loc>{links}</url>')
+    return ('<?xml version="1.0" encoding="UTF-8"?>'
+            '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9" xmlns:xhtml="http://www.w3.org/1999/xhtml">'
+            + ''.join(entries) + '<url><loc>https://example.com/imprint</loc></url></urlset>')
+
+
+def test_hreflang_collapsing():
+    """Only one translation per page is kept, in the preferred language or x-default."""
+    document = hreflang_sitemap(['pricing', 'about'], ['de-DE', 'en-GB', 'fr'])
+    with FixtureServer({'/sitemap.xml': document}) as server:
+        records = SitemapParser({}).parse_sitemap(server.url('/sitemap.xml'))
+        assert len(records) == 7
+        assert ('en-gb', 'https://example.com/en-GB/pricing') in records[0]['alternates']
+
+        results = {}
+        for language in ['en', 'de-de', 'it']:
+            collapser = HreflangCollapser(language)
+            urls_data = list(SitemapParser({}).iter_sitemap(server.url('/sitemap.xml'), url_filter=collapser.accept))
+            results[language] = [u['loc'] for u in urls_data]
+            assert collapser.collapsed == 4
+
+    assert results['en'] == ['https://example.com/en-GB/pricing', 'https://example.com/en-GB/about', 'https://example.com/imprint']
+    assert results['de-de'] == ['https://example.com/de-DE/pricing', 'https://example.com/de-DE/about', 'https://example.com/imprint']
+    # No Italian translation: fall back to x-default
+    assert results['it'] == ['https://example.com/de-DE/pricing', 'https://example.com/de-DE/about', 'https://example.com/imprint']
+    assert HreflangCollapser.from_config({'hreflang': {'enabled': False}}) is None
+    print("✅ hreflang translations collapsed to one URL per page")
+
+
+def test_web_jobs_get_url_settings_from_config_yaml():
+    """The URL rules, canonicalization and hreflang settings in config.yaml reach web jobs."""
+    settings = load_job_settings(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.yaml'))
+    assert {'url_rules', 'url_canonicalization', 'hreflang'} <= set(settings)
+    # Built like app.py's job config, filtered like generate_llms_background
+    config = {'sitemap_url': 'https://example.com/sitemap.xml', 'site_name': 'Example', **settings}
+    collapser = HreflangCollapser.from_config(config)
+    rule_matcher = UrlRuleMatcher.from_config(config)
+    deduplicator = UrlDeduplicator.from_config(config)
+    url_filter = chain_filters(collapser, rule_matcher, deduplicator)
+
+    extra = ''.join(f'<url><loc>{loc}</loc></url>' for loc in [
+        'https://example.com/tag/news/', 'https://example.com/imprint?utm_source=mail', 'https://example.com/feed'])
+    document = hreflang_sitemap(['pricing'], ['de', 'en']).replace('</urlset>', extra + '</urlset>')
+    with FixtureServer({'/sitemap.xml': document}) as server:
+        urls_data = list(SitemapParser({}).iter_sitemap(server.url('/sitemap.xml'), url_filter=url_filter))
+
+    assert [u['loc'] for u in urls_data] == ['https://example.com/en/pricing', 'https://example.com/imprint']
+    assert collapser.collapsed == 1 and rule_matcher.excluded == 2 and deduplicator.duplicates == 1
+    print("✅ config.yaml URL rules, canonicalization and hreflang applied to web jobs")
+
+
+if __name__ == "__main__":
+    test_canonicalization_rules()
+    test_seen_set()
+    test_duplicates_do_not_consume_quota()
+    test_top_k_selection()
+    test_priority_selection_stops_early()
+    test_url_rules()
+    test_hreflang_collapsing()
+    test_web_jobs_get_url_settings_from_config_yaml()
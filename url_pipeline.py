@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+"""
+URL pipeline stages applied to sitemap records before they reach the fetch queue.
+
+Filter stages take a URL record (see main.UrlRecord) and decide whether it should
+be kept. They are chained into the ``url_filter`` passed to SitemapParser.iter_sitemap,
+so rejected URLs never count against tier quotas. TopKSelector then decides which
+of the remaining URLs are worth spending the tier limits on.
+"""
+
+import re
+import heapq
+import hashlib
+import logging
+import time
+from array import array
+from itertools import count
+from fnmatch import fnmatchcase
+from urllib.parse import urlsplit, urlunsplit, unquote_plus
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CANONICALIZATION = {
+    'enabled': True,
+    'ignore_scheme': True,  # http://x and https://x are the same page
+    'ignore_www': True,  # www.example.com and example.com are the same host
+    'ignore_trailing_slash': True,  # /about and /about/ are the same page
+    'sort_query': True,  # ?a=1&b=2 and ?b=2&a=1 are the same page
+    'strip_fragment': True,
+    'strip_query_params': [
+        'utm_*', 'gclid', 'fbclid', 'msclkid', 'yclid', 'dclid', 'mc_cid', 'mc_eid',
+        '_ga', '_gl', 'ref', 'ref_src', 'igshid', 'spm'
+    ]
+}
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+class UrlCanonicalizer:
+    """Normalize URLs according to configurable rules.
+
+    ``canonicalize`` returns the URL that should actually be fetched: the scheme
+    and host are lowercased, default ports, fragments and tracking parameters are
+    dropped. ``key`` goes further and also folds away differences that usually
+    point at the same page (scheme, ``www.``, trailing slash, query order) so that
+    it can be used to detect duplicates.
+    """
+
+    def __init__(self, rules=None):
+        self.rules = dict(DEFAULT_CANONICALIZATION)
+        self.rules.update(rules or {})
+        patterns = [p.lower() for p in self.rules.get('strip_query_params') or []]
+        self._exact_params = frozenset(p for p in patterns if not any(c in p for c in '*?['))
+        self._param_patterns = tuple(p for p in patterns if p not in self._exact_params)
+
+    def _strip_param(self, name):
+        name = name.lower()
+        return name in self._exact_params or any(fnmatchcase(name, p) for p in self._param_patterns)
+
+    def _split(self, url):
+        parts = urlsplit(url.strip())
+        scheme = parts.scheme.lower()
+        host = (parts.hostname or '').lower()
+        try:
+            port = parts.port
+        except ValueError:
+            port = None
+        netloc = f"[{host}]" if ':' in host else host
+        if port and DEFAULT_PORTS.get(scheme) != port:
+            netloc = f"{netloc}:{port}"
+        query = parts.query
+        if query:
+            # Work on the raw segments so kept parameters are not re-encoded
+            segments = [s for s in query.split('&') if s and not self._strip_param(unquote_plus(s.split('=', 1)[0]))]
+            if self.rules.get('sort_query'):
+                segments.sort()
+            query = '&'.join(segments)
+        fragment = '' if self.rules.get('strip_fragment') else parts.fragment
+        return scheme, netloc, parts.path or '/', query, fragment
+
+    def canonicalize(self, url):
+        """Get the URL to fetch, without tracking parameters or fragments."""
+        return urlunsplit(self._split(url))
+
+    def key(self, url):
+        """Get the dedup key for a URL; equal keys mean the same page."""
+        scheme, netloc, path, query, fragment = self._split(url)
+        if self.rules.get('ignore_scheme') and scheme in DEFAULT_PORTS:
+            scheme = 'http'
+        if self.rules.get('ignore_www') and netloc.startswith('www.'):
+            netloc = netloc[4:]
+        if self.rules.get('ignore_trailing_slash') and len(path) > 1:
+            path = path.rstrip('/') or '/'
+        return urlunsplit((scheme, netloc, path, query, fragment))
+
+
+class SeenSet:
+    """Memory-efficient set of strings, stored as 64-bit BLAKE2b digests.
+
+    Digests live in an open-addressing table in an ``array('Q')`` (8 bytes a
+    slot, linear probing, 0 marks an empty slot), doubled once it is two
+    thirds full. That comes to 12-24 bytes per entry instead of the 60+ a
+    Python set of ints costs, so a million URLs take around 16 MB and an add
+    is a hash plus a few probes. The false-positive rate for one million
+    entries is around 3e-8.
+    """
+
+    MIN_SLOTS = 1024
+
+    def __init__(self):
+        self._slots = array('Q', [0]) * self.MIN_SLOTS
+        self._count = 0
+
+    @staticmethod
+    def _digest(value):
+        digest = int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+        return digest or 1
+
+    def _slot(self, digest):
+        """Index of the slot holding ``digest``, or of the empty slot where it belongs."""
+        slots = self._slots
+        mask = len(slots) - 1
+        i = digest & mask
+        while True:
+            current = slots[i]
+            if current == digest or not current:
+                return i
+            i = (i + 1) & mask
+
+    def add(self, value):
+        """Add a value; returns False if it was already present."""
+        digest = self._digest(value)
+        i = self._slot(digest)
+        if self._slots[i]:
+            return False
+        self._slots[i] = digest
+        self._count += 1
+        if self._count * 3 >= len(self._slots) * 2:
+            self._grow()
+        return True
+
+    def _grow(self):
+        old = self._slots
+        self._slots = array('Q', [0]) * (len(old) * 2)
+        for digest in old:
+            if digest:
+                self._slots[self._slot(digest)] = digest
+
+    def __contains__(self, value):
+        digest = self._digest(value)
+        return self._slots[self._slot(digest)] == digest
+
+    def __len__(self):
+        return self._count
+
+
+class UrlDeduplicator:
+    """Pipeline stage that canonicalizes record URLs and drops duplicates."""
+
+    def __init__(self, rules=None):
+        self.canonicalizer = UrlCanonicalizer(rules)
+        self.seen = SeenSet()
+        self.duplicates = 0
+
+    @classmethod
+    def from_config(cls, config):
+        """Build a deduplicator from the ``url_canonicalization`` config section, or None if disabled."""
+        rules = config.get('url_canonicalization') or {}
+        if not rules.get('enabled', True):
+            return None
+        return cls(rules)
+
+    def accept(self, url_data):
+        """Rewrite the record to its canonical URL and check it hasn't been seen yet."""
+        url_data['loc'] = self.canonicalizer.canonicalize(url_data['loc'])
+        if self.seen.add(self.canonicalizer.key(url_data['loc'])):
+            return True
+        self.duplicates += 1
+        return False
+
+
+# Archive, feed and asset URLs that never make useful llms.txt entries
+DEFAULT_URL_RULES = {
+    'include': [],
+    'exclude': [
+        '*/tag/*',
+        '*/tags/*',
+        '*/category/*',
+        '*/author/*',
+        '*/page/[0-9]*',
+        '*/feed',
+        '*/feed/*',
+        '*/wp-content/*',
+        '*/wp-json/*',
+        r're:\.(jpe?g|png|gif|webp|svg|ico|bmp|pdf|zip|gz|mp3|mp4|webm|css|js|json|xml|txt)([?#]|$)'
+    ]
+}
+
+
+class UrlRuleMatcher:
+    """Include/exclude URL rules compiled into one regular expression.
+
+    Rules are globs matched against the whole URL (``*/tag/*``) or, with a
+    ``re:`` prefix, regular expressions searched anywhere in it. Globs are
+    turned into unanchored fragments (a leading or trailing ``*`` just drops the
+    anchor) and all exclude rules are folded into one alternation, so a URL
+    costs a single regex search however many rules are configured (two when
+    include rules are set). Matching is case-insensitive. An empty include list
+    keeps everything not excluded.
+    """
+
+    def __init__(self, include=None, exclude=None):
+        self.include = list(include or [])
+        self.exclude = list(exclude or [])
+        self.excluded = 0
+        flags = re.IGNORECASE | re.DOTALL
+        self._include = re.compile(self._alternation(self.include), flags) if self.include else None
+        self._exclude = re.compile(self._alternation(self.exclude), flags) if self.exclude else None
+
+    @classmethod
+    def from_config(cls, config):
+        """Build a matcher from the ``url_rules`` config section, or None if there are no rules."""
+        rules = config.get('url_rules')
+        if rules is None:
+            rules = DEFAULT_URL_RULES
+        if not rules.get('include') and not rules.get('exclude'):
+            return None
+        return cls(rules.get('include'), rules.get('exclude'))
+
+    @staticmethod
+    def _glob_to_regex(glob):
+        """Translate a whole-URL glob into a regex fragment for searching."""
+        anchored_start = not glob.startswith('*')
+        anchored_end = not glob.endswith('*')
+        glob = glob.strip('*')
+        parts = []
+        i = 0
+        while i < len(glob):
+            char = glob[i]
+            if char == '*':
+                parts.append('.*')
+            elif char == '?':
+                parts.append('.')
+            elif char == '[' and ']' in glob[i + 1:]:
+                end = glob.index(']', i + 1)
+                body = glob[i + 1:end]
+                if body.startswith('!'):
+                    body = '^' + body[1:]
+                parts.append(f"[{body.replace(chr(92), chr(92) * 2)}]")
+                i = end
+            else:
+                parts.append(re.escape(char))
+            i += 1
+        # Anchor to the start of the URL (not of a line) since the pattern is searched
+        return ('\\A' if anchored_start else '') + ''.join(parts) + ('\\Z' if anchored_end else '')
+
+    def _compile_rule(self, rule):
+        if rule.startswith('re:'):
+            return f'(?:{rule[3:]})'
+        return self._glob_to_regex(rule)
+
+    def _alternation(self, rules):
+        fragments = []
+        for rule in rules:
+            fragment = self._compile_rule(rule)
+            try:
+                re.compile(fragment)
+            except re.error as e:
+                raise ValueError(f"Invalid URL rule '{rule}': {e}")
+            fragments.append(fragment)
+        return '(?:' + '|'.join(fragments) + ')'
+
+    def matches(self, url):
+        """Check whether a URL passes the include/exclude rules."""
+        if self._exclude is not None and self._exclude.search(url):
+            return False
+        return self._include is None or self._include.search(url) is not None
+
+    def accept(self, url_data):
+        """Pipeline stage: keep records whose URL passes the rules."""
+        if self.matches(url_data['loc']):
+            return True
+        self.excluded += 1
+        return False
+
+
+class HreflangCollapser:
+    """Pipeline stage that keeps one URL per group of hreflang translations.
+
+    A record's hreflang alternates (plus its own URL) form a language group.
+    The first record seen from a group is kept and pointed at the group's
+    preferred URL: the alternate for ``preferred_language`` (an exact match
+    such as ``en-us`` first, then any regional variant of ``en``), otherwise
+    ``x-default``, otherwise the record itself. Later records from the same
+    group are dropped. Records without alternates pass through unchanged.
+    """
+
+    def __init__(self, preferred_language=None):
+        self.preferred_language = (preferred_language or '').strip().lower().replace('_', '-') or None
+        self.seen = SeenSet()
+        self.collapsed = 0
+
+    @classmethod
+    def from_config(cls, config):
+        """Build a collapser from the ``hreflang`` config section, or None if disabled."""
+        settings = config.get('hreflang') or {}
+        if not settings.get('enabled', True):
+            return None
+        return cls(settings.get('preferred_language', 'en'))
+
+    def preferred_href(self, url_data):
+        """Pick the URL that represents a record's language group."""
+        alternates = dict(url_data.get('alternates') or ())
+        language = self.preferred_language
+        if language:
+            if language in alternates:
+                return alternates[language]
+            base = language.split('-')[0]
+            for lang in sorted(alternates):
+                if lang == base or lang.startswith(base + '-'):
+                    return alternates[lang]
+        if 'x-default' in alternates:
+            return alternates['x-default']
+        # No preference applies: use a stable member so every record of the group agrees
+        return min(set(alternates.values()) | {url_data['loc']})
+
+    def accept(self, url_data):
+        """Keep the first record of each language group, pointed at the preferred URL."""
+        if not url_data.get('alternates'):
+            return True
+        href = self.preferred_href(url_data)
+        if not self.seen.add(href):
+            self.collapsed += 1
+            return False
+        if href != url_data['loc']:
+            url_data['loc'] = href
+        return True
+
+
+def chain_filters(*stages):
+    """Combine pipeline stages into a single url_filter, skipping missing (None) stages."""
+    stages = [stage for stage in stages if stage is not None]
+    if not stages:
+        return None
+
+    def url_filter(url_data):
+        return all(stage.accept(url_data) for stage in stages)
+
+    return url_filter
+
+
+CHANGEFREQ_SCORES = {
+    'always': 1.0,
+    'hourly': 0.9,
+    'daily': 0.8,
+    'weekly': 0.6,
+    'monthly': 0.4,
+    'yearly': 0.2,
+    'never': 0.0
+}
+
+DEFAULT_SELECTION_WEIGHTS = {
+    'priority': 1.0,
+    'recency': 1.0,
+    'changefreq': 0.5
+}
+
+
+class TopKSelector:
+    """Keep the k most valuable URLs per category from a stream of sitemap records.
+
+    Records are scored from their sitemap priority (0.5 when missing, as per
+    the sitemap protocol), lastmod recency (exponential decay with a
+    configurable half-life) and changefreq. Each category keeps a bounded
+    min-heap, so selection is O(n log k) in time and O(k) in memory. Limits and
+    ``share`` work like SitemapQuota; ties keep sitemap order.
+    """
+
+    def __init__(self, limits, share=None, weights=None, half_life_days=90, now=None):
+        self.limits = dict(limits)
+        self.share = dict(share or {})
+        self.weights = dict(DEFAULT_SELECTION_WEIGHTS)
+        self.weights.update(weights or {})
+        self.half_life = max(half_life_days, 1) * 86400
+        self.now = now if now is not None else time.time()
+        self.heaps = {key: [] for key in self.limits}
+        self.unlimited = []  # categories without a limit keep everything, in sitemap order
+        self.offered = 0
+        self._order = count()
+
+    @classmethod
+    def from_config(cls, config, limits, share=None):
+        """Build a selector using the ``url_selection_weights`` config settings."""
+        return cls(limits, share=share,
+                   weights=config.get('url_selection_weights'),
+                   half_life_days=config.get('url_selection_half_life_days', 90))
+
+    def _key(self, source_type):
+        key = source_type if source_type in ('blog', 'page', 'product') else 'uncategorized'
+        return self.share.get(key, key)
+
+    def score(self, url_data):
+        """Value of a URL record; higher is fetched first."""
+        priority = url_data.get('priority')
+        score = self.weights['priority'] * (0.5 if priority is None else priority)
+        lastmod = getattr(url_data, 'lastmod_ts', None)
+        if lastmod is not None:
+            age = max(self.now - lastmod, 0)
+            score += self.weights['recency'] * 0.5 ** (age / self.half_life)
+        score += self.weights['changefreq'] * CHANGEFREQ_SCORES.get((url_data.get('changefreq') or '').lower(), 0.3)
+        return score
+
+    def offer(self, url_data):
+        """Consider a record for selection; returns False if it was not kept (for now)."""
+        self.offered += 1
+        key = self._key(url_data.get('source_type'))
+        if key not in self.heaps:
+            self.unlimited.append(url_data)
+            return True
+        heap = self.heaps[key]
+        limit = self.limits[key]
+        if limit <= 0:
+            return False
+        # Earlier records win ties, so the sequence number is negated
+        entry = (self.score(url_data), -next(self._order), url_data)
+        if len(heap) < limit:
+            heapq.heappush(heap, entry)
+            return True
+        if entry[:2] > heap[0][:2]:
+            heapq.heapreplace(heap, entry)
+            return True
+        return False
+
+    def selected(self, key):
+        """Get the kept records of one category, best first."""
+        return [entry[2] for entry in sorted(self.heaps.get(key, ()), key=lambda e: e[:2], reverse=True)]
+
+    def results(self):
+        """Iterate over all kept records, category by category, best first."""
+        for key in self.heaps:
+            yield from self.selected(key)
+        yield from self.unlimited
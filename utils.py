@@ -6,9 +6,11 @@ Utility functions for the LLMs.txt Generator
 import os
 import json
 import hashlib
+import threading
 from datetime import datetime
 from urllib.parse import urlparse
 import logging
+import yaml
 
 logger = logging.getLogger(__name__)
 
@@ -72,6 +74,58 @@ class IncrementalUpdater:
         return hashlib.md5(content.encode('utf-8')).hexdigest()
 
 
+class ValidatorStore:
+    """Persist ETag/Last-Modified validators per URL, with the result they produced.
+    
+    Lets the next run send conditional requests and reuse the stored result
+    when the server answers 304 Not Modified.
+    """
+    
+    def __init__(self, cache_file=".llms_validators.json"):
+        self.cache_file = cache_file
+        self.entries = self._load_cache()
+        self._lock = threading.Lock()
+    
+    def _load_cache(self):
+        """Load validators from file."""
+        if os.path.exists(self.cache_file):
+            try:
+                with open(self.cache_file, 'r') as f:
+                    return json.load(f)
+            except Exception as e:
+                logger.warning(f"Could not load validator cache: {e}")
+        return {}
+    
+    def save(self):
+        """Save validators to file."""
+        try:
+            with self._lock:
+                data = json.dumps(self.entries)
+            tmp_file = f"{self.cache_file}.tmp"
+            with open(tmp_file, 'w') as f:
+                f.write(data)
+            os.replace(tmp_file, self.cache_file)
+        except Exception as e:
+            logger.error(f"Could not save validator cache: {e}")
+    
+    def get(self, url):
+        """Get the stored validators and payload for a URL."""
+        with self._lock:
+            return self.entries.get(url)
+    
+    def set(self, url, etag, last_modified, payload):
+        """Store validators and the payload they validate."""
+        if not etag and not last_modified:
+            return
+        with self._lock:
+            self.entries[url] = {
+                'etag': etag,
+                'last_modified': last_modified,
+                'payload': payload,
+                'stored_at': datetime.now().isoformat()
+            }
+
+
 class FTPUploader:
     """Handle FTP upload of generated llms.txt file."""
     
@@ -143,6 +197,25 @@ def validate_config(config):
     return True
 
 
+# config.yaml settings the web app passes to every generation job; the rest come from the form and tier
+JOB_SETTINGS = (
+    'url_selection', 'url_selection_candidates', 'url_selection_weights', 'url_selection_half_life_days',
+    'url_rules', 'url_canonicalization', 'hreflang',
+    'scraper_backend', 'async_max_concurrency'
+)
+
+
+def load_job_settings(path='config.yaml'):
+    """Read the JOB_SETTINGS keys from config.yaml (empty if it can't be read)."""
+    try:
+        with open(path, 'r') as f:
+            settings = yaml.safe_load(f) or {}
+    except (OSError, yaml.YAMLError) as e:
+        logger.warning(f"Could not read job settings from {path}: {e}")
+        return {}
+    return {key: settings[key] for key in JOB_SETTINGS if key in settings}
+
+
 def create_sample_config():
     """Create a sample configuration file."""
     sample_config = {